@@ -0,0 +1,38 @@
+import argparse
+import asyncio
+import logging
+
+from libottdadmin2.constants import NETWORK_ADMIN_PORT
+from libottdadmin2.enums import UpdateType
+from libottdadmin2.simulator import DEFAULT_RATES, OttdAdminSimulator
+
+parser = argparse.ArgumentParser(description='Simulate the admin port of an OpenTTD server')
+parser.add_argument("--password", help="The admin password")
+parser.add_argument("--authorized-key", action='append', default=[],
+    help="A public key that may join without password, may be given more than once")
+parser.add_argument('--host', default='127.0.0.1', help="The host to listen on")
+parser.add_argument('--port', default=NETWORK_ADMIN_PORT, type=int, help="The port to listen on")
+parser.add_argument('--clients', default=16, type=int, help="The number of simulated clients")
+parser.add_argument('--companies', default=8, type=int, help="The number of simulated companies")
+parser.add_argument('--rate', action='append', default=[], metavar="TYPE=EVENTS",
+    help="Events per second for an update type, e.g. 'chat=1000' or 'logging=10000'")
+
+logging.basicConfig(level=logging.INFO)
+
+
+async def main(args):
+    rates = dict(DEFAULT_RATES)
+    for rate in args.rate:
+        name, _, value = rate.partition("=")
+        rates[UpdateType[name.upper()]] = float(value)
+    simulator = OttdAdminSimulator(password=args.password, authorized_keys=args.authorized_key, rates=rates,
+                                   clients=args.clients, companies=args.companies)
+    await simulator.start(args.host, args.port)
+    while True:
+        await asyncio.sleep(10)
+        logging.info("%d admins connected, %d packets sent, %d dropped",
+                     len(simulator.connections), simulator.packets, simulator.dropped)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parser.parse_args()))
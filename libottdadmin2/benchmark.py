@@ -0,0 +1,358 @@
+#
+# This file is part of libottdadmin2
+#
+# License: http://creativecommons.org/licenses/by-nc-sa/3.0/
+#
+
+"""Micro-benchmarks of the packet codec, for every registered packet type.
+
+Run ``python -m libottdadmin2.benchmark`` from a checkout. For every packet in
+``Packet._registry`` the time per operation is measured for:
+
+* ``encode``: ``Packet.create(**data)``;
+* ``decode``: decoding a received payload;
+* ``write_to_buffer``: framing an encoded packet, plain and encrypted;
+* ``extract``: ``Packet.extract`` of a complete frame, plain and encrypted.
+
+Payloads are generated with realistic field sizes. Captured payloads can be benchmarked as
+well, by passing a Python file with a ``PACKETS`` dict of packet class name to payload, like
+``--captured test/packet_data.py`` from a checkout.
+
+Results can be written as JSON (``--json``) and compared against an earlier run
+(``--compare``); the exit status is 1 when an operation became slower than the threshold.
+Timings are the minimum over the rounds, which is the most stable statistic on busy machines.
+"""
+
+import argparse
+import json
+import platform
+import runpy
+import sys
+from itertools import repeat as repeat_
+from datetime import datetime
+from os import urandom
+from time import perf_counter
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple, Type
+
+from monocypher import IncrementalAuthenticatedEncryption
+
+from libottdadmin2.constants import NONCE_SIZE, PUBLIC_KEY_SIZE
+from libottdadmin2.enums import (
+    Action,
+    ChatAction,
+    Colour,
+    CompanyRemoveReason,
+    DestType,
+    ErrorCode,
+    Landscape,
+    Language,
+    PollExtra,
+    UpdateFrequency,
+    UpdateType,
+)
+from libottdadmin2.packets import Packet
+from libottdadmin2.packets.base import HEADER
+
+RESULTS_VERSION = 1
+
+_date = datetime(1987, 6, 15)
+_chat = "did anyone see where my coal trains went? they were here a minute ago"
+_json = json.dumps({"event": "goal_completed", "company": 3, "goal": 17, "progress": [1, 2, 3, 5, 8, 13, 21, 34]})
+
+# Encode arguments with realistic field sizes for every packet type, by packet class name.
+GENERATED_DATA = {
+    "AdminJoin": dict(password="correct horse battery", name="libottdadmin2", version="0.0.4a1"),
+    "AdminQuit": dict(),
+    "AdminUpdateFrequency": dict(type=UpdateType.CHAT, freq=UpdateFrequency.AUTOMATIC),
+    "AdminPoll": dict(type=UpdateType.CLIENT_INFO, extra=PollExtra.ALL),
+    "AdminChat": dict(action=ChatAction.CHAT, type=DestType.BROADCAST, client_id=0, message=_chat),
+    "AdminRcon": dict(command="get_date"),
+    "AdminGamescript": dict(json_data=_json),
+    "AdminPing": dict(payload=0x12345678),
+    "AdminExternalChat": dict(source="discord", colour=Colour.WHITE, user="someone#1234", message=_chat),
+    "AdminJoinSecure": dict(name="libottdadmin2", version="0.0.4a1", methods=6),
+    "AdminAuthResponse": dict(public_key=bytes(range(32)), mac=bytes(range(16)), message=bytes(range(8))),
+    "ServerFull": dict(),
+    "ServerBanned": dict(),
+    "ServerError": dict(errorcode=ErrorCode.WRONG_PASSWORD),
+    "ServerProtocol": dict(version=1, settings={t: 0x41 for t in range(UpdateType._END)}),
+    "ServerWelcome": dict(
+        name="Public Server #3 | Coop | discord.gg/example", version="14.1", dedicated=True,
+        map="Random Map", seed=0x1234ABCD, landscape=Landscape.TEMPERATE, startdate=_date, x=1024, y=512,
+    ),
+    "ServerNewGame": dict(),
+    "ServerShutdown": dict(),
+    "ServerDate": dict(date=_date),
+    "ServerClientJoin": dict(client_id=1234),
+    "ServerClientInfo": dict(
+        client_id=1234, hostname="192.168.100.200", name="Player Name", language=Language.ENGLISH,
+        joindate=_date, play_as=3,
+    ),
+    "ServerClientUpdate": dict(client_id=1234, name="Player Name", play_as=3),
+    "ServerClientQuit": dict(client_id=1234),
+    "ServerClientError": dict(client_id=1234, errorcode=ErrorCode.CONNECTION_LOST),
+    "ServerCompanyNew": dict(company_id=3),
+    "ServerCompanyInfo": dict(
+        company_id=3, name="Braninghall Transport", manager="G. Green", colour=Colour.DARK_GREEN,
+        passworded=False, startyear=1950, is_ai=False, bankruptcy_counter=0, shareholders=(255, 255, 255, 255),
+    ),
+    "ServerCompanyUpdate": dict(
+        company_id=3, name="Braninghall Transport", manager="G. Green", colour=Colour.DARK_GREEN,
+        passworded=True, bankruptcy_counter=0, shareholders=(255, 255, 255, 255),
+    ),
+    "ServerCompanyRemove": dict(company_id=3, reason=CompanyRemoveReason.BANKRUPT),
+    "ServerCompanyEconomy": dict(
+        company_id=3, money=12345678, current_loan=300000, income=-45678, delivered=1234,
+        history=((2345678, 789, 1100), (2111111, 765, 1050)),
+    ),
+    "ServerCompanyStats": dict(company_id=3, vehicles=(120, 45, 30, 12, 4), stations=(40, 25, 20, 6, 3)),
+    "ServerChat": dict(action=Action.CHAT, type=DestType.BROADCAST, client_id=1234, message=_chat, extra=0),
+    "ServerRcon": dict(colour=Colour.WHITE, result="Client #1234  name: 'Player Name'  company: 3  IP: 10.0.0.1"),
+    "ServerConsole": dict(origin="net", message="[server] Client #1234 joined the game: Player Name"),
+    "ServerCmdNames": dict(commands={i: "CmdBuildSomethingNumber%d" % i for i in range(120)}),
+    "ServerCmdLogging": dict(
+        client_id=1234, company_id=3, command_id=17, param1=0x0102, param2=0x30000, tile=0x1ABCD, text="",
+        frame=123456,
+    ),
+    "ServerGamescript": dict(json_data=_json),
+    "ServerRconEnd": dict(command="clients"),
+    "ServerPong": dict(payload=0x12345678),
+    "ServerAuthRequest": dict(method=1, public_key=bytes(PUBLIC_KEY_SIZE), key_exchange_nonce=bytes(NONCE_SIZE)),
+    "ServerEnableEncryption": dict(encryption_nonce=bytes(NONCE_SIZE)),
+}
+
+
+class BenchmarkResult(NamedTuple):
+    packet: str  # Packet class name.
+    payload: str  # "generated" or "captured".
+    operation: str  # "encode", "decode", "write_to_buffer" or "extract".
+    variant: str  # "plain" or "encrypted".
+    size: int  # Size of the (plain) frame, in bytes.
+    seconds: float  # Best time per operation.
+
+    @property
+    def key(self) -> Tuple[str, str, str, str]:
+        return self.packet, self.payload, self.operation, self.variant
+
+
+def _best(func, number: int, repeat: int) -> float:
+    """Best time per operation; ``func(number)`` performs ``number`` operations and returns its duration."""
+    return min(func(number) for _ in range(repeat)) / number
+
+
+def _encryption() -> Tuple[Any, Any]:
+    """A matching pair of encryption and decryption handlers."""
+    key, nonce = urandom(32), urandom(NONCE_SIZE)
+    return IncrementalAuthenticatedEncryption(key, nonce), IncrementalAuthenticatedEncryption(key, nonce)
+
+
+def payloads(
+    packet_filter: Optional[str] = None, captured: Optional[Dict[str, bytes]] = None
+) -> Iterator[Tuple[Type[Packet], str, Dict[str, Any]]]:
+    """Generator of ``(packet_class, payload_name, encode_arguments)`` for every registered packet.
+
+    ``captured`` maps packet class names to received payloads, which are benchmarked as well.
+    """
+    captured = captured or {}
+    for _, klass in sorted(Packet._registry.items()):
+        name = klass.__name__
+        if packet_filter and packet_filter.lower() not in name.lower():
+            continue
+        if name in GENERATED_DATA:
+            yield klass, "generated", GENERATED_DATA[name]
+        if name in captured:
+            # noinspection PyProtectedMember
+            yield klass, "captured", klass(captured[name]).decode()._asdict()
+
+
+def benchmark_packet(
+    klass: Type[Packet], payload: str, data: Dict[str, Any], number: int = 2000, repeat: int = 5
+) -> List[BenchmarkResult]:
+    name = klass.__name__
+    packet = klass.create(**data)
+    frame = packet.write_to_buffer()
+    body = frame[HEADER.size:]
+    size = len(frame)
+
+    def encode(n):
+        create = klass.create
+        start = perf_counter()
+        for _ in repeat_(None, n):
+            create(**data)
+        return perf_counter() - start
+
+    def decode(n):
+        start = perf_counter()
+        for _ in repeat_(None, n):
+            klass(body).decode()
+        return perf_counter() - start
+
+    def write_plain(n):
+        write = packet.write_to_buffer
+        start = perf_counter()
+        for _ in repeat_(None, n):
+            write()
+        return perf_counter() - start
+
+    def write_encrypted(n):
+        handler = _encryption()[0]
+        write = packet.write_to_buffer
+        start = perf_counter()
+        for _ in repeat_(None, n):
+            write(handler)
+        return perf_counter() - start
+
+    def extract_plain(n):
+        extract = Packet.extract
+        start = perf_counter()
+        for _ in repeat_(None, n):
+            extract(frame)
+        return perf_counter() - start
+
+    def extract_encrypted(n):
+        # Encrypted frames can only be decrypted once and in order, so prepare them per round.
+        encryption, decryption = _encryption()
+        frames = [packet.write_to_buffer(encryption) for _ in repeat_(None, n)]
+        extract = Packet.extract
+        start = perf_counter()
+        for encrypted in frames:
+            extract(encrypted, decryption)
+        return perf_counter() - start
+
+    return [
+        BenchmarkResult(name, payload, operation, variant, size, _best(func, number, repeat))
+        for operation, variant, func in (
+            ("encode", "plain", encode),
+            ("decode", "plain", decode),
+            ("write_to_buffer", "plain", write_plain),
+            ("write_to_buffer", "encrypted", write_encrypted),
+            ("extract", "plain", extract_plain),
+            ("extract", "encrypted", extract_encrypted),
+        )
+    ]
+
+
+def run(
+    packet_filter: Optional[str] = None,
+    number: int = 2000,
+    repeat: int = 5,
+    captured: Optional[Dict[str, bytes]] = None,
+) -> List[BenchmarkResult]:
+    results = []
+    for klass, payload, data in payloads(packet_filter, captured):
+        results.extend(benchmark_packet(klass, payload, data, number, repeat))
+    return results
+
+
+def to_json(results: List[BenchmarkResult], number: int, repeat: int) -> Dict[str, Any]:
+    from libottdadmin2 import VERSION
+
+    return {
+        "version": RESULTS_VERSION,
+        "libottdadmin2": VERSION,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "number": number,
+        "repeat": repeat,
+        # noinspection PyProtectedMember
+        "results": [result._asdict() for result in results],
+    }
+
+
+def compare(
+    results: List[BenchmarkResult], baseline: Dict[str, Any], threshold: float = 0.1
+) -> List[Tuple[BenchmarkResult, float]]:
+    """Return ``(result, ratio)`` for every result that is slower than in the baseline by more
+    than ``threshold`` (a fraction, 0.1 is 10% slower). ``ratio`` is new time over old time."""
+    old = {BenchmarkResult(**item).key: item["seconds"] for item in baseline["results"]}
+    regressions = []
+    for result in results:
+        seconds = old.get(result.key)
+        if seconds and result.seconds / seconds > 1 + threshold:
+            regressions.append((result, result.seconds / seconds))
+    return regressions
+
+
+def format_table(results: List[BenchmarkResult], baseline: Optional[Dict[str, Any]] = None) -> str:
+    old = {}
+    if baseline is not None:
+        old = {BenchmarkResult(**item).key: item["seconds"] for item in baseline["results"]}
+    lines = [
+        "%-24s %-9s %-15s %-9s %6s %10s %12s%s"
+        % ("packet", "payload", "operation", "variant", "bytes", "us/op", "ops/s", "  change" if old else "")
+    ]
+    for result in results:
+        change = ""
+        if result.key in old:
+            change = "  %+6.1f%%" % ((result.seconds / old[result.key] - 1) * 100)
+        lines.append(
+            "%-24s %-9s %-15s %-9s %6d %10.3f %12.0f%s"
+            % (
+                result.packet,
+                result.payload,
+                result.operation,
+                result.variant,
+                result.size,
+                result.seconds * 1e6,
+                1 / result.seconds if result.seconds else 0,
+                change,
+            )
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the packet codec for every registered packet type")
+    parser.add_argument("--filter", help="Only benchmark packet classes containing this text")
+    parser.add_argument("--number", type=int, default=2000, help="Operations per round")
+    parser.add_argument("--repeat", type=int, default=5, help="Rounds per measurement; the best round counts")
+    parser.add_argument("--json", metavar="PATH", help="Write the results as JSON to PATH ('-' for stdout)")
+    parser.add_argument("--captured", metavar="PATH",
+                        help="Python file with a PACKETS dict of captured payloads to benchmark as well")
+    parser.add_argument("--compare", metavar="PATH", help="Compare against the JSON results of an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Fraction an operation may be slower than the baseline (default: 0.1)")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+
+    captured = runpy.run_path(args.captured)["PACKETS"] if args.captured else None
+    results = run(args.filter, args.number, args.repeat, captured)
+    document = to_json(results, args.number, args.repeat)
+    if args.json == "-":
+        json.dump(document, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        print(format_table(results, baseline))
+        if args.json:
+            with open(args.json, "w") as fp:
+                json.dump(document, fp, indent=2)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for result, ratio in regressions:
+            print(
+                "REGRESSION %s %s %s %s: %.1f%% slower" % (*result.key, (ratio - 1) * 100),
+                file=sys.stderr,
+            )
+        return 1 if regressions else 0
+    return 0
+
+
+__all__ = [
+    "BenchmarkResult",
+    "GENERATED_DATA",
+    "benchmark_packet",
+    "compare",
+    "main",
+    "payloads",
+    "run",
+]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+#
+# This file is part of libottdadmin2
+#
+# License: http://creativecommons.org/licenses/by-nc-sa/3.0/
+#
+
+"""Capture files of admin port traffic.
+
+A capture file is append-only and starts with a header identifying the peer::
+
+    magic (6s) | version (B) | reserved (B) | port (H) | host length (H) | host (utf-8)
+
+followed by one record per received packet::
+
+    timestamp (d, seconds since the epoch) | packet (header + payload, as sent unencrypted)
+
+The packet header contains the packet length, so records need no length of their own.
+"""
+
+import mmap
+import os
+import time
+from struct import Struct
+from typing import Any, Iterable, Iterator, NamedTuple, Optional, Tuple, Type
+
+from libottdadmin2.exceptions import InvalidCaptureError
+from libottdadmin2.packets.base import Packet, HEADER, HEADER_SIZE_PART, HEADER_TYPE_PART
+
+CAPTURE_MAGIC = b"OTTDAC"
+CAPTURE_VERSION = 1
+CAPTURE_HEADER = Struct("<6sBBHH")
+CAPTURE_RECORD = Struct("<d")
+
+
+class CaptureFrame(NamedTuple):
+    timestamp: float
+    packet_id: int
+    frame: memoryview  # The complete packet, including its header.
+
+    def packet(self) -> Packet:
+        """Copy the frame out of the capture and turn it into a packet."""
+        return Packet.from_buffer(bytes(self.frame))
+
+
+class CaptureWriter:
+    """Append packets to a capture file.
+
+    :param path: The file to write to; existing captures are appended to.
+    :param peername: The ``(host, port)`` the traffic was received from.
+    """
+
+    def __init__(self, path: str, peername: Optional[Tuple[str, int]] = None, buffering: int = 1 << 16):
+        # IPv6 peernames have additional flow info and scope id fields.
+        host, port = peername[0:2] if peername else ("", 0)
+        self._file = open(path, "ab", buffering=buffering)
+        if self._file.tell() == 0:
+            encoded = host.encode("utf-8")
+            self._file.write(CAPTURE_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, 0, port, len(encoded)))
+            self._file.write(encoded)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, frame: bytes, timestamp: Optional[float] = None) -> None:
+        """Record a complete (unencrypted) packet, including its header."""
+        self._file.write(CAPTURE_RECORD.pack(time.time() if timestamp is None else timestamp))
+        self._file.write(frame)
+
+    def write_packet(self, packet: Packet, timestamp: Optional[float] = None) -> None:
+        # The header of a decrypted packet describes the encrypted length, so build a new one.
+        buffer = packet.buffer
+        self._file.write(CAPTURE_RECORD.pack(time.time() if timestamp is None else timestamp))
+        self._file.write(HEADER.pack(HEADER.size + len(buffer), packet.packet_id))
+        self._file.write(buffer)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class CaptureReader:
+    """Memory-mapped reader for capture files.
+
+    Iterating yields :class:`CaptureFrame` objects whose frames are views into the
+    mapped file; nothing is copied until a frame is turned into a packet. All frames
+    must be released before the reader can be closed.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as fp:
+            # Checked before mapping, empty files cannot be mapped.
+            if os.fstat(fp.fileno()).st_size < CAPTURE_HEADER.size:
+                raise InvalidCaptureError("File too small for a capture header")
+            self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, _, port, host_length = CAPTURE_HEADER.unpack_from(self._map, 0)
+            if magic != CAPTURE_MAGIC:
+                raise InvalidCaptureError("Not a capture file")
+            if version != CAPTURE_VERSION:
+                raise InvalidCaptureError("Unsupported capture version %d" % version)
+        except InvalidCaptureError:
+            self._map.close()
+            raise
+        offset = CAPTURE_HEADER.size
+        self.peername = (self._map[offset : offset + host_length].decode("utf-8"), port)
+        self._offset = offset + host_length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __iter__(self) -> Iterator[CaptureFrame]:
+        return self.frames()
+
+    def frames(self, types: Optional[Iterable[Type[Packet]]] = None) -> Iterator[CaptureFrame]:
+        """Generator over the frames in the capture, optionally only of the given types.
+
+        A truncated record at the end of the file (e.g. from an interrupted capture) is ignored.
+        """
+        packet_ids = None if types is None else frozenset(x.packet_id for x in types)
+        data = self._map
+        end = len(data)
+        offset = self._offset
+        record_size = CAPTURE_RECORD.size + HEADER.size
+        with memoryview(data) as view:
+            while offset + record_size <= end:
+                (timestamp,) = CAPTURE_RECORD.unpack_from(data, offset)
+                start = offset + CAPTURE_RECORD.size
+                (length,) = HEADER_SIZE_PART.unpack_from(data, start)
+                if length < HEADER.size:
+                    raise InvalidCaptureError("Invalid packet length %d at offset %d" % (length, start))
+                if start + length > end:
+                    break
+                offset = start + length
+                (packet_id,) = HEADER_TYPE_PART.unpack_from(data, start + HEADER_SIZE_PART.size)
+                if packet_ids is not None and packet_id not in packet_ids:
+                    continue
+                yield CaptureFrame(timestamp, packet_id, view[start:offset])
+
+    def packets(
+        self, types: Optional[Iterable[Type[Packet]]] = None
+    ) -> Iterator[Tuple[float, Type[Packet], Any]]:
+        """Generator of ``(timestamp, packet_class, data)``, decoding each packet when it is reached.
+
+        Packets with unknown ids are skipped.
+        """
+        registry = Packet._registry
+        for frame in self.frames(types):
+            if frame.packet_id not in registry:
+                continue
+            packet = frame.packet()
+            frame.frame.release()
+            yield frame.timestamp, packet.__class__, packet.decode()
+
+    def close(self) -> None:
+        self._map.close()
+
+
+__all__ = [
+    "CaptureFrame",
+    "CaptureReader",
+    "CaptureWriter",
+]
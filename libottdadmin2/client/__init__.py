@@ -4,15 +4,29 @@
 # License: http://creativecommons.org/licenses/by-nc-sa/3.0/
 #
 
-from libottdadmin2.client.asyncio import OttdAdminProtocol
+from libottdadmin2.client.asyncio import OttdAdminProtocol, OttdAdminBufferedProtocol, PacketStream, RconStream
 from libottdadmin2.client.sync import OttdSocket
+from libottdadmin2.client.hub import OttdSocketHub
 
 from libottdadmin2.client.common import OttdClientMixIn
 from libottdadmin2.client.tracking import TrackingMixIn
+from libottdadmin2.client.keepalive import KeepaliveMixIn
+from libottdadmin2.client.executor import ExecutorMixIn, OrderedExecutor, OverloadPolicy
+from libottdadmin2.client.manager import ConnectionManager, ServerConfig
 
 __all__ = [
     "OttdAdminProtocol",
+    "OttdAdminBufferedProtocol",
+    "PacketStream",
+    "RconStream",
     "OttdSocket",
+    "OttdSocketHub",
     "OttdClientMixIn",
     "TrackingMixIn",
+    "KeepaliveMixIn",
+    "ExecutorMixIn",
+    "OrderedExecutor",
+    "OverloadPolicy",
+    "ConnectionManager",
+    "ServerConfig",
 ]
@@ -5,16 +5,182 @@
 #
 
 import asyncio
-from typing import Optional
+import functools
+import inspect
+import threading
+import time
+from collections import deque
+from typing import AbstractSet, Any, Callable, Dict, List, Optional, Tuple, Type
 
 from libottdadmin2.client.common import OttdClientMixIn
-from libottdadmin2.constants import NETWORK_ADMIN_PORT
-from libottdadmin2.packets import Packet
+from libottdadmin2.constants import NETWORK_ADMIN_PORT, TCP_MTU
+from libottdadmin2.packets import AdminRcon, Packet, ServerRcon, ServerRconEnd
+from libottdadmin2.packets.buffer import ReceiveBuffer
 from libottdadmin2.util import loggable
 
 
+class BoundedStream:
+    """An async iterator over items pushed by the protocol, holding at most ``maxsize`` of them.
+
+    When full, reading from the connection is paused until the consumer has caught up to half
+    of ``maxsize`` (0 means no limit). Use it with ``async with`` so leaving early closes it.
+    """
+
+    def __init__(self, protocol: "OttdAdminProtocol", maxsize: int):
+        self.protocol = protocol
+        self.maxsize = maxsize
+        self._items = deque()  # Type: Deque[Any]
+        self._waiter = None  # Type: Optional[asyncio.Future]
+        self._done = False
+        self._exception = None  # Type: Optional[Exception]
+        self._closed = False
+        self._paused = False
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def put(self, item: Any) -> None:
+        if self._closed:
+            return
+        self._items.append(item)
+        self._wakeup()
+        if self.maxsize and not self._paused and len(self._items) >= self.maxsize:
+            self._paused = True
+            self.protocol.pause_reading()
+
+    def finish(self, exc: Optional[Exception] = None) -> None:
+        """Nothing more will arrive; iterating raises ``exc`` after the buffered items if given."""
+        self._done = True
+        self._exception = exc
+        self._wakeup()
+        self._release()  # Nothing more will arrive for us, the items we hold are bounded.
+
+    def _wakeup(self) -> None:
+        waiter, self._waiter = self._waiter, None
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def _release(self) -> None:
+        if self._paused:
+            self._paused = False
+            self.protocol.resume_reading()
+
+    def close(self) -> None:
+        """Stop iterating; whatever still arrives is thrown away."""
+        self._closed = True
+        self._items.clear()
+        self._wakeup()
+        self._release()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Any:
+        items = self._items
+        while not items:
+            if self._closed or self._done:
+                if self._exception is not None and not self._closed:
+                    raise self._exception
+                raise StopAsyncIteration
+            self._waiter = self.protocol.loop.create_future()
+            await self._waiter
+        item = items.popleft()
+        if self._paused and len(items) <= self.maxsize // 2:
+            self._release()
+        return item
+
+
+class RconStream(BoundedStream):
+    """The output of one rcon command, see :meth:`OttdAdminProtocol.rcon_stream`.
+
+    An async iterator of ``(colour, line)`` tuples that ends when ``ServerRconEnd`` arrives.
+    """
+
+    def __init__(self, protocol: "OttdAdminProtocol", command: str, maxsize: int):
+        super().__init__(protocol, maxsize)
+        self.command = command
+
+    def line_received(self, colour: int, line: str) -> None:
+        self.put((colour, line))
+
+
+class PacketStream(BoundedStream):
+    """The received packets of some types, see :meth:`OttdAdminProtocol.stream`.
+
+    An async iterator of ``(packet, data)`` tuples that ends when the connection is closed.
+    """
+
+    def __init__(self, protocol: "OttdAdminProtocol", types: AbstractSet[Type[Packet]], maxsize: int):
+        super().__init__(protocol, maxsize)
+        self.types = frozenset(types)
+        for packet_class in self.types:
+            protocol.add_listener(packet_class, self._packet_received)
+
+    # noinspection PyUnusedLocal
+    def _packet_received(self, packet: Packet, data: Any) -> None:
+        self.put((packet, data))
+
+    def _unsubscribe(self) -> None:
+        self.protocol._streams.discard(self)
+        for packet_class in self.types:
+            self.protocol.remove_listener(packet_class, self._packet_received)
+
+    def finish(self, exc: Optional[Exception] = None) -> None:
+        self._unsubscribe()
+        super().finish(exc)
+
+    def close(self) -> None:
+        self._unsubscribe()
+        super().close()
+
+
 @loggable
 class OttdAdminProtocol(OttdClientMixIn, asyncio.Protocol):
+    """The asyncio admin client.
+
+    Handlers may be coroutine functions (``async def on_server_chat(...)``); they are run as
+    tasks, at most :attr:`max_concurrent_handlers` at a time per connection. Calls beyond that
+    wait in a backlog, and reading pauses while more than :attr:`max_pending_handlers` calls
+    wait. With :attr:`ordered_handlers` the calls for one packet type run one after the
+    other. Exceptions are passed to :meth:`handler_failed`. Metrics and
+    :attr:`slow_handler_threshold` see the time from the start of a call until it finished,
+    which includes the time other tasks ran while it was waiting.
+    """
+
+    coalesce_limit = 64 * 1024  # Queued bytes after which send_packet writes straight away.
+    max_concurrent_handlers = 16  # Type: int
+    max_pending_handlers = 1000  # Type: int
+    # True to run the async handlers of each packet type in order, or a set of packet classes.
+    ordered_handlers = False  # Type: Union[bool, AbstractSet[Type[Packet]]]
+    # Names of the async ``on_*`` handlers of the class, set at class creation.
+    async_handler_names = frozenset()  # Type: FrozenSet[str]
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.async_handler_names = frozenset(
+            name for name in dir(cls) if name.startswith("on_") and inspect.iscoroutinefunction(getattr(cls, name))
+        )
+        if cls.async_handler_names and cls.get_handlers is not OttdAdminProtocol._get_async_handlers:
+            cls.get_handlers = OttdAdminProtocol._get_async_handlers
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name.startswith("on_") and inspect.iscoroutinefunction(value):
+            # An async handler on the instance, look handlers up the async aware way from now on.
+            self.get_handlers = self._get_async_handlers
+        super().__setattr__(name, value)
+
+    def set_handler(self, packet_class: Type[Packet], handler: Optional[Callable], raw: bool = False) -> None:
+        if inspect.iscoroutinefunction(handler):
+            # An async handler on the instance, look handlers up the async aware way from now on.
+            self.get_handlers = self._get_async_handlers
+        super().set_handler(packet_class, handler, raw)
+
     # noinspection PyUnusedLocal
     def __init__(
         self,
@@ -27,10 +193,27 @@ class OttdAdminProtocol(OttdClientMixIn, asyncio.Protocol):
         **kwargs
     ):
         self.loop = loop
-        self._buffer = b""
+        self._buffer = ReceiveBuffer()
         self.client_active = asyncio.Future()
         self.transport = None
         self.peername = None
+        self._out = bytearray()
+        self._flush_handle = None  # Type: Optional[asyncio.Handle]
+        self._paused = False
+        self._drain_waiters = []  # Type: List[asyncio.Future]
+        self._lost = False
+        self._pause_count = 0
+        self._rcon_pending = deque()  # Type: Deque[RconStream]  # Outstanding commands, oldest first.
+        self._rcon_listening = False
+        self._handler_tasks = set()  # Type: Set[asyncio.Task]
+        self._handler_backlog = deque()  # Type: Deque[Tuple[Optional[int], Callable, Dict[str, Any], Packet, Any]]
+        self._handler_ordered = {}  # Type: Dict[int, Deque[Tuple[int, Callable, Dict[str, Any], Packet, Any]]]
+        self._handlers_pending = 0
+        self._handlers_paused = False
+        # Protocols are created on the thread that runs their loop.
+        self._loop_thread = threading.get_ident()
+        self._waiters = {}  # Type: Dict[int, List[Tuple[asyncio.Future, Optional[Callable[[Any], bool]]]]]
+        self._streams = set()  # Type: Set[PacketStream]
 
         self.configure(use_insecure_join=use_insecure_join,
                        password=password,
@@ -38,22 +221,423 @@ class OttdAdminProtocol(OttdClientMixIn, asyncio.Protocol):
                        user_agent=user_agent,
                        version=version)
 
+    def connection_made(self, transport: asyncio.BaseTransport = None) -> None:
+        super().connection_made(transport)
+        self._flush()
+
     def _close(self):
+        self._flush()
         self.transport.close()
         if not self.client_active.done():
             self.client_active.set_result(True)
 
     def connection_lost(self, exc: Optional[Exception] = None) -> None:
+        if self._lost:
+            return  # Already handled, we are called again once an aborted transport is gone.
         self.log.info("Connection lost to %s:%d", self.peername[0], self.peername[1])
+        self._lost = True
+        if exc is not None and self.transport is not None:
+            # Do not wait for the write buffer to drain, the other side may be gone.
+            self.transport.abort()
+        self._out.clear()
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
         self._close()
+        self._wake_drain_waiters(exc)
+        while self._rcon_pending:
+            self._rcon_pending.popleft().finish(exc or ConnectionResetError("Connection lost"))
+        for waiters in list(self._waiters.values()):
+            for future, _ in list(waiters):
+                if not future.done():
+                    future.set_exception(exc or ConnectionResetError("Connection lost"))
+        for stream in list(self._streams):
+            stream.finish(exc)
         super().connection_lost(exc)
 
     def connection_closed(self) -> None:
         self.log.info("Connection closed to %s:%d", self.peername[0], self.peername[1])
         self._close()
+        for stream in list(self._streams):
+            stream.finish()
 
     def send_packet(self, packet: Packet) -> None:
-        self.transport.write(packet.write_to_buffer(self._encryption_handler))
+        """Queue a packet; all packets sent during one loop iteration go out in one write.
+
+        Packets are framed (and encrypted) right away, so their order is kept. Use
+        :meth:`drain` to wait until the transport is ready to take more data.
+        """
+        if self._lost:
+            return
+        out = self._out
+        if self.metrics is not None:
+            out += self._frame_measured(packet)
+        else:
+            out += packet.write_to_buffer(self._encryption_handler)
+        if len(out) >= self.coalesce_limit:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = self.loop.call_soon(self._flush)
+
+    def call_later(self, delay: float, callback: Callable, *args) -> asyncio.TimerHandle:
+        return self.loop.call_later(delay, self._call_if_connected, callback, args)
+
+    def _call_if_connected(self, callback: Callable, args: tuple) -> None:
+        if not self._lost:
+            callback(*args)
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self.transport is None:
+            return  # Not connected yet, connection_made flushes.
+        if self._out and not self.transport.is_closing():
+            self.transport.write(bytes(self._out))
+        self._out.clear()
+
+    def get_write_buffer_size(self) -> int:
+        """Bytes queued but not yet sent, including those still waiting in the transport."""
+        size = len(self._out)
+        if self.transport is not None and not self._lost:
+            size += self.transport.get_write_buffer_size()
+        return size
+
+    def pause_writing(self) -> None:
+        self.log.debug("Transport buffer full, pausing writing")
+        self._paused = True
+
+    def resume_writing(self) -> None:
+        self._paused = False
+        self._wake_drain_waiters()
+
+    def _wake_drain_waiters(self, exc: Optional[Exception] = None) -> None:
+        waiters, self._drain_waiters = self._drain_waiters, []
+        for waiter in waiters:
+            if waiter.done():
+                continue
+            if self._lost:
+                waiter.set_exception(exc or ConnectionResetError("Connection lost"))
+            else:
+                waiter.set_result(None)
+
+    async def drain(self) -> None:
+        """Write the queued packets and wait until the transport's write buffer is below its
+        high water mark again, like :meth:`asyncio.StreamWriter.drain`.
+
+        Raises :class:`ConnectionResetError` when the connection is lost.
+        """
+        if self._lost:
+            raise ConnectionResetError("Connection lost")
+        self._flush()
+        if not self._paused:
+            return
+        waiter = self.loop.create_future()
+        self._drain_waiters.append(waiter)
+        await waiter
+
+    def pause_reading(self) -> None:
+        """Stop reading and handling packets until :meth:`resume_reading`.
+
+        Calls are counted, reading resumes once every pause has been resumed. Packets that were
+        already received stay buffered, so nothing is handled while paused.
+        """
+        self._pause_count += 1
+        if self._pause_count == 1:
+            self._reading_paused = True
+            if self.transport is not None and not self._lost:
+                self.transport.pause_reading()
+
+    def resume_reading(self) -> None:
+        if not self._pause_count:
+            return
+        self._pause_count -= 1
+        if not self._pause_count:
+            self._reading_paused = False
+            if self.transport is not None and not self._lost:
+                self.transport.resume_reading()
+                # Handle what was buffered while paused; not from here, we may be inside a handler.
+                self.loop.call_soon(self._process_buffer)
+
+    async def rcon(self, command: str, timeout: Optional[float] = None) -> List[Tuple[int, str]]:
+        """Run an rcon command and return its output as ``(colour, line)`` tuples.
+
+        Commands can be pipelined: any number of calls may be outstanding on one connection,
+        the server answers them in order. On timeout or cancellation the output of the
+        command is still read, but thrown away.
+
+        :raises asyncio.TimeoutError: No ``ServerRconEnd`` within ``timeout`` seconds.
+        :raises ConnectionResetError: The connection was lost first.
+        """
+        stream = self.rcon_stream(command, maxsize=0)
+
+        async def collect():
+            return [line async for line in stream]
+
+        try:
+            return await asyncio.wait_for(collect(), timeout)
+        finally:
+            stream.close()
+
+    def rcon_stream(self, command: str, maxsize: int = 1000) -> "RconStream":
+        """Run an rcon command and iterate over its output as it arrives::
+
+            async with protocol.rcon_stream("content state") as lines:
+                async for colour, line in lines:
+                    ...
+
+        At most ``maxsize`` lines are buffered (0 for no limit), beyond that reading from the
+        connection is paused until the lines have been consumed. Leaving the ``async with``
+        early throws the rest of the output away. Pipelines with :meth:`rcon` like any other
+        command.
+
+        :raises ConnectionResetError: The connection was lost first.
+        """
+        if self._lost:
+            raise ConnectionResetError("Connection lost")
+        packet = AdminRcon.create(command=command)
+        if not self._rcon_listening:
+            self._rcon_listening = True
+            self.add_listener(ServerRcon, self._on_rcon)
+            self.add_listener(ServerRconEnd, self._on_rcon_end)
+        stream = RconStream(self, command, maxsize)
+        self._rcon_pending.append(stream)
+        self.send_packet(packet)
+        return stream
+
+    def _on_rcon(self, packet: Packet, data: Tuple) -> None:
+        if self._rcon_pending:
+            self._rcon_pending[0].line_received(data.colour, data.result)
+
+    def _on_rcon_end(self, packet: Packet, data: Tuple) -> None:
+        if not self._rcon_pending:
+            self.log.warning("Unexpected rcon end for %r", data.command)
+            return
+        stream = self._rcon_pending.popleft()
+        if data.command != stream.command:
+            self.log.warning("Rcon end for %r while waiting for %r", data.command, stream.command)
+        stream.finish()
+
+    # Waiting for packets
+
+    def wait_for(
+        self,
+        packet_class: Type[Packet],
+        predicate: Optional[Callable[[Any], bool]] = None,
+        timeout: Optional[float] = None,
+    ) -> "asyncio.Future":
+        """Return a future for the data of the next ``packet_class`` packet matching ``predicate``.
+
+        The waiter is registered right away, so a request can be sent after calling this and
+        before awaiting the result::
+
+            created = protocol.wait_for(ServerCompanyNew)
+            protocol.send_packet(...)
+            company_id = (await created).company_id
+
+        Waiters are kept per packet id, a packet only checks the waiters for its own type.
+        Cancel the future to stop waiting.
+
+        :raises asyncio.TimeoutError: No matching packet within ``timeout`` seconds.
+        :raises ConnectionResetError: The connection was lost first.
+        """
+        future = self.loop.create_future()
+        if self._lost:
+            future.set_exception(ConnectionResetError("Connection lost"))
+            return future
+        packet_id = packet_class.packet_id
+        waiters = self._waiters.get(packet_id)
+        if waiters is None:
+            waiters = self._waiters[packet_id] = []
+            self.add_listener(packet_class, self._resolve_waiters)
+        entry = (future, predicate)
+        waiters.append(entry)
+        timer = None
+        if timeout is not None:
+            timer = self.loop.call_later(timeout, self._waiter_timeout, future)
+
+        def done(_: asyncio.Future) -> None:
+            if timer is not None:
+                timer.cancel()
+            waiters.remove(entry)
+            if not waiters and self._waiters.get(packet_id) is waiters:
+                del self._waiters[packet_id]
+                self.remove_listener(packet_class, self._resolve_waiters)
+
+        future.add_done_callback(done)
+        return future
+
+    @staticmethod
+    def _waiter_timeout(future: asyncio.Future) -> None:
+        if not future.done():
+            future.set_exception(asyncio.TimeoutError())
+
+    def _resolve_waiters(self, packet: Packet, data: Any) -> None:
+        for future, predicate in tuple(self._waiters.get(packet.packet_id, ())):
+            if future.done():
+                continue  # Resolved by an earlier packet, removal is pending.
+            try:
+                if predicate is None or predicate(data):
+                    future.set_result(data)
+            except Exception as e:
+                future.set_exception(e)
+
+    def stream(self, types: AbstractSet[Type[Packet]], maxsize: int = 1000) -> PacketStream:
+        """Iterate over the received packets of ``types`` as ``(packet, data)`` tuples::
+
+            async with protocol.stream({ServerChat, ServerConsole}) as packets:
+                async for packet, data in packets:
+                    ...
+
+        Every stream has its own queue of at most ``maxsize`` packets (0 for no limit); while
+        any of them is full, reading from the connection is paused. Only the packet types
+        that somebody handles, waits for or streams are decoded. The stream ends when the
+        connection is closed, and raises the error if it was lost because of one.
+        """
+        stream = PacketStream(self, types, maxsize)
+        if self._lost:
+            stream.finish()
+        else:
+            self._streams.add(stream)
+        return stream
+
+    # Async handlers
+
+    def _get_async_handlers(self, packet_id: int):
+        handlers = self._handlers
+        if handlers is not None and packet_id in handlers:
+            return handlers[packet_id]
+        entry = OttdClientMixIn.get_handlers(self, packet_id)
+        if entry is not None and any(inspect.iscoroutinefunction(handler) for handler in entry):
+            ordered = self.ordered_handlers
+            if ordered is not True:
+                ordered = ordered and any(klass.packet_id == packet_id for klass in ordered)
+            handler, raw_handler = entry
+            dispatch = self._async_dispatcher(handler, raw_handler, packet_id if ordered else None)
+            entry = (None if inspect.iscoroutinefunction(handler) else handler, dispatch)
+            self._handlers[packet_id] = entry
+        return entry
+
+    def _async_dispatcher(
+        self, handler: Optional[Callable], raw_handler: Optional[Callable], key: Optional[int]
+    ) -> Callable:
+        # Called as the raw handler, so that the calls can be timed with their packet and data.
+        async_handler = handler if inspect.iscoroutinefunction(handler) else None
+        if inspect.iscoroutinefunction(raw_handler):
+            def dispatch(packet: Packet, data: Any) -> None:
+                if async_handler is not None:
+                    # noinspection PyProtectedMember
+                    self._submit_handler(key, async_handler, data._asdict(), packet, data)
+                self._submit_handler(key, raw_handler, {"packet": packet, "data": data}, packet, data)
+
+            dispatch.reports_timing = True
+        elif raw_handler is not None:
+            # A plain raw handler behind an async handler; it is timed as this call.
+            @functools.wraps(raw_handler)
+            def dispatch(packet: Packet, data: Any) -> None:
+                # noinspection PyProtectedMember
+                self._submit_handler(key, async_handler, data._asdict(), packet, data)
+                raw_handler(packet=packet, data=data)
+        else:
+            def dispatch(packet: Packet, data: Any) -> None:
+                # noinspection PyProtectedMember
+                self._submit_handler(key, async_handler, data._asdict(), packet, data)
+
+            dispatch.reports_timing = True
+        return dispatch
+
+    def _submit_handler(
+        self, key: Optional[int], handler: Callable, kwargs: Dict[str, Any], packet: Packet, data: Any
+    ) -> None:
+        if threading.get_ident() != self._loop_thread:
+            # Called from a worker thread, e.g. with ExecutorMixIn; the backlog belongs to the loop.
+            self.loop.call_soon_threadsafe(self._submit_handler, key, handler, kwargs, packet, data)
+            return
+        job = (key, handler, kwargs, packet, data)
+        self._handlers_pending += 1
+        if key is not None:
+            waiting = self._handler_ordered.get(key)
+            if waiting is not None:
+                waiting.append(job)  # Behind the running call for this packet type.
+                self._check_handler_backlog()
+                return
+            self._handler_ordered[key] = deque()
+        if len(self._handler_tasks) < self.max_concurrent_handlers:
+            self._start_handler(job)
+        else:
+            self._handler_backlog.append(job)
+            self._check_handler_backlog()
+
+    def _check_handler_backlog(self) -> None:
+        if not self._handlers_paused and self._handlers_pending > self.max_pending_handlers:
+            self._handlers_paused = True
+            self.log.debug("Too many handler calls waiting, pausing reading")
+            self.pause_reading()
+
+    def _start_handler(self, job: Tuple[Optional[int], Callable, Dict[str, Any], Packet, Any]) -> None:
+        self._handler_taken()
+        first = [job]
+        task = self.loop.create_task(self._handler_worker(first))
+        self._handler_tasks.add(task)
+        task.add_done_callback(functools.partial(self._handler_task_done, first))
+
+    def _handler_task_done(
+        self, first: List[Tuple[Optional[int], Callable, Dict[str, Any], Packet, Any]], task: asyncio.Task
+    ) -> None:
+        self._handler_tasks.discard(task)
+        if first:
+            # Cancelled before its first step, so the worker never took the job.
+            self._release_handler_key(first.pop()[0])
+        if task.cancelled() and self._handler_backlog and len(self._handler_tasks) < self.max_concurrent_handlers:
+            # Only this task was cancelled; the calls queued behind it still run.
+            self._start_handler(self._handler_backlog.popleft())
+
+    def _handler_taken(self) -> None:
+        self._handlers_pending -= 1
+        if self._handlers_paused and self._handlers_pending <= self.max_pending_handlers // 2:
+            self._handlers_paused = False
+            self.resume_reading()
+
+    def _release_handler_key(self, key: Optional[int]) -> None:
+        # Hands the packet type over to the next queued call, if any.
+        if key is None:
+            return
+        waiting = self._handler_ordered[key]
+        if waiting:
+            self._handler_backlog.append(waiting.popleft())
+        else:
+            del self._handler_ordered[key]
+
+    async def _handler_worker(self, first: List[Tuple[Optional[int], Callable, Dict[str, Any], Packet, Any]]) -> None:
+        # Runs queued calls until the backlog is empty, one task per concurrency slot.
+        job = first.pop()
+        while True:
+            key, handler, kwargs, packet, data = job
+            start = time.perf_counter()
+            try:
+                await handler(**kwargs)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.handler_failed(handler, kwargs, e)
+            finally:
+                self._release_handler_key(key)
+            if self.metrics is not None or self.slow_handler_threshold is not None:
+                # Includes the time spent waiting while other tasks ran.
+                self._report_handler(handler, start, packet, data)
+            if not self._handler_backlog:
+                return
+            job = self._handler_backlog.popleft()
+            self._handler_taken()
+
+    def handler_failed(self, handler: Callable, kwargs: Dict[str, Any], exc: Exception) -> None:
+        """Called when an async handler raised ``exc``; logs it by default."""
+        self.log.error("Handler %s failed", getattr(handler, "__name__", handler), exc_info=exc)
+
+    async def wait_handlers(self) -> None:
+        """Wait until all async handler calls so far, and the ones they led to, are done."""
+        while self._handler_tasks:
+            await asyncio.wait(set(self._handler_tasks))
 
     @classmethod
     async def connect(
@@ -76,6 +660,24 @@ class OttdAdminProtocol(OttdClientMixIn, asyncio.Protocol):
         return protocol
 
 
+@loggable
+class OttdAdminBufferedProtocol(OttdAdminProtocol, asyncio.BufferedProtocol):
+    """Variant of :class:`OttdAdminProtocol` that lets the transport read straight into
+    the receive buffer (``get_buffer``/``buffer_updated``) instead of handing over a new
+    ``bytes`` object for every chunk. Packets are framed in place, handlers are called
+    exactly like they are for :class:`OttdAdminProtocol`.
+    """
+
+    # noinspection PyUnusedLocal
+    def __init__(self, loop, buffer_size: int = TCP_MTU * 2, **kwargs):
+        super().__init__(loop, **kwargs)
+        self._buffer = ReceiveBuffer(size=buffer_size, min_free=TCP_MTU)
+
+
 __all__ = [
+    "BoundedStream",
     "OttdAdminProtocol",
+    "OttdAdminBufferedProtocol",
+    "PacketStream",
+    "RconStream",
 ]
@@ -4,17 +4,35 @@
 # License: http://creativecommons.org/licenses/by-nc-sa/3.0/
 #
 
+import cProfile
+import inspect
+import io
+import pstats
+import time
 from asyncio import transports
-from typing import Tuple, Any, Optional
+from functools import partial
+from operator import methodcaller
+from typing import Tuple, Any, Optional, Callable, Type
 
+from libottdadmin2.capture import CaptureWriter
 from libottdadmin2.client.crypto import CryptoHandler
+from libottdadmin2.constants import MAC_SIZE
+from libottdadmin2.metrics import ClientMetrics
 from libottdadmin2.packets import AdminAuthResponse, AdminJoin, AdminJoinSecure, AdminQuit, Packet
 from libottdadmin2.util import loggable, camel_to_snake
 
 
+def _handler_name(handler: Callable) -> str:
+    """Name to report a handler under: ``on_*`` methods by name, other callables by qualified name."""
+    handler = inspect.unwrap(handler)
+    if inspect.ismethod(handler):
+        return handler.__name__
+    return getattr(handler, "__qualname__", None) or repr(handler)
+
+
 @loggable
 class OttdClientMixIn:
-    _buffer = None  # Type: bytes
+    _buffer = None  # Type: ReceiveBuffer
     _use_insecure_join = False # Type: bool
     _password = None  # Type: Optional[str]
     _user_agent = None  # Type: Optional[str]
@@ -24,6 +42,35 @@ class OttdClientMixIn:
     _decryption_handler = None # Type: IncrementalAuthenticatedEncryption
     _encryption_handler = None # Type: IncrementalAuthenticatedEncryption
     __crypto_handler = None # Type: CryptoHandler
+    _handlers = None  # Type: Optional[Dict[int, Optional[Tuple[Optional[Callable], Optional[Callable]]]]]
+    # Per class (kept in each class' own __dict__): packet id -> names of the on_* handlers it defines.
+    _class_handlers = None  # Type: Optional[Dict[int, Optional[Tuple[Optional[str], Optional[str]]]]]
+    _handler_overrides = None  # Type: Optional[Dict[Tuple[int, bool], Callable]]
+    # Whether on_* attributes have been set on the instance, which the class tables don't know about.
+    _instance_handlers = False  # Type: bool
+    _listeners = None  # Type: Optional[Dict[int, List[Callable]]]
+    capture = None  # Type: Optional[CaptureWriter]
+    _reading_paused = False  # Type: bool
+    # Hand out LazyPacketData views that only decode the fields handlers read, see Packet.decode_lazy.
+    lazy_decode = False  # Type: bool
+    metrics = None  # Type: Optional[ClientMetrics]
+    # Handlers taking at least this many seconds are reported to slow_handler().
+    slow_handler_threshold = None  # Type: Optional[float]
+    _profile_every = None  # Type: Optional[Dict[int, int]]
+    _profile_counts = None  # Type: Optional[Dict[int, int]]
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name.startswith("on_"):
+            self._instance_handlers = True
+            self._handlers = None
+            self.handlers_changed()
+
+    def __delattr__(self, name: str) -> None:
+        super().__delattr__(name)
+        if name.startswith("on_"):
+            self._handlers = None
+            self.handlers_changed()
 
     def configure(
         self,
@@ -84,25 +131,313 @@ class OttdClientMixIn:
                 )
             )
 
+    def get_buffer(self, sizehint: int = -1) -> memoryview:
+        return self._buffer.get_buffer(sizehint)
+
+    def buffer_updated(self, nbytes: int) -> None:
+        self._buffer.buffer_updated(nbytes)
+        self._process_buffer()
+
     def data_received(self, data: bytes) -> None:
-        self._buffer += data
-        while True:
-            found, length, packet = Packet.extract(self._buffer, self._decryption_handler)
-            self._buffer = self._buffer[length:]
-            if not found:
+        self._buffer.feed(data)
+        self._process_buffer()
+
+    def _process_buffer(self) -> None:
+        # With metrics enabled the extract and decode steps are swapped for measuring versions.
+        metrics = self.metrics
+        decode = methodcaller("decode_lazy" if self.lazy_decode else "decode")
+        if metrics is None:
+            extract = self._buffer.extract
+        else:
+            metrics.buffer_level(len(self._buffer))
+            extract = partial(self._extract_measured, metrics)
+            decode = partial(self._decode_measured, metrics, decode)
+        # Packets nobody handles are not decoded, unless packet_received has been overridden.
+        always_decode = type(self).packet_received is not OttdClientMixIn.packet_received
+        received = time.time() if self.capture is not None else None
+        while not self._reading_paused:
+            # The decryption handler can change while handling a packet, so look it up every time.
+            found, length, packet = extract(self._decryption_handler)
+            if not length:
                 break
-            self.packet_received(packet, packet.decode())
+            if not found:
+                continue
+            if self.capture is not None:
+                self.capture.write_packet(packet, received)
+            if always_decode or self.is_handled(packet.packet_id):
+                self.packet_received(packet, decode(packet))
+            elif metrics is not None:
+                metrics.skipped_bytes += length
+
+    def _extract_measured(
+        self, metrics: ClientMetrics, decryption_handler: Optional[Any]
+    ) -> Tuple[bool, int, Optional[Packet]]:
+        start = time.perf_counter()
+        found, length, packet = self._buffer.extract(decryption_handler)
+        if not length:
+            return found, length, packet
+        overhead = 0
+        if decryption_handler is not None:
+            metrics.decrypt_time.observe(time.perf_counter() - start)
+            overhead = MAC_SIZE
+        if found:
+            metrics.packet_received(packet.__class__.__name__, length, overhead)
+        else:
+            metrics.skipped_bytes += length
+        return found, length, packet
+
+    @staticmethod
+    def _decode_measured(metrics: ClientMetrics, decode: Callable[[Packet], Any], packet: Packet) -> Any:
+        start = time.perf_counter()
+        data = decode(packet)
+        metrics.decode_time[packet.__class__.__name__].observe(time.perf_counter() - start)
+        return data
+
+    def _frame_measured(self, packet: Packet) -> bytes:
+        """``packet.write_to_buffer`` for sending, recording it in the metrics."""
+        encryption_handler = self._encryption_handler
+        start = time.perf_counter()
+        data = packet.write_to_buffer(encryption_handler)
+        if encryption_handler is not None:
+            self.metrics.encrypt_time.observe(time.perf_counter() - start)
+        self.metrics.packet_sent(packet.__class__.__name__, len(data), MAC_SIZE if encryption_handler else 0)
+        return data
+
+    def enable_metrics(self) -> ClientMetrics:
+        """Start collecting :mod:`libottdadmin2.metrics` for this connection."""
+        if self.metrics is None:
+            self.metrics = ClientMetrics()
+        return self.metrics
+
+    def disable_metrics(self) -> None:
+        self.metrics = None
+
+    def start_capture(self, path: str) -> CaptureWriter:
+        """Record all received packets to a capture file, see :mod:`libottdadmin2.capture`."""
+        self.stop_capture()
+        self.capture = CaptureWriter(path, peername=self.peername)
+        return self.capture
+
+    def stop_capture(self) -> None:
+        if self.capture is not None:
+            self.capture.close()
+            self.capture = None
+
+    def invalidate_handlers(self) -> None:
+        """Forget the looked up ``on_*`` handlers; call after changing them on the class or instance at runtime.
+
+        Handlers set with :meth:`set_handler` or assigned to the instance invalidate the table automatically.
+        """
+        self._handlers = None
+        type(self)._class_handlers = None
+        self.handlers_changed()
+
+    def set_handler(self, packet_class: Type[Packet], handler: Optional[Callable], raw: bool = False) -> None:
+        """Use ``handler`` instead of ``on_<packet>`` (``on_<packet>_raw`` with ``raw``) on this instance.
+
+        Passing None removes the handler again, falling back to the one of the class.
+        """
+        if self._handler_overrides is None:
+            self._handler_overrides = {}
+        key = (packet_class.packet_id, raw)
+        if handler is not None:
+            self._handler_overrides[key] = handler
+        else:
+            self._handler_overrides.pop(key, None)
+        self._handlers = None
+        self.handlers_changed()
+
+    def handlers_changed(self) -> None:
+        """Called whenever ``on_*`` handlers or listeners have been added or removed."""
+        pass
+
+    def add_listener(self, packet_class: Type[Packet], listener: Callable) -> None:
+        """Call ``listener(packet=packet, data=data)`` for every received ``packet_class``."""
+        if self._listeners is None:
+            self._listeners = {}
+        self._listeners.setdefault(packet_class.packet_id, []).append(listener)
+        self.handlers_changed()
+
+    def remove_listener(self, packet_class: Type[Packet], listener: Callable) -> None:
+        listeners = (self._listeners or {}).get(packet_class.packet_id)
+        if not listeners or listener not in listeners:
+            return
+        listeners.remove(listener)
+        if not listeners:
+            del self._listeners[packet_class.packet_id]
+        self.handlers_changed()
+
+    def is_handled(self, packet_id: int) -> bool:
+        """Whether a handler or listener exists for the packet id."""
+        if self._listeners and packet_id in self._listeners:
+            return True
+        return self.get_handlers(packet_id) is not None
+
+    def get_handlers(
+        self, packet_id: int
+    ) -> Optional[Tuple[Optional[Callable], Optional[Callable]]]:
+        """Return the bound ``(on_<packet>, on_<packet>_raw)`` handlers for a packet id.
+
+        Returns None when neither handler exists. Which handlers a class defines is looked up once
+        per class, the bound handlers once per instance, until :meth:`invalidate_handlers` is called
+        or an ``on_*`` attribute is assigned to the instance.
+        """
+        handlers = self._handlers
+        if handlers is None:
+            handlers = self._handlers = {}
+        try:
+            return handlers[packet_id]
+        except KeyError:
+            pass
+        if self._instance_handlers:
+            names = None
+            klass = Packet._registry.get(packet_id)
+            if klass is not None:
+                func_name = camel_to_snake(klass.__name__)
+                names = ("on_%s" % func_name, "on_%s_raw" % func_name)
+        else:
+            names = self._class_handler_names(packet_id)
+        handler = raw_handler = None
+        if names:
+            handler, raw_handler = (getattr(self, name, None) if name else None for name in names)
+        handler = handler if callable(handler) else None
+        raw_handler = raw_handler if callable(raw_handler) else None
+        overrides = self._handler_overrides
+        if overrides:
+            handler = overrides.get((packet_id, False), handler)
+            raw_handler = overrides.get((packet_id, True), raw_handler)
+        entry = (handler, raw_handler) if handler or raw_handler else None
+        handlers[packet_id] = entry
+        return entry
+
+    @classmethod
+    def _class_handler_names(cls, packet_id: int) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        # Looked up in cls.__dict__ so that subclasses don't share the table of their parent.
+        table = cls.__dict__.get("_class_handlers")
+        if table is None:
+            table = cls._class_handlers = {}
+        try:
+            return table[packet_id]
+        except KeyError:
+            pass
+        names = None
+        klass = Packet._registry.get(packet_id)
+        if klass is not None:
+            func_name = camel_to_snake(klass.__name__)
+            names = tuple(
+                name if callable(getattr(cls, name, None)) else None
+                for name in ("on_%s" % func_name, "on_%s_raw" % func_name)
+            )
+            if names == (None, None):
+                names = None
+        table[packet_id] = names
+        return names
 
     def packet_received(self, packet: Packet, data: Tuple[Any, ...]) -> None:
         self.log.debug("Packet received: %r", data)
-        func_name = camel_to_snake(packet.__class__.__name__)
-        handler = getattr(self, "on_%s" % func_name, None)
-        if handler and callable(handler):
+        if self.metrics is not None or self.slow_handler_threshold is not None or self._profile_every:
+            return self._packet_received_measured(packet, data)
+        self._dispatch(packet, data, False)
+
+    def _dispatch(self, packet: Packet, data: Tuple[Any, ...], timed: bool, profiled: bool = False) -> None:
+        """Call the handlers and listeners of a packet; with ``timed`` each call is passed to _handler_timed."""
+        handlers = self.get_handlers(packet.packet_id)
+        if handlers is not None:
+            self._call_handlers(handlers, packet, data, timed, profiled)
+        if self._listeners:
+            # Copy, listeners are allowed to detach themselves.
+            for listener in tuple(self._listeners.get(packet.packet_id, ())):
+                start = time.perf_counter() if timed else 0.0
+                listener(packet=packet, data=data)
+                if timed:
+                    self._report_handler(listener, start, packet, data)
+
+    def _call_handlers(
+        self,
+        handlers: Tuple[Optional[Callable], Optional[Callable]],
+        packet: Packet,
+        data: Tuple[Any, ...],
+        timed: bool,
+        profiled: bool = False,
+    ) -> None:
+        """Call the ``(on_<packet>, on_<packet>_raw)`` handlers of a packet.
+
+        ``profiled`` tells that the call runs under the profile of a sampled packet already; an
+        override running the handlers elsewhere should profile them there with :meth:`_profiled`.
+        """
+        handler, raw_handler = handlers
+        if handler:
+            start = time.perf_counter() if timed else 0.0
             # noinspection PyProtectedMember,PyUnresolvedReferences
             handler(**data._asdict())
-        handler = getattr(self, "on_%s_raw" % func_name, None)
-        if handler and callable(handler):
-            handler(packet=packet, data=data)
+            if timed:
+                self._report_handler(handler, start, packet, data)
+        if raw_handler:
+            start = time.perf_counter() if timed else 0.0
+            raw_handler(packet=packet, data=data)
+            if timed:
+                self._report_handler(raw_handler, start, packet, data)
+
+    def _packet_received_measured(self, packet: Packet, data: Tuple[Any, ...]) -> None:
+        packet_id = packet.packet_id
+        every = self._profile_every.get(packet_id) if self._profile_every else None
+        if every is not None:
+            count = self._profile_counts[packet_id] = self._profile_counts.get(packet_id, 0) + 1
+            if count % every == 0:
+                self._profiled(packet, data, self._dispatch, packet, data, True, True)
+                return
+        self._dispatch(packet, data, True)
+
+    def _profiled(self, packet: Packet, data: Tuple[Any, ...], func: Callable, *args) -> None:
+        """Run ``func(*args)`` under cProfile and pass the statistics to :meth:`handler_profiled`."""
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            func(*args)
+        finally:
+            profile.disable()
+        self.handler_profiled(packet, data, pstats.Stats(profile))
+
+    def _report_handler(self, handler: Callable, start: float, packet: Packet, data: Tuple[Any, ...]) -> None:
+        # Handlers that only schedule the real work report its duration themselves.
+        if not getattr(handler, "reports_timing", False):
+            self._handler_timed(_handler_name(handler), time.perf_counter() - start, packet, data)
+
+    def _handler_timed(self, name: str, elapsed: float, packet: Packet, data: Tuple[Any, ...]) -> None:
+        if self.metrics is not None:
+            self.metrics.handler_time[name].observe(elapsed)
+        threshold = self.slow_handler_threshold
+        if threshold is not None and elapsed >= threshold:
+            self.slow_handler(name, elapsed, packet, data)
+
+    def slow_handler(self, name: str, elapsed: float, packet: Packet, data: Tuple[Any, ...]) -> None:
+        """Called after a handler took longer than :attr:`slow_handler_threshold` seconds.
+
+        Nothing else is read from the connection while a handler runs; override to emit an
+        event or to collect the offenders instead of logging.
+        """
+        self.log.warning("Slow handler %s took %.1f ms for %s", name, elapsed * 1000, packet.__class__.__name__)
+
+    def profile_packets(self, packet_class: Type[Packet], every: int = 100) -> None:
+        """Profile the handling of one in every ``every`` packets of ``packet_class`` with cProfile.
+
+        The statistics are passed to :meth:`handler_profiled`. An ``every`` of 0 stops profiling.
+        """
+        if self._profile_every is None:
+            self._profile_every = {}
+            self._profile_counts = {}
+        if every:
+            self._profile_every[packet_class.packet_id] = every
+        else:
+            self._profile_every.pop(packet_class.packet_id, None)
+            self._profile_counts.pop(packet_class.packet_id, None)
+
+    def handler_profiled(self, packet: Packet, data: Tuple[Any, ...], stats: pstats.Stats) -> None:
+        """Called with the profile of handling a sampled packet; logs the top entries by default."""
+        output = io.StringIO()
+        stats.stream = output
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(15)
+        self.log.info("Profile of handling %s:\n%s", packet.__class__.__name__, output.getvalue())
 
     def connection_closed(self) -> None:
         pass
@@ -113,6 +448,14 @@ class OttdClientMixIn:
     def send_packet(self, packet: Packet) -> None:
         raise NotImplemented()
 
+    def call_later(self, delay: float, callback: Callable, *args) -> Optional[Any]:
+        """Call ``callback(*args)`` after ``delay`` seconds, while the connection is open.
+
+        Returns a handle with a ``cancel()`` method, or None when the client has nothing to run
+        timers on.
+        """
+        return None
+
     def disconnect(self) -> None:
         self.send_packet(AdminQuit.create())
         self.connection_closed()
@@ -6,15 +6,13 @@
 
 from typing import Tuple, Optional
 
+from libottdadmin2.constants import MAC_SIZE, NONCE_SIZE, PUBLIC_KEY_SIZE  # noqa: F401 (re-exported)
 from libottdadmin2.util import loggable
 from libottdadmin2.enums import AuthenticationMethod
 
 from monocypher import Blake2b, compute_key_exchange_public_key, generate_key, IncrementalAuthenticatedEncryption, key_exchange, lock, wipe
 from os import urandom
 
-MAC_SIZE = 16 # Number of bytes for the message authentication code.
-NONCE_SIZE = 24 # Number of bytes for a nonce (random single use token).
-PUBLIC_KEY_SIZE = 32 # Number of bytes for a public key.
 HEX_SECRET_KEY_LENGTH = 64 # Size of the secret key as hexadecimal string.
 
 @loggable
@@ -0,0 +1,313 @@
+#
+# This file is part of libottdadmin2
+#
+# License: http://creativecommons.org/licenses/by-nc-sa/3.0/
+#
+
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+from libottdadmin2.packets import (
+    Packet,
+    ServerAuthRequest,
+    ServerError,
+    ServerNewGame,
+    ServerProtocol,
+    ServerShutdown,
+    ServerWelcome,
+)
+from libottdadmin2.packets.server import ServerEnableEncryption
+from libottdadmin2.util import loggable
+
+# Session level packets, their handlers authenticate, (re)subscribe or close the connection
+# and have to run before the next packet is read.
+INLINE_PACKETS = frozenset(
+    packet.packet_id
+    for packet in (
+        ServerAuthRequest,
+        ServerEnableEncryption,
+        ServerError,
+        ServerNewGame,
+        ServerProtocol,
+        ServerShutdown,
+        ServerWelcome,
+    )
+)
+
+
+class OverloadPolicy(Enum):
+    BLOCK = "block"  # Wait for room; asyncio clients pause reading instead.
+    DROP_OLDEST = "drop_oldest"  # Throw away the oldest queued call, of any key.
+    COALESCE = "coalesce"  # Replace a queued call with the same coalesce key, otherwise block.
+
+
+class _Call:
+    __slots__ = ("sequence", "coalesce_key", "func", "args")
+
+    def __init__(self, sequence: int, coalesce_key: Optional[Hashable], func: Callable, args: Tuple[Any, ...]):
+        self.sequence = sequence
+        self.coalesce_key = coalesce_key
+        self.func = func
+        self.args = args
+
+
+@loggable
+class OrderedExecutor:
+    """A thread pool that runs calls with the same key one after the other, in order.
+
+    Calls with different keys run in parallel on up to ``max_workers`` threads. At most
+    ``maxsize`` calls are queued over all keys; what happens beyond that is up to ``policy``.
+    One executor can be shared by many connections.
+    """
+
+    batch_size = 16  # Calls run for one key before giving other keys a turn.
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        maxsize: int = 10000,
+        policy: OverloadPolicy = OverloadPolicy.BLOCK,
+        thread_name_prefix: str = "ottd-handler",
+    ):
+        self.maxsize = maxsize
+        self.policy = OverloadPolicy(policy)
+        self.pending = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.errors = 0
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix=thread_name_prefix)
+        self._lock = threading.Condition()
+        self._queues = {}  # Type: Dict[Hashable, Deque[_Call]]
+        self._coalescable = {}  # Type: Dict[Hashable, Dict[Hashable, _Call]]
+        self._active = set()  # Keys that have a worker.
+        self._space_callbacks = []  # Type: List[Callable[[], None]]
+        self._sequence = itertools.count()
+        self._shutdown = False
+
+    @property
+    def full(self) -> bool:
+        return self.pending >= self.maxsize
+
+    def submit(
+        self,
+        key: Hashable,
+        func: Callable,
+        *args,
+        coalesce_key: Optional[Hashable] = None,
+        wait: bool = True
+    ) -> bool:
+        """Queue ``func(*args)`` behind the other calls for ``key``.
+
+        :param coalesce_key: Calls of the same key and coalesce key replace each other while
+            queued, when the policy is COALESCE and the executor is full.
+        :param wait: When the executor is full and the policy blocks, wait for room. Otherwise
+            the call is queued over the limit and the caller is expected to hold back, see
+            :meth:`call_when_space`.
+        :return: False when the call was coalesced into a queued call.
+        """
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("Executor has been shut down")
+            if self.pending >= self.maxsize:
+                if self.policy is OverloadPolicy.COALESCE and coalesce_key is not None:
+                    queued = self._coalescable.get(key, {}).get(coalesce_key)
+                    if queued is not None:
+                        queued.func, queued.args = func, args
+                        self.coalesced += 1
+                        return False
+                if self.policy is OverloadPolicy.DROP_OLDEST:
+                    self._drop_oldest()
+                elif wait:
+                    while self.pending >= self.maxsize and not self._shutdown:
+                        self._lock.wait()
+            call = _Call(next(self._sequence), coalesce_key, func, args)
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = self._queues[key] = deque()
+            queue.append(call)
+            if coalesce_key is not None:
+                self._coalescable.setdefault(key, {})[coalesce_key] = call
+            self.pending += 1
+            if key not in self._active:
+                self._active.add(key)
+                self._pool.submit(self._run, key)
+        return True
+
+    def _drop_oldest(self) -> None:
+        oldest_key, oldest = None, None
+        for key, queue in self._queues.items():
+            if queue and (oldest is None or queue[0].sequence < oldest.sequence):
+                oldest_key, oldest = key, queue[0]
+        if oldest is None:
+            return
+        self._take(oldest_key)
+        self.dropped += 1
+
+    def _take(self, key: Hashable) -> _Call:
+        # With the lock held.
+        call = self._queues[key].popleft()
+        if call.coalesce_key is not None:
+            coalescable = self._coalescable[key]
+            if coalescable.get(call.coalesce_key) is call:
+                del coalescable[call.coalesce_key]
+                if not coalescable:
+                    del self._coalescable[key]
+        self.pending -= 1
+        return call
+
+    def _run(self, key: Hashable) -> None:
+        for _ in range(self.batch_size):
+            with self._lock:
+                queue = self._queues.get(key)
+                if not queue:
+                    self._queues.pop(key, None)
+                    self._active.discard(key)
+                    return
+                call = self._take(key)
+                callbacks = self._space_available()
+            for callback in callbacks:
+                callback()
+            try:
+                call.func(*call.args)
+            except Exception as e:
+                self.errors += 1
+                self.call_failed(call.func, call.args, e)
+        # Give the other keys a turn; the key stays active, so its order is kept.
+        with self._lock:
+            if not self._queues.get(key):
+                self._queues.pop(key, None)
+                self._active.discard(key)
+                return
+        try:
+            self._pool.submit(self._run, key)
+        except RuntimeError:  # Shut down without waiting.
+            with self._lock:
+                self._active.discard(key)
+
+    def _space_available(self) -> list:
+        # With the lock held; returns the callbacks to call once the lock is released.
+        if self.pending < self.maxsize:
+            self._lock.notify_all()
+        if self._space_callbacks and self.pending <= self.maxsize // 2:
+            callbacks, self._space_callbacks = self._space_callbacks, []
+            return callbacks
+        return []
+
+    def call_when_space(self, callback: Callable[[], None]) -> None:
+        """Call ``callback()`` once at most half of ``maxsize`` calls are queued.
+
+        It is called from a worker thread, or right away when there is room already.
+        """
+        with self._lock:
+            if self.pending > self.maxsize // 2:
+                self._space_callbacks.append(callback)
+                return
+        callback()
+
+    def call_failed(self, func: Callable, args: Tuple[Any, ...], exc: Exception) -> None:
+        """Called from the worker thread when a call raised."""
+        self.log.error("Offloaded call %r failed", func, exc_info=exc)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting calls; with ``wait`` the queued calls are run first."""
+        with self._lock:
+            if not wait:
+                self.pending -= sum(len(queue) for queue in self._queues.values())
+                self._queues.clear()
+                self._coalescable.clear()
+            self._shutdown = True
+            self._lock.notify_all()
+        if wait:
+            with self._lock:
+                while self.pending or self._active:
+                    self._lock.wait(0.01)
+        self._pool.shutdown(wait=wait)
+
+
+@loggable
+class ExecutorMixIn:
+    """Run the ``on_*`` handlers on an :class:`OrderedExecutor` instead of the I/O thread or loop.
+
+    Mix in before the client class (``class Client(ExecutorMixIn, OttdAdminProtocol)``) and set
+    :attr:`handler_executor`. Handlers for the same :meth:`executor_key` run in the order the
+    packets arrived; by default that is per company or client, and per connection otherwise.
+
+    Listeners and the handlers of session level packets (:data:`INLINE_PACKETS`) keep running
+    inline. Offloaded handlers run in worker threads: the asyncio clients are not thread-safe,
+    send packets from them with ``loop.call_soon_threadsafe(client.send_packet, packet)``. Async
+    handlers of :class:`OttdAdminProtocol` are handed back to its loop and run there.
+    Offloaded handlers are timed and profiled in the worker like inline ones, see
+    :attr:`~OttdClientMixIn.slow_handler_threshold` and :meth:`~OttdClientMixIn.profile_packets`.
+
+    When the executor is full with the BLOCK (or COALESCE) policy, asyncio clients pause
+    reading until it has drained to half; other clients wait in the read path.
+    """
+
+    handler_executor = None  # Type: Optional[OrderedExecutor]
+    # Only offload these packet classes; all but the session level packets when None.
+    offload_packets = None  # Type: Optional[Set[Type[Packet]]]
+    # Packet classes whose queued updates may replace each other under the COALESCE policy.
+    coalesce_packets = frozenset()  # Type: FrozenSet[Type[Packet]]
+    # The first of these fields present in a packet decides its ordering key.
+    executor_key_fields = ("company_id", "client_id")  # Type: Tuple[str, ...]
+    _executor_paused = False  # Type: bool
+
+    def executor_key(self, packet: Packet, data: Any) -> Hashable:
+        """The ordering key of a packet; packets with equal keys are handled in order."""
+        for field in self.executor_key_fields:
+            value = getattr(data, field, None)
+            if value is not None:
+                return self, field, value
+        return self
+
+    def _call_handlers(
+        self,
+        handlers: Tuple[Optional[Callable], Optional[Callable]],
+        packet: Packet,
+        data: Any,
+        timed: bool,
+        profiled: bool = False,
+    ) -> None:
+        executor = self.handler_executor
+        packet_id = packet.packet_id
+        offload = executor is not None and packet_id not in INLINE_PACKETS
+        if offload and self.offload_packets is not None:
+            offload = packet.__class__ in self.offload_packets
+        if not offload:
+            super()._call_handlers(handlers, packet, data, timed, profiled)
+            return
+        # The worker calls the handlers the same way, timed and profiled there when asked for.
+        args = (super()._call_handlers, handlers, packet, data, timed)
+        if profiled:
+            args = (self._profiled, packet, data) + args
+        key = self.executor_key(packet, data)
+        coalesce_key = packet_id if packet.__class__ in self.coalesce_packets else None
+        loop = getattr(self, "loop", None)
+        executor.submit(key, *args, coalesce_key=coalesce_key, wait=loop is None)
+        if loop is not None and executor.full and executor.policy is not OverloadPolicy.DROP_OLDEST:
+            self._executor_pause(loop, executor)
+
+    def _executor_pause(self, loop, executor: OrderedExecutor) -> None:
+        if self._executor_paused:
+            return
+        self._executor_paused = True
+        self.log.debug("Handler executor full, pausing reading")
+        self.pause_reading()
+        executor.call_when_space(lambda: loop.call_soon_threadsafe(self._executor_resume))
+
+    def _executor_resume(self) -> None:
+        if self._executor_paused:
+            self._executor_paused = False
+            self.resume_reading()
+
+
+__all__ = [
+    "ExecutorMixIn",
+    "INLINE_PACKETS",
+    "OrderedExecutor",
+    "OverloadPolicy",
+]
@@ -0,0 +1,245 @@
+#
+# This file is part of libottdadmin2
+#
+# License: http://creativecommons.org/licenses/by-nc-sa/3.0/
+#
+
+import functools
+import heapq
+import itertools
+import random
+import time
+# noinspection PyProtectedMember
+from selectors import DefaultSelector, _BaseSelectorImpl
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+from libottdadmin2.client.sync import OttdSocket
+from libottdadmin2.constants import NETWORK_ADMIN_PORT
+from libottdadmin2.packets import Packet, ServerWelcome
+from libottdadmin2.util import loggable
+
+
+class Timer:
+    """A callback scheduled on a :class:`OttdSocketHub`; cancel it with :meth:`cancel`."""
+
+    __slots__ = ("when", "callback", "args", "cancelled")
+
+    def __init__(self, when: float, callback: Callable, args: Tuple[Any, ...]):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class HubConnection:
+    """One managed server of a :class:`OttdSocketHub`; :attr:`socket` changes on every reconnect."""
+
+    def __init__(self, name: str, address: Tuple[str, int], socket_class: Type[OttdSocket], kwargs: Dict[str, Any]):
+        self.name = name
+        self.address = address
+        self.socket_class = socket_class
+        self.kwargs = kwargs
+        self.socket = None  # Type: Optional[OttdSocket]
+        self.connects = 0  # Successful connects, including reconnects.
+        self.failures = 0  # Consecutive connects that failed or ended before a welcome, drives the backoff.
+        self.timer = None  # Type: Optional[Timer]
+
+    @property
+    def connected(self) -> bool:
+        return self.socket is not None and self.socket.connected
+
+
+@loggable
+class OttdSocketHub:
+    """Run many :class:`OttdSocket` connections from a single selector loop, without threads.
+
+    Connections are set up without blocking, writes are queued and flushed when the socket is
+    writable, and dropped or failed connections are reconnected with jittered exponential
+    backoff, using timers on the same loop. The backoff is reset once a server has welcomed us.
+    Each (re)connect creates a new socket of the connection's socket class; handlers run from
+    :meth:`run_once`. A handler raising, or a server sending garbage, only closes (and so
+    reconnects) that connection.
+
+    :param selector: The selector to use; other sockets registered to it with a
+        ``callback(fileobj, mask)`` as data are served as well.
+    """
+
+    def __init__(
+        self,
+        selector: Optional[_BaseSelectorImpl] = None,
+        connect_timeout: float = 10.0,
+        reconnect_delay: float = 1.0,
+        reconnect_max_delay: float = 300.0,
+        reconnect_factor: float = 2.0,
+        reconnect_jitter: float = 0.5,
+    ):
+        self.selector = selector if selector is not None else DefaultSelector()
+        self.connect_timeout = connect_timeout
+        self.reconnect_delay = reconnect_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        self.reconnect_factor = reconnect_factor
+        self.reconnect_jitter = reconnect_jitter
+        self.connections = {}  # Type: Dict[str, HubConnection]
+        self._sockets = {}  # Type: Dict[OttdSocket, HubConnection]
+        self._timers = []  # Type: List[Tuple[float, int, Timer]]
+        self._sequence = itertools.count()
+        self._running = False
+
+    # Timers
+
+    def call_later(self, delay: float, callback: Callable, *args) -> Timer:
+        """Call ``callback(*args)`` from the loop after ``delay`` seconds."""
+        timer = Timer(time.monotonic() + delay, callback, args)
+        heapq.heappush(self._timers, (timer.when, next(self._sequence), timer))
+        return timer
+
+    def _run_timers(self) -> None:
+        timers = self._timers
+        now = time.monotonic()
+        while timers and timers[0][0] <= now:
+            timer = heapq.heappop(timers)[2]
+            if not timer.cancelled:
+                timer.callback(*timer.args)
+
+    # Connections
+
+    def add(
+        self,
+        name: str,
+        host: str = "127.0.0.1",
+        port: int = NETWORK_ADMIN_PORT,
+        socket_class: Type[OttdSocket] = OttdSocket,
+        **kwargs
+    ) -> HubConnection:
+        """Manage a connection to a server; ``kwargs`` are passed to ``socket_class``.
+
+        Connecting starts from the next :meth:`run_once`.
+        """
+        if name in self.connections:
+            raise ValueError("A connection named %r already exists" % name)
+        connection = self.connections[name] = HubConnection(name, (host, port), socket_class, kwargs)
+        connection.timer = self.call_later(0, self._connect, connection)
+        return connection
+
+    def remove(self, name: str) -> None:
+        connection = self.connections.pop(name)
+        if connection.timer is not None:
+            connection.timer.cancel()
+        if connection.socket is not None:
+            connection.socket.close()
+
+    def backoff(self, failures: int) -> float:
+        """Seconds to wait before the next connect after ``failures`` consecutive failures."""
+        if not failures:
+            return 0.0
+        delay = min(self.reconnect_delay * self.reconnect_factor ** (failures - 1), self.reconnect_max_delay)
+        return delay * (1 - self.reconnect_jitter * random.random())
+
+    def _connect(self, connection: HubConnection) -> None:
+        connection.timer = None
+        sock = connection.socket_class(**connection.kwargs)
+        connection.socket = sock
+        self._sockets[sock] = connection
+        sock.close_callback = self._closed
+        sock.add_listener(ServerWelcome, functools.partial(self._welcomed, connection))
+        sock.scheduler = self.call_later
+        sock.register_to_selector(self.selector)
+        try:
+            sock.connect_nonblocking(connection.address)
+        except OSError as e:
+            self.log.info("Connecting %s to %s:%d failed: %s", connection.name, *connection.address, e)
+            sock.close()
+            return
+        if sock.connected:
+            self._connected(connection)
+        else:
+            connection.timer = self.call_later(self.connect_timeout, self._connect_timeout, connection, sock)
+
+    def _connect_timeout(self, connection: HubConnection, sock: OttdSocket) -> None:
+        connection.timer = None
+        if sock.connecting:
+            self.log.info("Connecting %s to %s:%d timed out", connection.name, *connection.address)
+            sock.close()
+
+    def _connected(self, connection: HubConnection) -> None:
+        if connection.timer is not None:
+            connection.timer.cancel()
+            connection.timer = None
+        connection.connects += 1
+
+    @staticmethod
+    def _welcomed(connection: HubConnection, packet: Packet, data: Any) -> None:
+        connection.failures = 0
+
+    def _closed(self, sock: OttdSocket) -> None:
+        connection = self._sockets.pop(sock, None)
+        if connection is None or connection.socket is not sock:
+            return
+        connection.socket = None
+        if connection.timer is not None:
+            connection.timer.cancel()
+        if self.connections.get(connection.name) is not connection:
+            return  # Removed.
+        connection.failures += 1
+        delay = self.backoff(connection.failures)
+        self.log.info("Reconnecting %s in %.1f seconds", connection.name, delay)
+        connection.timer = self.call_later(delay, self._connect, connection)
+
+    # Loop
+
+    def run_once(self, timeout: Optional[float] = None) -> int:
+        """Wait at most ``timeout`` seconds (forever when None) for events, then handle the
+        events and due timers. Returns the number of socket events handled."""
+        if self._timers:
+            until_timer = max(0.0, self._timers[0][0] - time.monotonic())
+            timeout = until_timer if timeout is None else min(timeout, until_timer)
+        if not self.selector.get_map():
+            # Nothing to select on, some selectors do not support waiting on nothing.
+            if timeout:
+                time.sleep(timeout)
+            events = []
+        else:
+            events = self.selector.select(timeout)
+        for key, mask in events:
+            sock = key.fileobj
+            was_connecting = getattr(sock, "connecting", False)
+            try:
+                key.data(sock, mask)
+            except Exception:
+                # Keep serving the other connections; closing this one schedules its reconnect.
+                connection = self._sockets.get(sock)
+                self.log.exception("Error handling events of %s", connection.name if connection else sock)
+                if connection is not None:
+                    sock.close()
+                continue
+            if was_connecting and sock.connected:
+                connection = self._sockets.get(sock)
+                if connection is not None:
+                    self._connected(connection)
+        self._run_timers()
+        return len(events)
+
+    def run(self) -> None:
+        """Handle events until :meth:`stop` is called or there is nothing left to do."""
+        self._running = True
+        while self._running and (self.selector.get_map() or self._timers):
+            self.run_once()
+
+    def stop(self) -> None:
+        self._running = False
+
+    def close(self) -> None:
+        """Close all connections, without reconnecting."""
+        for name in list(self.connections):
+            self.remove(name)
+        self._timers.clear()
+
+
+__all__ = [
+    "HubConnection",
+    "OttdSocketHub",
+    "Timer",
+]
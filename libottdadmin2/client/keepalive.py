@@ -0,0 +1,137 @@
+#
+# This file is part of libottdadmin2
+#
+# License: http://creativecommons.org/licenses/by-nc-sa/3.0/
+#
+
+import random
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from libottdadmin2.exceptions import ConnectionDeadError
+from libottdadmin2.histogram import Histogram
+from libottdadmin2.packets import AdminPing, Packet, ServerPong, ServerWelcome
+from libottdadmin2.util import loggable
+
+MAX_PAYLOAD = 0xFFFFFFFF
+
+
+@loggable
+class KeepaliveMixIn:
+    """Ping the server on a schedule, measure the round trip times and detect dead connections.
+
+    Mix in before the client class (``class Client(KeepaliveMixIn, OttdAdminProtocol)``).
+    Pinging starts once the server welcomed us. Every :attr:`keepalive_interval` seconds an
+    ``AdminPing`` with a unique payload is sent; matching ``ServerPong`` round trip times go
+    into the :attr:`rtt` histogram. When :attr:`keepalive_max_missed` pings in a row are not
+    answered, :meth:`keepalive_timeout` declares the connection dead, which calls
+    ``connection_lost`` with a :class:`~libottdadmin2.exceptions.ConnectionDeadError`.
+
+    The asyncio clients and sockets of a :class:`~libottdadmin2.client.hub.OttdSocketHub`
+    schedule this themselves. Other :class:`~libottdadmin2.client.sync.OttdSocket` loops call
+    :meth:`keepalive_poll` regularly instead.
+    """
+
+    keepalive_interval = 10.0  # Type: float
+    keepalive_max_missed = 3  # Type: int
+    rtt = None  # Type: Optional[Histogram]
+    last_rtt = None  # Type: Optional[float]
+    _keepalive_pings = None  # Type: Optional[OrderedDict[int, float]]
+    _keepalive_payload = 0  # Type: int
+    _keepalive_due = None  # Type: Optional[float]
+    _keepalive_timer = None
+    _keepalive_listening = False  # Type: bool
+
+    def connection_made(self, *args, **kwargs) -> None:
+        if not self._keepalive_listening:
+            self._keepalive_listening = True
+            self.add_listener(ServerWelcome, self._keepalive_welcome)
+            self.add_listener(ServerPong, self._keepalive_pong)
+        super().connection_made(*args, **kwargs)
+
+    def connection_lost(self, exc: Optional[Exception] = None) -> None:
+        self.stop_keepalive()
+        super().connection_lost(exc)
+
+    def connection_closed(self) -> None:
+        self.stop_keepalive()
+        super().connection_closed()
+
+    # noinspection PyUnusedLocal
+    def _keepalive_welcome(self, packet: Packet, data: Any) -> None:
+        self.start_keepalive()
+
+    def start_keepalive(self) -> None:
+        """(Re)start pinging; the first ping goes out right away."""
+        self.stop_keepalive()
+        self.rtt = Histogram()
+        self.last_rtt = None
+        self._keepalive_pings = OrderedDict()
+        self._keepalive_payload = random.randint(0, MAX_PAYLOAD)
+        self._keepalive_due = time.monotonic()
+        self._keepalive_run()
+
+    def stop_keepalive(self) -> None:
+        self._keepalive_due = None
+        if self._keepalive_timer is not None:
+            self._keepalive_timer.cancel()
+            self._keepalive_timer = None
+
+    def _keepalive_run(self) -> None:
+        self._keepalive_timer = None
+        delay = self.keepalive_poll()
+        if delay is not None:
+            self._keepalive_timer = self.call_later(delay, self._keepalive_run)
+
+    def keepalive_poll(self, now: Optional[float] = None) -> Optional[float]:
+        """Send the next ping when it is due; returns the seconds until it should be called again.
+
+        Returns None when keepalive is not running (anymore).
+        """
+        if self._keepalive_due is None:
+            return None
+        if now is None:
+            now = time.monotonic()
+        if now < self._keepalive_due:
+            return self._keepalive_due - now
+        if len(self._keepalive_pings) >= self.keepalive_max_missed:
+            self.keepalive_timeout(len(self._keepalive_pings))
+            return None
+        self._keepalive_payload = payload = (self._keepalive_payload + 1) & MAX_PAYLOAD
+        self._keepalive_pings[payload] = now
+        self._keepalive_due = now + self.keepalive_interval
+        self.send_packet(AdminPing.create(payload=payload))
+        return self.keepalive_interval
+
+    # noinspection PyUnusedLocal
+    def _keepalive_pong(self, packet: Packet, data: Any) -> None:
+        pings = self._keepalive_pings
+        if not pings or data.payload not in pings:
+            return  # Not one of ours.
+        received = time.monotonic()
+        # Pongs come in order, anything sent before this ping is not going to be answered.
+        while True:
+            payload, sent = pings.popitem(last=False)
+            if payload == data.payload:
+                break
+        self.last_rtt = received - sent
+        self.rtt.observe(self.last_rtt)
+
+    @property
+    def missed_pongs(self) -> int:
+        """The number of pings that are unanswered for longer than the ping interval."""
+        if not self._keepalive_pings:
+            return 0
+        now = time.monotonic()
+        return sum(1 for sent in self._keepalive_pings.values() if now - sent >= self.keepalive_interval)
+
+    def keepalive_timeout(self, missed: int) -> None:
+        """Called when ``missed`` pings in a row went unanswered; drops the connection."""
+        self.log.warning("No pong for %d pings in a row, connection is dead", missed)
+        self.connection_lost(ConnectionDeadError("No pong for %d pings in a row" % missed))
+
+
+__all__ = [
+    "KeepaliveMixIn",
+]
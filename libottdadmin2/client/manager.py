@@ -0,0 +1,290 @@
+#
+# This file is part of libottdadmin2
+#
+# License: http://creativecommons.org/licenses/by-nc-sa/3.0/
+#
+
+import asyncio
+import random
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional, Type
+
+from libottdadmin2.client.asyncio import OttdAdminProtocol
+from libottdadmin2.constants import NETWORK_ADMIN_PORT
+from libottdadmin2.packets import Packet, ServerFull, ServerWelcome
+from libottdadmin2.util import loggable
+
+
+class ServerConfig(NamedTuple):
+    name: str  # Identifies the server in events; must be unique within a manager.
+    host: str = "127.0.0.1"
+    port: int = NETWORK_ADMIN_PORT
+    password: Optional[str] = None
+    secret_key: Optional[str] = None
+    use_insecure_join: bool = False
+    protocol_class: Optional[Type[OttdAdminProtocol]] = None  # Overrides the manager's protocol class.
+    options: Dict[str, Any] = {}  # Additional keyword arguments for the protocol.
+
+
+class ServerEvent(NamedTuple):
+    server: str
+    packet: Type[Packet]
+    data: Any
+
+
+class ManagedServer:
+    """Connection state of one server in a :class:`ConnectionManager`."""
+
+    def __init__(self, config: ServerConfig):
+        self.config = config
+        self.protocol = None  # Type: Optional[OttdAdminProtocol]
+        self.connected = False
+        self.connects = 0  # Successful connects, including reconnects.
+        self.failures = 0  # Consecutive failed or dropped connections, drives the backoff.
+        self.task = None  # Type: Optional[asyncio.Task]
+
+
+@loggable
+class ConnectionManager:
+    """Own many admin connections on one event loop.
+
+    Every configured server is connected (with at most ``max_connecting`` connects in flight)
+    and reconnected with jittered exponential backoff when the connection fails or drops. The
+    backoff is reset once a server has welcomed us.
+
+    Received packets of ``event_types`` are merged into a single stream of :class:`ServerEvent`,
+    read through :meth:`get` or ``async for event in manager.events()``. Only these packet types
+    are decoded (unless the protocol class handles others itself). When more than ``max_events``
+    events are waiting, reading from all connections is paused until the backlog has been
+    consumed down to ``resume_events``.
+
+    :param servers: The initial server configurations.
+    :param protocol_class: The protocol to connect with; override per server in its config.
+    :param event_types: Packet classes to put in the event stream; defaults to all server packets.
+    """
+
+    def __init__(
+        self,
+        servers: Iterable[ServerConfig] = (),
+        protocol_class: Type[OttdAdminProtocol] = OttdAdminProtocol,
+        event_types: Optional[Iterable[Type[Packet]]] = None,
+        max_connecting: int = 16,
+        connect_timeout: float = 10.0,
+        reconnect_delay: float = 1.0,
+        reconnect_max_delay: float = 300.0,
+        reconnect_factor: float = 2.0,
+        reconnect_jitter: float = 0.5,
+        max_events: int = 10000,
+        resume_events: Optional[int] = None,
+    ):
+        if event_types is None:
+            event_types = [klass for pid, klass in Packet._registry.items() if pid >= ServerFull.packet_id]
+        self.protocol_class = protocol_class
+        self.event_types = tuple(event_types)
+        self.max_connecting = max_connecting
+        self.connect_timeout = connect_timeout
+        self.reconnect_delay = reconnect_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        self.reconnect_factor = reconnect_factor
+        self.reconnect_jitter = reconnect_jitter
+        self.max_events = max_events
+        self.resume_events = max_events // 2 if resume_events is None else resume_events
+        self.servers = {}  # Type: Dict[str, ManagedServer]
+        self.paused = False
+        self.loop = None  # Type: Optional[asyncio.AbstractEventLoop]
+        self._events = deque()  # Type: Deque[ServerEvent]
+        self._waiter = None  # Type: Optional[asyncio.Future]
+        self._connecting = None  # Type: Optional[asyncio.Semaphore]
+        for config in servers:
+            self.add_server(config)
+
+    # Lifecycle
+
+    async def start(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self._connecting = asyncio.Semaphore(self.max_connecting)
+        for server in self.servers.values():
+            self._start_server(server)
+
+    async def stop(self) -> None:
+        servers = list(self.servers.values())
+        for server in servers:
+            self._stop_server(server)
+        await asyncio.gather(*(server.task for server in servers if server.task), return_exceptions=True)
+        for server in servers:
+            server.task = None
+        self.loop = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    def add_server(self, config: ServerConfig) -> ManagedServer:
+        if config.name in self.servers:
+            raise ValueError("A server named %r is already managed" % config.name)
+        server = self.servers[config.name] = ManagedServer(config)
+        if self.loop is not None:
+            self._start_server(server)
+        return server
+
+    def remove_server(self, name: str) -> None:
+        server = self.servers.pop(name)
+        self._stop_server(server)
+
+    def _start_server(self, server: ManagedServer) -> None:
+        server.task = self.loop.create_task(self._run_server(server))
+
+    def _stop_server(self, server: ManagedServer) -> None:
+        if server.task is not None:
+            server.task.cancel()
+        if server.protocol is not None and server.protocol.transport is not None:
+            server.protocol.transport.close()
+
+    def backoff(self, failures: int) -> float:
+        """Seconds to wait before the next connect after ``failures`` consecutive failures."""
+        if not failures:
+            return 0.0
+        delay = min(self.reconnect_delay * self.reconnect_factor ** (failures - 1), self.reconnect_max_delay)
+        return delay * (1 - self.reconnect_jitter * random.random())
+
+    async def _run_server(self, server: ManagedServer) -> None:
+        config = server.config
+        while True:
+            await asyncio.sleep(self.backoff(server.failures))
+            server.failures += 1
+            try:
+                async with self._connecting:
+                    _, protocol = await asyncio.wait_for(
+                        self.loop.create_connection(lambda: self.create_protocol(server), config.host, config.port),
+                        self.connect_timeout,
+                    )
+            except (OSError, asyncio.TimeoutError) as e:
+                self.log.warning("Connecting to %s (%s:%d) failed: %s", config.name, config.host, config.port, e)
+                continue
+            server.connected = True
+            server.connects += 1
+            if self.paused:
+                protocol.pause_reading()
+            self.connected(server)
+            try:
+                await protocol.client_active
+            finally:
+                server.connected = False
+                server.protocol = None
+                if protocol.transport is not None:
+                    protocol.transport.close()
+            self.disconnected(server)
+
+    def create_protocol(self, server: ManagedServer) -> OttdAdminProtocol:
+        config = server.config
+        protocol_class = config.protocol_class or self.protocol_class
+        protocol = protocol_class(
+            self.loop,
+            password=config.password,
+            secret_key=config.secret_key,
+            use_insecure_join=config.use_insecure_join,
+            **config.options
+        )
+        name = config.name
+        events = self._events
+
+        def listener(packet: Packet, data: Any) -> None:
+            events.append(ServerEvent(name, packet.__class__, data))
+            if self._waiter is not None:
+                self._wakeup()
+            if len(events) >= self.max_events and not self.paused:
+                self._pause()
+
+        def welcomed(packet: Packet, data: Any) -> None:
+            server.failures = 0
+
+        protocol.add_listener(ServerWelcome, welcomed)
+        for packet_class in self.event_types:
+            protocol.add_listener(packet_class, listener)
+        server.protocol = protocol
+        return protocol
+
+    def connected(self, server: ManagedServer) -> None:
+        """Called when a connection to a server has been made; authentication has not happened yet."""
+        self.log.info("Connected to %s", server.config.name)
+
+    def disconnected(self, server: ManagedServer) -> None:
+        """Called when the connection to a server is gone; reconnecting is scheduled already."""
+        self.log.info("Disconnected from %s", server.config.name)
+
+    # Sending
+
+    def send_packet(self, name: str, packet: Packet) -> bool:
+        """Send a packet to a server; returns False when the server is not connected."""
+        server = self.servers.get(name)
+        if server is None or not server.connected:
+            return False
+        server.protocol.send_packet(packet)
+        return True
+
+    def broadcast(self, packet: Packet, predicate: Optional[Callable[[ManagedServer], bool]] = None) -> int:
+        """Send a packet to all connected servers (matching ``predicate``), returns the count."""
+        count = 0
+        for server in self.servers.values():
+            if server.connected and (predicate is None or predicate(server)):
+                server.protocol.send_packet(packet)
+                count += 1
+        return count
+
+    # Event stream
+
+    def _wakeup(self) -> None:
+        waiter, self._waiter = self._waiter, None
+        if not waiter.done():
+            waiter.set_result(None)
+
+    def _pause(self) -> None:
+        self.paused = True
+        for server in self.servers.values():
+            if server.connected:
+                server.protocol.pause_reading()
+
+    def _resume(self) -> None:
+        self.paused = False
+        for server in self.servers.values():
+            if server.connected:
+                server.protocol.resume_reading()
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    async def get(self) -> ServerEvent:
+        """Wait for and return the next event.
+
+        The event stream supports a single consumer: only one :meth:`get` (or :meth:`events`) may
+        be waiting at a time, fan events out from there when several tasks need them.
+        """
+        events = self._events
+        while not events:
+            if self._waiter is not None:
+                raise RuntimeError("get() is already waiting for an event, the event stream has a single consumer")
+            self._waiter = self.loop.create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        event = events.popleft()
+        if self.paused and len(events) <= self.resume_events:
+            self._resume()
+        return event
+
+    async def events(self):
+        """Async generator over the merged event stream, see :meth:`get`."""
+        while True:
+            yield await self.get()
+
+
+__all__ = [
+    "ConnectionManager",
+    "ManagedServer",
+    "ServerConfig",
+    "ServerEvent",
+]
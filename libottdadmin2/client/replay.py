@@ -0,0 +1,144 @@
+#
+# This file is part of libottdadmin2
+#
+# License: http://creativecommons.org/licenses/by-nc-sa/3.0/
+#
+
+import time
+from typing import Iterable, Iterator, NamedTuple, Optional, Tuple, Type
+
+from libottdadmin2.capture import CaptureReader
+from libottdadmin2.client.common import OttdClientMixIn
+from libottdadmin2.packets import Packet, ServerAuthRequest
+from libottdadmin2.packets.server import ServerEnableEncryption
+from libottdadmin2.util import loggable
+
+
+class ReplayStats(NamedTuple):
+    packets: int  # Number of packets pushed through the client.
+    bytes: int  # Number of bytes pushed through the client.
+    duration: float  # Wall clock time of the replay, including waiting when not replaying at full speed.
+    processing_time: float  # Time spent in data_received: framing, decoding and handlers.
+    handler_time: float  # Time spent in packet_received: dispatching and handlers.
+
+    @property
+    def packets_per_second(self) -> float:
+        return self.packets / self.processing_time if self.processing_time else 0.0
+
+    @property
+    def handler_share(self) -> float:
+        return self.handler_time / self.processing_time if self.processing_time else 0.0
+
+
+@loggable
+class CaptureReplay:
+    """Push the packets of a capture file through a client, without a connection.
+
+    Packets are fed through ``client.data_received`` in the chunks they were received
+    in, so framing, decoding and all handlers run like they would live. Packets sent by
+    the client are collected in :attr:`sent` instead of being sent.
+
+    :param client: Any (configured) OttdClientMixIn subclass instance.
+    :param path: The capture file to replay.
+    :param speed: Replay at this multiple of the original timing; None replays as fast
+        as possible.
+    :param skip_types: Packets not to replay. By default the encryption handshake is
+        skipped, as captures contain the decrypted traffic.
+    """
+
+    def __init__(
+        self,
+        client: OttdClientMixIn,
+        path: str,
+        speed: Optional[float] = None,
+        skip_types: Iterable[Type[Packet]] = (ServerAuthRequest, ServerEnableEncryption),
+    ):
+        if speed is not None and speed <= 0:
+            raise ValueError("Speed must be positive")
+        self.client = client
+        self.path = path
+        self.speed = speed
+        self.skip_ids = frozenset(x.packet_id for x in skip_types)
+        self.sent = []  # Type: List[Packet]
+
+    def _chunks(self, reader: CaptureReader) -> Iterator[Tuple[float, int, bytes]]:
+        # Packets that were received together share their timestamp.
+        frames = []
+        timestamp = None
+        for frame in reader.frames():
+            if frame.packet_id in self.skip_ids:
+                frame.frame.release()
+                continue
+            if frames and frame.timestamp != timestamp:
+                yield timestamp, len(frames), b"".join(frames)
+                for view in frames:
+                    view.release()
+                frames = []
+            timestamp = frame.timestamp
+            frames.append(frame.frame)
+        if frames:
+            yield timestamp, len(frames), b"".join(frames)
+            for view in frames:
+                view.release()
+
+    def run(self) -> ReplayStats:
+        client = self.client
+        handler_time = 0.0
+        packet_received = client.packet_received
+
+        def timed_packet_received(packet, data):
+            nonlocal handler_time
+            start = time.perf_counter()
+            try:
+                packet_received(packet, data)
+            finally:
+                handler_time += time.perf_counter() - start
+
+        packets = total_bytes = 0
+        processing_time = 0.0
+        # Restore whatever the instance itself had set afterwards, not just the class methods.
+        saved = {name: client.__dict__[name] for name in ("send_packet", "packet_received") if name in client.__dict__}
+        client.send_packet = self.sent.append
+        client.packet_received = timed_packet_received
+        try:
+            with CaptureReader(self.path) as reader:
+                if client.peername is None:
+                    client.peername = reader.peername
+                started = time.perf_counter()
+                first = None
+                for timestamp, count, chunk in self._chunks(reader):
+                    if self.speed is not None:
+                        if first is None:
+                            first = timestamp
+                        delay = started + (timestamp - first) / self.speed - time.perf_counter()
+                        if delay > 0:
+                            time.sleep(delay)
+                    start = time.perf_counter()
+                    client.data_received(chunk)
+                    processing_time += time.perf_counter() - start
+                    packets += count
+                    total_bytes += len(chunk)
+                duration = time.perf_counter() - started
+        finally:
+            for name in ("send_packet", "packet_received"):
+                if name in saved:
+                    setattr(client, name, saved[name])
+                else:
+                    delattr(client, name)
+
+        stats = ReplayStats(packets, total_bytes, duration, processing_time, handler_time)
+        self.log.info(
+            "Replayed %d packets (%d bytes) in %.3fs: %.0f packets/s, %.1f%% in handlers",
+            stats.packets,
+            stats.bytes,
+            stats.duration,
+            stats.packets_per_second,
+            stats.handler_share * 100,
+        )
+        return stats
+
+
+__all__ = [
+    "CaptureReplay",
+    "ReplayStats",
+]
@@ -4,19 +4,30 @@
 # License: http://creativecommons.org/licenses/by-nc-sa/3.0/
 #
 
+import errno
 # noinspection PyProtectedMember
-from selectors import DefaultSelector, _BaseSelectorImpl, EVENT_READ
+from selectors import DefaultSelector, _BaseSelectorImpl, EVENT_READ, EVENT_WRITE
 import socket
-from typing import Union, Optional
+from typing import Any, Callable, Optional, Union
 
 from libottdadmin2.client.common import OttdClientMixIn
 from libottdadmin2.constants import TCP_MTU
 from libottdadmin2.packets import Packet
+from libottdadmin2.packets.buffer import ReceiveBuffer
 from libottdadmin2.util import loggable
 
+_CONNECT_IN_PROGRESS = (0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY)
+
+DEFAULT_HIGH_WATER = 64 * 1024  # Same default as asyncio transports.
+
 
 @loggable
 class OttdSocket(OttdClientMixIn, socket.socket):
+    close_callback = None  # Type: Optional[Callable[[OttdSocket], None]]
+    drain_callback = None  # Type: Optional[Callable[[OttdSocket], None]]
+    # The call_later of the loop driving the socket, like OttdSocketHub.call_later.
+    scheduler = None  # Type: Optional[Callable[..., Any]]
+
     def __init__(
         self,
         use_insecure_join: bool = False,
@@ -28,15 +39,29 @@ class OttdSocket(OttdClientMixIn, socket.socket):
         super().__init__(socket.AF_INET, socket.SOCK_STREAM)
         self.peername = None
         self._connected = False
+        self._connecting = False
         self._last_error = None
-        self._buffer = b""
+        self._buffer = ReceiveBuffer()
+        self._out = bytearray()
+        self._high_water = DEFAULT_HIGH_WATER
+        self._low_water = DEFAULT_HIGH_WATER // 4
+        self.writing_paused = False
         self._selector = None  # Type: Optional[_BaseSelectorImpl]
+        self._events = 0
         self.configure(use_insecure_join=use_insecure_join,
                        password=password,
                        secret_key=secret_key,
                        user_agent=user_agent,
                        version=version)
 
+    @property
+    def connected(self) -> bool:
+        return self._connected
+
+    @property
+    def connecting(self) -> bool:
+        return self._connecting
+
     def connect(self, address: Union[tuple, str, bytes]) -> bool:
         try:
             self.peername = address
@@ -49,6 +74,39 @@ class OttdSocket(OttdClientMixIn, socket.socket):
         self.connection_made()
         return self._connected
 
+    def connect_nonblocking(self, address: Union[tuple, str, bytes]) -> bool:
+        """Start connecting without waiting for the connection to be established.
+
+        The socket is made non-blocking. Returns True when connected right away, otherwise
+        the connection is completed from the selector once the socket becomes writable, and
+        ``connection_made`` is called then. Packets sent in the meantime are queued.
+        """
+        self.peername = address
+        self.setblocking(False)
+        result = self.connect_ex(address)
+        if result not in _CONNECT_IN_PROGRESS:
+            self._last_error = OSError(result, "Connecting failed: %s" % errno.errorcode.get(result, result))
+            raise self._last_error
+        if result == 0:
+            self._connected = True
+            self.connection_made()
+        else:
+            self._connecting = True
+            self._update_events()
+        return self._connected
+
+    def _finish_connect(self) -> None:
+        self._connecting = False
+        result = self.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if result:
+            self._last_error = OSError(result, "Connecting failed: %s" % errno.errorcode.get(result, result))
+            self.log.info("Connecting to %s:%d failed: %s", self.peername[0], self.peername[1], self._last_error)
+            self.close()
+            return
+        self._connected = True
+        self.connection_made()
+        self._flush()
+
     def connection_lost(self, exc: Optional[Exception] = None) -> None:
         self.log.info("Connection lost to %s:%d", self.peername[0], self.peername[1])
         self.close()
@@ -60,30 +118,144 @@ class OttdSocket(OttdClientMixIn, socket.socket):
         self.close()
 
     def close(self) -> None:
-        super().close()
-        self._connected = False
         if self._selector:
             self._selector.unregister(self)
             self._selector = None
+        was_open = self.fileno() != -1
+        super().close()
+        self._connected = False
+        self._connecting = False
+        if was_open and self.close_callback is not None:
+            self.close_callback(self)
+
+    def call_later(self, delay: float, callback: Callable, *args) -> Optional[Any]:
+        if self.scheduler is None:
+            return None
+        return self.scheduler(delay, self._call_if_open, callback, args)
+
+    def _call_if_open(self, callback: Callable, args: tuple) -> None:
+        if self.fileno() != -1:
+            callback(*args)
 
     def send_packet(self, packet: Packet):
-        try:
-            self.sendall(packet.write_to_buffer(self._encryption_handler))
-        except socket.error as e:
-            self._last_error = e
-            self.connection_lost(e)
+        if self.metrics is not None:
+            data = self._frame_measured(packet)
+        else:
+            data = packet.write_to_buffer(self._encryption_handler)
+        if self._selector is None and self.gettimeout() != 0.0:
+            try:
+                self.sendall(data)
+            except socket.error as e:
+                self._last_error = e
+                self.connection_lost(e)
+            return
+        # Non-blocking: write what the socket takes now, the rest is written once the selector
+        # reports the socket writable (or on the next flush).
+        pending = len(self._out)
+        self._out += data
+        if not pending and not self._connecting:
+            self._flush()
+        elif not self.writing_paused and len(self._out) > self._high_water:
+            self._pause_writing()
 
-    def register_to_selector(self, selector: _BaseSelectorImpl):
-        # noinspection PyUnusedLocal
-        def _read(conn: OttdSocket, mask):
-            data = conn.recv(TCP_MTU)
-            if data:
-                conn.data_received(data)
+    def flush(self) -> int:
+        """Write as much of the write buffer as the socket accepts; returns the bytes left.
+
+        Only needed for non-blocking sockets that are not registered to a selector.
+        """
+        if not self._connecting:
+            self._flush()
+        return len(self._out)
+
+    def _flush(self) -> None:
+        out = self._out
+        if out:
+            try:
+                sent = self.send(out)
+            except (BlockingIOError, InterruptedError):
+                sent = 0
+            except socket.error as e:
+                self._last_error = e
+                self.connection_lost(e)
+                return
+            del out[:sent]
+        self._update_events()
+        if self.writing_paused:
+            if len(out) <= self._low_water:
+                self._resume_writing()
+        elif len(out) > self._high_water:
+            self._pause_writing()
+
+    def get_write_buffer_size(self) -> int:
+        return len(self._out)
+
+    def set_write_buffer_limits(self, high: Optional[int] = None, low: Optional[int] = None) -> None:
+        """Set the water marks of the write buffer, like asyncio's transports.
+
+        Above ``high`` bytes :meth:`pause_writing` is called, once the buffer drained to ``low``
+        bytes or less :meth:`resume_writing` and the :attr:`drain_callback` are called.
+        """
+        if high is None:
+            high = DEFAULT_HIGH_WATER if low is None else 4 * low
+        if low is None:
+            low = high // 4
+        if not high >= low >= 0:
+            raise ValueError("high (%r) must be >= low (%r) must be >= 0" % (high, low))
+        self._high_water = high
+        self._low_water = low
+
+    def _pause_writing(self) -> None:
+        self.writing_paused = True
+        self.pause_writing()
+
+    def _resume_writing(self) -> None:
+        self.writing_paused = False
+        self.resume_writing()
+        if self.drain_callback is not None:
+            self.drain_callback(self)
+
+    def pause_writing(self) -> None:
+        """Called when the write buffer goes over the high water mark; stop sending for now."""
+        self.log.debug("Write buffer full (%d bytes), pausing", len(self._out))
+
+    def resume_writing(self) -> None:
+        """Called when the write buffer has drained to the low water mark."""
+        pass
+
+    def _update_events(self) -> None:
+        selector = self._selector
+        if selector is None:
+            return
+        events = EVENT_WRITE if self._connecting else EVENT_READ | (EVENT_WRITE if self._out else 0)
+        if events != self._events:
+            self._events = events
+            selector.modify(self, events, OttdSocket._handle_events)
+
+    def _handle_events(self, mask: int) -> None:
+        if mask & EVENT_WRITE:
+            if self._connecting:
+                self._finish_connect()
+                return
+            self._flush()
+        if mask & EVENT_READ and self._connected:
+            try:
+                nbytes = self.recv_into(self.get_buffer(TCP_MTU), TCP_MTU)
+            except (BlockingIOError, InterruptedError):
+                return
+            except socket.error as e:
+                self._last_error = e
+                self.connection_lost(e)
+                return
+            if nbytes:
+                self.buffer_updated(nbytes)
             else:
-                conn.connection_lost(exc=None)
+                self.connection_lost(exc=None)
 
+    def register_to_selector(self, selector: _BaseSelectorImpl):
+        """Register to a selector; the registered data is a ``callback(socket, mask)``."""
         self._selector = selector
-        selector.register(self, EVENT_READ, _read)
+        self._events = EVENT_WRITE if self._connecting else EVENT_READ | (EVENT_WRITE if self._out else 0)
+        selector.register(self, self._events, OttdSocket._handle_events)
 
 
 __all__ = [
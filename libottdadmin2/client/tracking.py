@@ -5,6 +5,7 @@
 #
 
 from datetime import datetime
+from typing import Dict
 
 from libottdadmin2.enums import (
     UpdateType,
@@ -15,9 +16,66 @@ from libottdadmin2.enums import (
 )
 from libottdadmin2.packets import AdminPoll, Packet
 from libottdadmin2.packets import AdminUpdateFrequency
-from libottdadmin2.packets import ServerCompanyInfo
+from libottdadmin2.packets import (
+    ServerChat,
+    ServerClientError,
+    ServerClientInfo,
+    ServerClientJoin,
+    ServerClientQuit,
+    ServerClientUpdate,
+    ServerCmdLogging,
+    ServerCmdNames,
+    ServerCompanyEconomy,
+    ServerCompanyInfo,
+    ServerCompanyNew,
+    ServerCompanyRemove,
+    ServerCompanyStats,
+    ServerCompanyUpdate,
+    ServerConsole,
+    ServerDate,
+    ServerGamescript,
+)
 from libottdadmin2.util import loggable
 
+# The packets the server sends for each update type.
+UPDATE_TYPE_PACKETS = {
+    UpdateType.DATE: (ServerDate,),
+    UpdateType.CLIENT_INFO: (
+        ServerClientJoin,
+        ServerClientInfo,
+        ServerClientUpdate,
+        ServerClientQuit,
+        ServerClientError,
+    ),
+    UpdateType.COMPANY_INFO: (
+        ServerCompanyNew,
+        ServerCompanyInfo,
+        ServerCompanyUpdate,
+        ServerCompanyRemove,
+    ),
+    UpdateType.COMPANY_ECONOMY: (ServerCompanyEconomy,),
+    UpdateType.COMPANY_STATS: (ServerCompanyStats,),
+    UpdateType.CHAT: (ServerChat,),
+    UpdateType.CONSOLE: (ServerConsole,),
+    UpdateType.NAMES: (ServerCmdNames,),
+    UpdateType.LOGGING: (ServerCmdLogging,),
+    UpdateType.GAMESCRIPT: (ServerGamescript,),
+}
+
+# Frequencies used for update types that are handled but missing from `update_types`.
+DEFAULT_UPDATE_FREQUENCIES = {
+    UpdateType.DATE: UpdateFrequency.DAILY,
+    UpdateType.CLIENT_INFO: UpdateFrequency.AUTOMATIC | UpdateFrequency.POLL,
+    UpdateType.COMPANY_INFO: UpdateFrequency.AUTOMATIC | UpdateFrequency.POLL,
+    UpdateType.COMPANY_ECONOMY: UpdateFrequency.MONTHLY,
+    UpdateType.COMPANY_STATS: UpdateFrequency.MONTHLY,
+    UpdateType.CHAT: UpdateFrequency.AUTOMATIC,
+    UpdateType.CONSOLE: UpdateFrequency.AUTOMATIC,
+    UpdateType.NAMES: UpdateFrequency.POLL,
+    UpdateType.LOGGING: UpdateFrequency.AUTOMATIC,
+    UpdateType.GAMESCRIPT: UpdateFrequency.AUTOMATIC,
+}
+
 
 @loggable
 class TrackingMixIn:
@@ -31,6 +89,10 @@ class TrackingMixIn:
         UpdateType.DATE: UpdateFrequency.DAILY | UpdateFrequency.POLL,
         UpdateType.NAMES: UpdateFrequency.POLL,
     }
+    # When set, only subscribe to the update types for which handlers or listeners exist,
+    #  using the frequencies of `update_types` (or DEFAULT_UPDATE_FREQUENCIES).
+    subscribe_from_handlers = False
+    _subscriptions = None  # Type: Optional[Dict[UpdateType, UpdateFrequency]]
 
     current_date = datetime.min
     clients = None
@@ -71,19 +133,48 @@ class TrackingMixIn:
     def on_server_welcome_raw(self, packet: Packet, data) -> None:
         self.server_info = data
         self._reset()
+        self._subscriptions = {}
+        self.negotiate_updates()
+
+    def wanted_update_types(self) -> Dict[UpdateType, UpdateFrequency]:
+        if not self.subscribe_from_handlers:
+            return dict(self.update_types)
+        wanted = {}
+        for _type, packets in UPDATE_TYPE_PACKETS.items():
+            if any(self.is_handled(packet.packet_id) for packet in packets):
+                wanted[_type] = self.update_types.get(
+                    _type, DEFAULT_UPDATE_FREQUENCIES[_type]
+                )
+        return wanted
+
+    def negotiate_updates(self) -> None:
+        """Bring the update frequencies on the server in line with `wanted_update_types`.
 
-        for _type, freq in self.update_types.items():
+        Newly wanted types are polled (if allowed), types no longer wanted are turned off.
+        """
+        current = self._subscriptions
+        wanted = self.wanted_update_types()
+        for _type, freq in wanted.items():
+            if current.get(_type) == freq:
+                continue
             self.log.debug("Processing update type: %s (%s)", _type.name, freq)
-            if freq ^ UpdateFrequency.POLL:
+            automatic = freq & ~UpdateFrequency.POLL
+            if automatic or current.get(_type, 0) & ~UpdateFrequency.POLL:
                 self.log.debug("Requesting updates")
-                self.send_packet(
-                    AdminUpdateFrequency.create(
-                        type=_type, freq=freq & ~UpdateFrequency.POLL
-                    )
-                )
-            if freq & UpdateFrequency.POLL:
+                self.send_packet(AdminUpdateFrequency.create(type=_type, freq=automatic))
+            if freq & UpdateFrequency.POLL and _type not in current:
                 self.log.debug("Polling current values")
                 self.send_packet(AdminPoll.create(type=_type, extra=PollExtra.ALL))
+        for _type, freq in current.items():
+            if _type not in wanted and freq & ~UpdateFrequency.POLL:
+                self.log.debug("Stopping updates: %s", _type.name)
+                self.send_packet(AdminUpdateFrequency.create(type=_type, freq=0))
+        self._subscriptions = wanted
+
+    def handlers_changed(self) -> None:
+        super().handlers_changed()
+        if self.subscribe_from_handlers and self._subscriptions is not None:
+            self.negotiate_updates()
 
     # Tracking packets
 
@@ -63,3 +63,7 @@ NETWORK_NUM_LANGUAGES = (
 )
 
 NETWORK_NUM_LANDSCAPES = 4  # The number of landscapes in OpenTTD.
+
+MAC_SIZE = 16  # Number of bytes for the message authentication code.
+NONCE_SIZE = 24  # Number of bytes for a nonce (random single use token).
+PUBLIC_KEY_SIZE = 32  # Number of bytes for a public key.
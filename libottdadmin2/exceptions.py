@@ -23,3 +23,11 @@ class InvalidPacketLengthError(OttdException):
 
 class PacketExhaustedError(OttdException):
     pass
+
+
+class InvalidCaptureError(OttdException):
+    pass
+
+
+class ConnectionDeadError(OttdException):
+    pass
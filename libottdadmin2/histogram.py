@@ -0,0 +1,95 @@
+#
+# This file is part of libottdadmin2
+#
+# License: http://creativecommons.org/licenses/by-nc-sa/3.0/
+#
+
+from bisect import bisect_left
+from typing import Dict, Iterable, Optional, Sequence
+
+# Upper bounds in seconds, from 100 microseconds to a minute.
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0,
+    10.0, 30.0, 60.0,
+)
+
+
+class Histogram:
+    """A fixed-bucket histogram of durations (or any other non-negative values).
+
+    Observing is a bisect and two additions, so it is cheap enough for every packet. The
+    buckets are Prometheus style upper bounds; values above the last bound are counted in an
+    implicit ``+Inf`` bucket. Percentiles are interpolated within a bucket.
+    """
+
+    __slots__ = ("bounds", "counts", "count", "sum", "min", "max")
+
+    def __init__(self, buckets: Optional[Iterable[float]] = None):
+        self.bounds = tuple(sorted(buckets if buckets is not None else DEFAULT_BUCKETS))  # Type: Tuple[float, ...]
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None  # Type: Optional[float]
+        self.max = None  # Type: Optional[float]
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Estimate the value below which ``percent`` (0-100) of the observations fall."""
+        if not self.count:
+            return None
+        rank = self.count * percent / 100
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[index - 1] if index else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else self.max
+                # The extremes are known exactly, do not estimate past them.
+                lower, upper = max(lower, self.min), min(upper, self.max)
+                return lower + (upper - lower) * max(rank - seen, 0) / count
+            seen += count
+        return self.max
+
+    def cumulative(self) -> Sequence[int]:
+        """The cumulative count per bucket, the last one being ``+Inf`` (equal to :attr:`count`)."""
+        total, result = 0, []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+    def snapshot(self, percentiles: Iterable[float] = (50, 90, 99)) -> Dict[str, Optional[float]]:
+        result = {"count": self.count, "sum": self.sum, "min": self.min, "max": self.max, "mean": self.mean}
+        for percent in percentiles:
+            result["p%g" % percent] = self.percentile(percent)
+        return result
+
+    def reset(self) -> None:
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = self.max = None
+
+    def __repr__(self):
+        return "<Histogram(count=%d, mean=%r, max=%r)>" % (self.count, self.mean, self.max)
+
+
+__all__ = [
+    "DEFAULT_BUCKETS",
+    "Histogram",
+]
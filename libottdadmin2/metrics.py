@@ -0,0 +1,219 @@
+#
+# This file is part of libottdadmin2
+#
+# License: http://creativecommons.org/licenses/by-nc-sa/3.0/
+#
+
+"""Per-connection instrumentation of the admin clients, and a Prometheus text exporter.
+
+Metrics are off by default; ``client.enable_metrics()`` turns them on for a connection. The
+counters are plain dicts updated from the client's own thread or loop. :func:`to_prometheus`
+renders any number of them in the Prometheus text format, and :class:`MetricsServer` serves
+that from a small stdlib HTTP server in a background thread::
+
+    server = MetricsServer(lambda: {name: c.metrics for name, c in clients.items()}, port=9477)
+    server.start()
+"""
+
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from libottdadmin2.histogram import Histogram
+from libottdadmin2.util import loggable
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class ClientMetrics:
+    """The counters and histograms of one connection; packet types are keyed by class name."""
+
+    def __init__(self):
+        self.packets_received = defaultdict(int)  # Type: Dict[str, int]
+        self.bytes_received = defaultdict(int)  # Type: Dict[str, int]
+        self.packets_sent = defaultdict(int)  # Type: Dict[str, int]
+        self.bytes_sent = defaultdict(int)  # Type: Dict[str, int]
+        self.skipped_bytes = 0  # Received packets that are unknown or not handled, so were not decoded.
+        self.decode_time = defaultdict(Histogram)  # Type: Dict[str, Histogram]
+        self.handler_time = defaultdict(Histogram)  # Type: Dict[str, Histogram]
+        self.decrypt_time = Histogram()  # Framing and decrypting the received packets.
+        self.encrypt_time = Histogram()  # Framing and encrypting the sent packets.
+        self.encryption_overhead_received = 0  # Bytes of MAC, on top of the packets themselves.
+        self.encryption_overhead_sent = 0
+        self.buffer_high_water = 0  # Most bytes waiting in the receive buffer at once.
+
+    def packet_received(self, name: str, nbytes: int, overhead: int) -> None:
+        self.packets_received[name] += 1
+        self.bytes_received[name] += nbytes
+        self.encryption_overhead_received += overhead
+
+    def packet_sent(self, name: str, nbytes: int, overhead: int) -> None:
+        self.packets_sent[name] += 1
+        self.bytes_sent[name] += nbytes
+        self.encryption_overhead_sent += overhead
+
+    def buffer_level(self, nbytes: int) -> None:
+        if nbytes > self.buffer_high_water:
+            self.buffer_high_water = nbytes
+
+    def snapshot(self) -> Dict[str, Any]:
+        """A copy of all metrics as plain dicts and numbers, e.g. to dump as JSON."""
+        return {
+            "packets_received": dict(self.packets_received),
+            "bytes_received": dict(self.bytes_received),
+            "packets_sent": dict(self.packets_sent),
+            "bytes_sent": dict(self.bytes_sent),
+            "skipped_bytes": self.skipped_bytes,
+            "decode_time": {name: h.snapshot() for name, h in list(self.decode_time.items())},
+            "handler_time": {name: h.snapshot() for name, h in list(self.handler_time.items())},
+            "decrypt_time": self.decrypt_time.snapshot(),
+            "encrypt_time": self.encrypt_time.snapshot(),
+            "encryption_overhead_received": self.encryption_overhead_received,
+            "encryption_overhead_sent": self.encryption_overhead_sent,
+            "buffer_high_water": self.buffer_high_water,
+        }
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{%s}" % ",".join('%s="%s"' % (key, _escape(str(value))) for key, value in labels)
+
+
+class _Family:
+    def __init__(self, name: str, kind: str, help_text: str):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.lines = []  # Type: List[str]
+
+    def sample(self, labels: Tuple[Tuple[str, str], ...], value: float, suffix: str = "") -> None:
+        self.lines.append("%s%s%s %r" % (self.name, suffix, _labels(labels), value))
+
+    def histogram(self, labels: Tuple[Tuple[str, str], ...], histogram: Histogram) -> None:
+        for bound, count in zip(histogram.bounds + (float("inf"),), histogram.cumulative()):
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            self.sample(labels + (("le", le),), count, "_bucket")
+        self.sample(labels, histogram.sum, "_sum")
+        self.sample(labels, histogram.count, "_count")
+
+    def render(self) -> List[str]:
+        if not self.lines:
+            return []
+        return ["# HELP %s %s" % (self.name, self.help), "# TYPE %s %s" % (self.name, self.kind)] + self.lines
+
+
+def to_prometheus(metrics: Mapping[str, Optional[ClientMetrics]], prefix: str = "ottdadmin") -> str:
+    """Render the metrics of many connections, labeled ``server="<key>"``, as Prometheus text."""
+    families = [
+        _Family(prefix + "_packets_received_total", "counter", "Packets received, per packet type."),
+        _Family(prefix + "_bytes_received_total", "counter", "Bytes received, per packet type."),
+        _Family(prefix + "_packets_sent_total", "counter", "Packets sent, per packet type."),
+        _Family(prefix + "_bytes_sent_total", "counter", "Bytes sent, per packet type."),
+        _Family(prefix + "_skipped_bytes_total", "counter", "Bytes of received packets nobody handles."),
+        _Family(prefix + "_encryption_overhead_bytes_total", "counter", "Bytes of message authentication codes."),
+        _Family(prefix + "_receive_buffer_high_water_bytes", "gauge", "Most bytes waiting in the receive buffer."),
+        _Family(prefix + "_decode_seconds", "histogram", "Time decoding packets, per packet type."),
+        _Family(prefix + "_handler_seconds", "histogram", "Time in packet handlers, per handler."),
+        _Family(prefix + "_crypto_seconds", "histogram", "Time framing and en- or decrypting packets."),
+    ]
+    (packets_received, bytes_received, packets_sent, bytes_sent, skipped, overhead, high_water,
+     decode_time, handler_time, crypto_time) = families
+    for server, client in sorted(metrics.items()):
+        if client is None:
+            continue
+        base = (("server", server),)
+        for family, counts in (
+            (packets_received, client.packets_received),
+            (bytes_received, client.bytes_received),
+            (packets_sent, client.packets_sent),
+            (bytes_sent, client.bytes_sent),
+        ):
+            for name, value in sorted(list(counts.items())):
+                family.sample(base + (("packet", name),), value)
+        skipped.sample(base, client.skipped_bytes)
+        overhead.sample(base + (("direction", "received"),), client.encryption_overhead_received)
+        overhead.sample(base + (("direction", "sent"),), client.encryption_overhead_sent)
+        high_water.sample(base, client.buffer_high_water)
+        for name, histogram in sorted(list(client.decode_time.items())):
+            decode_time.histogram(base + (("packet", name),), histogram)
+        for name, histogram in sorted(list(client.handler_time.items())):
+            handler_time.histogram(base + (("handler", name),), histogram)
+        if client.decrypt_time.count:
+            crypto_time.histogram(base + (("direction", "received"),), client.decrypt_time)
+        if client.encrypt_time.count:
+            crypto_time.histogram(base + (("direction", "sent"),), client.encrypt_time)
+    lines = []
+    for family in families:
+        lines.extend(family.render())
+    return "\n".join(lines) + "\n"
+
+
+@loggable
+class MetricsServer:
+    """Serve :func:`to_prometheus` of ``source()`` on ``http://host:port/metrics``.
+
+    :param source: Returns the metrics to export, keyed by server name; called per request
+        from the HTTP thread.
+    """
+
+    def __init__(
+        self,
+        source: Callable[[], Mapping[str, Optional[ClientMetrics]]],
+        host: str = "127.0.0.1",
+        port: int = 0,
+        prefix: str = "ottdadmin",
+    ):
+        self.source = source
+        self.prefix = prefix
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                exporter.log.debug("%s - %s", self.address_string(), format % args)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None  # Type: Optional[threading.Thread]
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    def render(self) -> str:
+        return to_prometheus(self.source(), self.prefix)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="metrics", daemon=True)
+        self._thread.start()
+        self.log.info("Serving metrics on http://%s:%d/metrics", self.httpd.server_address[0], self.port)
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self.httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.httpd.server_close()
+
+
+__all__ = [
+    "ClientMetrics",
+    "MetricsServer",
+    "to_prometheus",
+]
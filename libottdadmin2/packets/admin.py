@@ -15,7 +15,7 @@ from libottdadmin2.constants import (
     NETWORK_RCONCOMMAND_LENGTH,
     NETWORK_GAMESCRIPT_JSON_LENGTH,
 )
-from libottdadmin2.packets.base import Packet, check_length
+from libottdadmin2.packets.base import Packet, Field, check_length
 from libottdadmin2.enums import (
     Colour,
     UpdateType,
@@ -29,7 +29,11 @@ from libottdadmin2.enums import (
 @Packet.register
 class AdminJoin(Packet):
     packet_id = 0
-    fields = ["password", "name", "version"]
+    schema = [
+        Field("password", str, max_length=NETWORK_PASSWORD_LENGTH),
+        Field("name", str, max_length=NETWORK_CLIENT_NAME_LENGTH),
+        Field("version", str, max_length=NETWORK_REVISION_LENGTH),
+    ]
 
     def encode(self, password: str, name: str, version: str):
         self.write_str(
@@ -38,14 +42,6 @@ class AdminJoin(Packet):
             check_length(version, NETWORK_REVISION_LENGTH, "'version'"),
         )
 
-    def decode(self) -> Tuple[str, str, str]:
-        password, name, version = self.read_str(3)
-        return self.data(
-            check_length(password, NETWORK_PASSWORD_LENGTH, "'password'"),
-            check_length(name, NETWORK_CLIENT_NAME_LENGTH, "'name'"),
-            check_length(version, NETWORK_REVISION_LENGTH, "'version'"),
-        )
-
 
 @Packet.register
 class AdminQuit(Packet):
@@ -55,36 +51,36 @@ class AdminQuit(Packet):
 @Packet.register
 class AdminUpdateFrequency(Packet):
     packet_id = 2
-    fields = ["type", "freq"]
+    schema = [
+        Field("type", "ushort", UpdateType),
+        Field("freq", "ushort", UpdateFrequency),
+    ]
 
     # noinspection PyShadowingBuiltins
     def encode(self, type: UpdateType, freq: UpdateFrequency):
         self.write_ushort(UpdateType(type), UpdateFrequency(freq))
 
-    def decode(self):
-        _type, freq = self.read_ushort(2)
-        return self.data(UpdateType(_type), UpdateFrequency(freq))
-
 
 @Packet.register
 class AdminPoll(Packet):
     packet_id = 3
-    fields = ["type", "extra"]
+    schema = [Field("type", "byte", UpdateType), Field("extra", "uint")]
 
     # noinspection PyShadowingBuiltins
     def encode(self, type: UpdateType, extra: Union[int, PollExtra]):
         self.write_byte(UpdateType(type))
         self.write_uint(extra)
 
-    def decode(self) -> Tuple[UpdateType, Union[int, PollExtra]]:
-        _type, extra = self.read_data(["byte", "uint"])
-        return self.data(UpdateType(_type), extra)
-
 
 @Packet.register
 class AdminChat(Packet):
     packet_id = 4
-    fields = ["action", "type", "client_id", "message"]
+    schema = [
+        Field("action", "byte", ChatAction),
+        Field("type", "byte", DestType),
+        Field("client_id", "uint"),
+        Field("message", str, max_length=NETWORK_CHAT_LENGTH),
+    ]
 
     # noinspection PyShadowingBuiltins
     def encode(self, action: ChatAction, type: DestType, client_id: int, message: str):
@@ -93,34 +89,20 @@ class AdminChat(Packet):
         self.write_uint(client_id)
         self.write_str(check_length(message, NETWORK_CHAT_LENGTH, "'message'"))
 
-    def decode(self) -> Tuple[ChatAction, DestType, int, str]:
-        action, _type, client_id = self.read_data(["byte", "byte", "uint"])
-        (message,) = self.read_str()
-        return self.data(
-            ChatAction(action),
-            DestType(_type),
-            client_id,
-            check_length(message, NETWORK_CHAT_LENGTH, "'message'"),
-        )
-
 
 @Packet.register
 class AdminRcon(Packet):
     packet_id = 5
-    fields = ["command"]
+    schema = [Field("command", str, max_length=NETWORK_RCONCOMMAND_LENGTH)]
 
     def encode(self, command: str):
         self.write_str(check_length(command, NETWORK_RCONCOMMAND_LENGTH, "'command'"))
 
-    def decode(self) -> Tuple[str]:
-        (command,) = self.read_str()
-        return self.data(check_length(command, NETWORK_RCONCOMMAND_LENGTH, "'command'"))
-
 
 @Packet.register
 class AdminGamescript(Packet):
     packet_id = 6
-    fields = ["json_data"]
+    schema = [Field("json_data", str, json.loads, NETWORK_GAMESCRIPT_JSON_LENGTH)]
 
     def encode(self, json_data: Union[dict, list, str]):
         json_string = json.dumps(json_data)
@@ -128,48 +110,40 @@ class AdminGamescript(Packet):
             check_length(json_string, NETWORK_GAMESCRIPT_JSON_LENGTH, "'json_data'")
         )
 
-    def decode(self) -> Tuple[Union[list, dict, str]]:
-        (json_string,) = self.read_str()
-        json_data = json.loads(
-            check_length(json_string, NETWORK_GAMESCRIPT_JSON_LENGTH, "'json_data'")
-        )
-        return self.data(json_data)
-
 
 @Packet.register
 class AdminPing(Packet):
     packet_id = 7
-    fields = ["payload"]
+    schema = [Field("payload", "uint")]
 
     def encode(self, payload: int):
         self.write_uint(payload)
 
-    def decode(self) -> Tuple[int]:
-        (payload,) = self.read_uint()
-        return self.data(payload)
-
 
 @Packet.register
 class AdminExternalChat(Packet):
     packet_id = 8
-    fields = ["source", "colour", "user", "message"]
+    schema = [
+        Field("source", str),
+        Field("colour", "uint", Colour),
+        Field("user", str),
+        Field("message", str),
+    ]
 
     def encode(self, source: str, colour: Colour, user: str, message: str):
         self.write_str(source)
         self.write_uint(Colour(colour))
         self.write_str(user, message)
 
-    def decode(self):
-        (source,) = self.read_str()
-        (colour,) = self.read_uint()
-        user, message = self.read_str(2)
-        return self.data(source, Colour(colour), user, message)
-
 
 @Packet.register
 class AdminJoinSecure(Packet):
     packet_id = 9
-    fields = ["name", "version", "methods"]
+    schema = [
+        Field("name", str, max_length=NETWORK_CLIENT_NAME_LENGTH),
+        Field("version", str, max_length=NETWORK_REVISION_LENGTH),
+        Field("methods", "ushort"),
+    ]
 
     def encode(self, name: str, version: str, methods: int):
         self.write_str(
@@ -178,15 +152,6 @@ class AdminJoinSecure(Packet):
         )
         self.write_ushort(methods)
 
-    def decode(self) -> Tuple[str, str, int]:
-        name, version = self.read_str(2)
-        methods, = self.read_ushort()
-        return self.data(
-            check_length(name, NETWORK_CLIENT_NAME_LENGTH, "'name'"),
-            check_length(version, NETWORK_REVISION_LENGTH, "'version'"),
-            methods
-        )
-
 
 @Packet.register
 class AdminAuthResponse(Packet):
@@ -209,7 +174,6 @@ class AdminAuthResponse(Packet):
             self.write_byte(b)
 
     def decode(self) -> Tuple[bytes, bytes, bytes]:
-        public_key = bytes(self.read_byte(32))
-        mac = bytes(self.read_byte(16))
-        message = bytes(self.read_byte(8))
+        # The data is ordered differently from the wire format, so no schema here.
+        public_key, mac, message = self.read_data(["32s", "16s", "8s"])
         return self.data(public_key, message, mac)
@@ -5,20 +5,19 @@
 #
 
 from functools import lru_cache, wraps
-from itertools import chain
 
-from libottdadmin2.client.crypto import MAC_SIZE
+from libottdadmin2.constants import MAC_SIZE, TCP_MTU
 from libottdadmin2.exceptions import (
     InvalidHeaderError,
     UnknownPacketError,
     InvalidPacketLengthError,
     PacketExhaustedError,
 )
-from libottdadmin2.util import ensure_binary, ensure_text
+from libottdadmin2.util import ensure_binary
 
 from struct import Struct
 
-from typing import Tuple, Any, Union, Iterable, Optional, NamedTuple
+from typing import Tuple, Any, Union, Iterable, Iterator, Optional, NamedTuple, Callable, AbstractSet, Dict, Type
 
 STRUCT_FORMAT_PREFIXES = {"@", "=", "<", ">", "!"}
 
@@ -39,6 +38,11 @@ HEADER = new_struct("HB")
 HEADER_SIZE_PART = new_struct("H")
 HEADER_TYPE_PART = new_struct("B")
 
+# Structs packing the fixed size values written between strings, by format. The layouts of the
+# packet types are few; variable ones, like a long list of settings, are not kept.
+_PACKERS = {}  # Type: Dict[str, Struct]
+_PACKERS_MAX = 256
+
 
 # Easy mapping for stream data.
 # Since OpenTTD prefers unsigned variants for sending, we have a preference for those types as well.
@@ -71,11 +75,10 @@ def int_validator(
     def _inner(func):
         @wraps(func)
         def __inner(self, *values):
-            if _min is not None:
-                if any(x < _min for x in values):  # pragma: no cover
+            for x in values:
+                if _min is not None and x < _min:  # pragma: no cover
                     raise ValueError("Value may not be smaller than %d" % _min)
-            if _max is not None:
-                if any(x > _max for x in values):  # pragma: no cover
+                if _max is not None and x > _max:  # pragma: no cover
                     raise ValueError("Value may not be greater than %d" % _max)
             return func(self, *values)
 
@@ -110,17 +113,246 @@ class PacketData(NamedTuple):
     pass
 
 
+class Field(NamedTuple):
+    """A single field in the wire format of a packet.
+
+    :param name: The name of the field in the packet's data.
+    :param type: The wire type; ``str``, a key of ``TYPE_MAPPING`` or a struct format
+        that yields a single value (e.g. ``"32s"``).
+    :param convert: Optional callable applied to the value read from the wire.
+    :param max_length: Optional maximum length (including the terminating null) of a
+        string field, checked before ``convert`` is applied.
+    """
+
+    name: Optional[str]
+    type: Union[str, type]
+    convert: Optional[Callable[[Any], Any]] = None
+    max_length: Optional[int] = None
+
+
+@lru_cache(maxsize=256)
+def compile_decoder(fields: Tuple[Field, ...], raw: bool = False) -> Callable:
+    """Compile a tuple of fields into a single straight-line decoder function.
+
+    Consecutive fixed size fields are read with one precompiled ``Struct.unpack_from``,
+    strings are located with ``find``. The returned function has the signature
+    ``decoder(buffer, offset, end) -> (values, offset)``.
+
+    With ``raw``, strings are only located, their value is the ``(start, end)`` offset pair
+    in the buffer, and no lengths are checked or converters applied.
+    """
+    namespace = {
+        "PacketExhaustedError": PacketExhaustedError,
+        "check_length": check_length,
+    }
+    lines = ["def decoder(buffer, offset, end):"]
+    values = []
+    batch = []
+
+    def flush():
+        if not batch:
+            return
+        obj = new_struct("".join(fmt for _, fmt in batch))
+        name = "struct_%d" % len(namespace)
+        namespace[name] = obj
+        lines.extend(
+            [
+                "    if offset + %d > end:" % obj.size,
+                "        raise PacketExhaustedError("
+                "'%d bytes requested, but only %%d available' %% (end - offset))"
+                % obj.size,
+                "    %s, = %s.unpack_from(buffer, offset)"
+                % (", ".join("v%d" % index for index, _ in batch), name),
+                "    offset += %d" % obj.size,
+            ]
+        )
+        batch.clear()
+
+    for index, field in enumerate(fields):
+        if field.type == str:
+            flush()
+            lines.extend(
+                [
+                    "    index = buffer.find(b'\\x00', offset, end)",
+                    "    if index < 0:",
+                    "        raise PacketExhaustedError('Unterminated string')",
+                    ("    v%d = (offset, index)" if raw else "    v%d = buffer[offset:index].decode('utf-8')")
+                    % index,
+                    "    offset = index + 1",
+                ]
+            )
+        else:
+            fmt = TYPE_MAPPING.get(field.type, field.type)
+            obj = new_struct(fmt)
+            if len(obj.unpack(bytes(obj.size))) != 1:
+                raise ValueError("Field type %r must produce exactly one value" % fmt)
+            batch.append((index, fmt))
+        value = "v%d" % index
+        if raw:
+            values.append(value)
+            continue
+        if field.max_length is not None:
+            value = "check_length(%s, %d, %r)" % (value, field.max_length, "'%s'" % field.name)
+        if field.convert is not None:
+            namespace["convert_%d" % index] = field.convert
+            value = "convert_%d(%s)" % (index, value)
+        values.append(value)
+    flush()
+    lines.append("    return (%s), offset" % "".join("%s, " % value for value in values))
+
+    # The generated source only ever contains struct/converter references and integers.
+    exec("\n".join(lines), namespace)  # nosec
+    return namespace["decoder"]
+
+
+@lru_cache(maxsize=256)
+def _compile_reader(types: Tuple[Union[str, type], ...]) -> Callable:
+    return compile_decoder(tuple(Field(None, typ) for typ in types))
+
+
+def _field_finisher(field: Field) -> Optional[Callable[[bytes, Any], Any]]:
+    # Turns the raw value of a field, see compile_decoder, into what decode() would return.
+    if field.type != str and field.convert is None:
+        return None
+    convert = field.convert
+
+    def finish(buffer, value):
+        if field.type == str:
+            value = buffer[value[0] : value[1]].decode("utf-8")
+            if field.max_length is not None:
+                check_length(value, field.max_length, "'%s'" % field.name)
+        return value if convert is None else convert(value)
+
+    return finish
+
+
+_MISSING = object()
+
+
+class _LazyField:
+    __slots__ = ["index"]
+
+    def __init__(self, index: int):
+        self.index = index
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        values = obj._values
+        value = values[self.index]
+        if value is _MISSING:
+            value = values[self.index] = obj._decode_field(self.index)
+        return value
+
+    def __set__(self, obj, value):
+        raise AttributeError("can't set attribute")
+
+
+class LazyPacketData:
+    """The data of a received packet, decoding each field on first access.
+
+    Returned by :meth:`Packet.decode_lazy`. Fields are located in the packet buffer when the
+    first one is read; strings, enums, dates and JSON are only converted once their field is
+    read, and cached. Handlers that only look at an id never pay for the rest.
+
+    It behaves like the packet's ``data`` NamedTuple: attribute access, indexing, iteration
+    and unpacking, ``_fields``, ``_asdict()``, ``_replace()``, comparison, hashing and
+    ``repr``. It is not a tuple though; :meth:`_materialize` returns the NamedTuple, e.g.
+    for ``isinstance`` checks or ``json``. Malformed packets raise when a field is read
+    instead of while receiving.
+    """
+
+    __slots__ = ["_buffer", "_offset", "_raw", "_values"]
+    _data = PacketData  # Type: Type[NamedTuple]
+    _fields = ()  # Type: Tuple[str, ...]
+    _decoder = None
+    _finishers = ()  # Type: Tuple[Optional[Callable[[bytes, Any], Any]], ...]
+
+    def __init__(self, buffer: bytes, offset: int = 0):
+        self._buffer = buffer
+        self._offset = offset
+        self._raw = None  # Type: Optional[Tuple[Any, ...]]
+        self._values = [_MISSING] * len(self._fields)
+
+    @staticmethod
+    def build(data: Type[NamedTuple], schema: Iterable[Field]) -> Type["LazyPacketData"]:
+        """Create the lazy counterpart of a packet's ``data`` NamedTuple."""
+        schema = tuple(schema)
+        namespace = {
+            "__slots__": [],
+            "_data": data,
+            "_fields": data._fields,
+            "_decoder": staticmethod(compile_decoder(schema, raw=True)),
+            "_finishers": tuple(_field_finisher(field) for field in schema),
+        }
+        for index, name in enumerate(data._fields):
+            namespace[name] = _LazyField(index)
+        return type(data.__name__, (LazyPacketData,), namespace)
+
+    def _decode_field(self, index: int) -> Any:
+        raw = self._raw
+        if raw is None:
+            raw = self._raw = self._decoder(self._buffer, self._offset, len(self._buffer))[0]
+        finisher = self._finishers[index]
+        return raw[index] if finisher is None else finisher(self._buffer, raw[index])
+
+    def _materialize(self) -> NamedTuple:
+        """Decode all fields into the packet's ``data`` NamedTuple."""
+        return self._data._make(self)
+
+    def _asdict(self) -> Dict[str, Any]:
+        return dict(zip(self._fields, self))
+
+    def _replace(self, **kwargs) -> NamedTuple:
+        # noinspection PyProtectedMember
+        return self._materialize()._replace(**kwargs)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def __iter__(self) -> Iterator[Any]:
+        for name in self._fields:
+            yield getattr(self, name)
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            return tuple(getattr(self, name) for name in self._fields[index])
+        return getattr(self, self._fields[index])
+
+    def __eq__(self, other):
+        if isinstance(other, (tuple, LazyPacketData)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return repr(self._materialize())
+
+
 class Packet:
     __slots__ = [
         "_index",
         "_header",
         "_buffer",
+        "_out",
+        "_end",
         "_fmt",
-        "_val",
+        "_values",
     ]
     packet_id = 0
     fields = []
+    schema = None  # Type: Optional[List[Field]]
     data = None
+    lazy_data = None  # Type: Optional[Type[LazyPacketData]]
+    _decoder = None
+    # Initial size of the encode buffer, grows to the largest packet encoded so far.
+    _size_hint = 64
 
     _registry = {}
 
@@ -128,8 +360,12 @@ class Packet:
         self._index = 0
         self._buffer = buffer or b""
         self._header = hdr
-        self._fmt = []
-        self._val = []
+        # Encode buffer; the payload is written behind room reserved for the header.
+        self._out = None  # Type: Optional[bytearray]
+        self._end = 0
+        # Fixed size values not packed into the encode buffer yet, see _pack_pending.
+        self._fmt = ""
+        self._values = None  # Type: Optional[List[int]]
 
     def __str__(self):
         return self.__class__.__name__
@@ -145,6 +381,11 @@ class Packet:
         self._index = 0
         if clear:
             self._buffer = b""
+            self._header = None
+            self._fmt = ""
+            self._values = None
+            if self._out is not None:
+                self._end = HEADER.size
 
     @property
     def has_available_data(self):
@@ -152,44 +393,73 @@ class Packet:
 
     @property
     def header(self):
+        if self._fmt:
+            self._pack_pending()
         if not self._header:
-            self._header = HEADER.pack(len(self.buffer) + HEADER.size, self.packet_id)
+            length = self._end if self._out is not None else len(self._buffer) + HEADER.size
+            self._header = HEADER.pack(length, self.packet_id)
         return self._header
 
     @property
     def buffer(self):
-        self._write_process()
+        if self._fmt:
+            self._pack_pending()
+        if self._out is not None and self._end - HEADER.size != len(self._buffer):
+            self._buffer = bytes(self._out[HEADER.size : self._end])
         return self._buffer
 
     @staticmethod
     def register(klass):
         Packet._registry[klass.packet_id] = klass
+        if klass.schema is not None:
+            klass.fields = [field.name for field in klass.schema]
+            klass._decoder = staticmethod(compile_decoder(tuple(klass.schema)))
         if not getattr(klass, "data", None):
             fields = [
                 (x, Any) if not (isinstance(x, (list, tuple)) and len(x) == 2) else x
                 for x in klass.fields
             ]
             klass.data = NamedTuple(klass.__name__, fields)
+        # Packets with their own decode() are always decoded eagerly.
+        if klass.schema is not None and klass.decode is Packet.decode:
+            klass.lazy_data = LazyPacketData.build(klass.data, klass.schema)
         return klass
 
     @classmethod
     def create(cls, _out: Optional[Tuple[Any, ...]] = None, **kwargs):
-        if _out and isinstance(_out, cls.data):
-            # noinspection PyProtectedMember, PyUnresolvedReferences
-            kwargs = dict(_out._asdict())
+        if _out:
+            if isinstance(_out, LazyPacketData):
+                # noinspection PyProtectedMember
+                _out = _out._materialize()
+            if isinstance(_out, cls.data):
+                # noinspection PyProtectedMember, PyUnresolvedReferences
+                kwargs = dict(_out._asdict())
         obj = cls()
         obj.encode(**kwargs)
         return obj
 
     def write_to_buffer(self, encryption_handler = None):
+        if self._fmt:
+            self._pack_pending()
+        out, end = self._out, self._end
         if encryption_handler is None:
-            # Unencrypted packets are simply the header and the data.
-            return b"".join([self.header, self.buffer])
+            if out is None:
+                # Nothing but strings (or nothing at all) has been written, see write_str.
+                return HEADER.pack(len(self._buffer) + HEADER.size, self.packet_id) + self._buffer
+            # Unencrypted packets are simply the header and the data, which are already laid out
+            # next to each other in the encode buffer. Slicing the bytearray measured faster than
+            # going through a memoryview, even for packets of the maximum size.
+            HEADER.pack_into(out, 0, end, self.packet_id)
+            return bytes(out[0:end])
 
         # With encrypted packets, only the packet length is stored unencrypted. All other data is
         # encrypted and validated against a message authentication code. As such, the consituents
         # of the header must be handled separately.
-        data = b"".join([HEADER_TYPE_PART.pack(self.packet_id), self.buffer])
+        if out is None:
+            data = HEADER_TYPE_PART.pack(self.packet_id) + self._buffer
+        else:
+            HEADER_TYPE_PART.pack_into(out, HEADER_SIZE_PART.size, self.packet_id)
+            data = bytes(out[HEADER_SIZE_PART.size : end])
         mac, cipher = encryption_handler.lock(data)
         return b"".join([HEADER_SIZE_PART.pack(HEADER_SIZE_PART.size + len(mac) + len(cipher)), mac, cipher])
 
@@ -217,26 +487,50 @@ class Packet:
         return obj
 
     @staticmethod
-    def extract(buffer, decryption_handler = None) -> Tuple[bool, int, Any]:
+    def extract(
+        buffer,
+        decryption_handler = None,
+        packet_ids: Optional[AbstractSet[int]] = None,
+        skip_unknown: bool = True,
+    ) -> Tuple[bool, int, Any]:
+        """Extract the first packet from a bytes-like buffer.
+
+        The buffer may be a memoryview over a larger receive buffer; only the data
+        belonging to the extracted packet is copied.
+
+        :param packet_ids: When given, packets with other ids are skipped without copying them.
+        :param skip_unknown: Raise an UnknownPacketError for unknown packet ids instead of
+            skipping them.
+        :return: Tuple of (found, length, packet). A length of 0 means more data is
+            needed, a length without a packet means the packet was skipped.
+        """
         if len(buffer) < HEADER.size:
             return False, 0, None
 
         # When the packet is encrypted, the size is not encrypted but the remaining data is either
         # encrypted or the message authentication code. So first get the length seperately.
-        length, = HEADER_SIZE_PART.unpack(buffer[0 : HEADER_SIZE_PART.size])
+        length, = HEADER_SIZE_PART.unpack_from(buffer, 0)
+        if length < HEADER.size:
+            raise InvalidPacketLengthError("Invalid packet length: %d" % length)
         if len(buffer) < length:
             return False, 0, None
 
-        hdr = None
         if decryption_handler is None:
-            hdr = buffer[0 : HEADER.size]
-            buffer = buffer[HEADER.size : length]
+            length, pid = HEADER.unpack_from(buffer, 0)
+            if pid not in Packet._registry:
+                if not skip_unknown:
+                    raise UnknownPacketError("Unknown packet with packet id %d" % pid)
+                return False, length, None
+            if packet_ids is not None and pid not in packet_ids:
+                return False, length, None
+            hdr = bytes(buffer[0 : HEADER.size])
+            buffer = bytes(buffer[HEADER.size : length])
         else:
             # Perform the decryption and (automatic) validation against the message authentication code.
             split_offset = HEADER_SIZE_PART.size + MAC_SIZE
             data = decryption_handler.unlock(
-                mac = buffer[HEADER_SIZE_PART.size : split_offset],
-                message = buffer[split_offset : length]
+                mac = bytes(buffer[HEADER_SIZE_PART.size : split_offset]),
+                message = bytes(buffer[split_offset : length])
             )
             if data is None:
                 raise InvalidHeaderError("Signature validation failed")
@@ -245,10 +539,14 @@ class Packet:
             hdr = b''.join([buffer[0 : HEADER_SIZE_PART.size], data[0 : HEADER_TYPE_PART.size]])
             buffer = bytes(data[HEADER_TYPE_PART.size : len(data)])
 
-        length, pid = HEADER.unpack(hdr)
+            length, pid = HEADER.unpack(hdr)
+            if pid not in Packet._registry:
+                if not skip_unknown:
+                    raise UnknownPacketError("Unknown packet with packet id %d" % pid)
+                return False, length, None
+            if packet_ids is not None and pid not in packet_ids:
+                return False, length, None
 
-        if pid not in Packet._registry:
-            return False, length, None
         klass = Packet._registry[pid]
         obj = klass(buffer, hdr)
         return True, length, obj
@@ -261,24 +559,52 @@ class Packet:
                 return obj, obj.decode()
         return None, None
 
-    def _write_add(self, fmt, *data):
-        self._fmt.append(fmt)
-        self._val.append(data)
-
-    def _write_simple(self, fmt, *values):
-        values = list(map(int, values))
-        return self._write_add(fmt * len(values), *values)
+    def _reserve(self, size):
+        """Make sure ``size`` more bytes fit in the encode buffer, allocating it on first use.
 
-    def _write_process(self):
-        if not self._fmt:
+        Data already in the packet (e.g. a received packet being extended) is carried over.
+        """
+        out = self._out
+        if out is None and not self._buffer:
+            self._out = bytearray(max(self._size_hint, HEADER.size + size))
+            self._end = HEADER.size
             return
-        fmt = "".join(self._fmt)
-        data = list(chain(*self._val))
-        obj = new_struct(fmt)
-        self._buffer += obj.pack(*data)
-        self._index += obj.size
-        self._fmt = []
-        self._val = []
+        if out is None:
+            pending = self._buffer
+            out = self._out = bytearray(max(self._size_hint, HEADER.size + len(pending) + size))
+            if pending:
+                out[HEADER.size : HEADER.size + len(pending)] = pending
+            self._end = HEADER.size + len(pending)
+        needed = self._end + size
+        if needed > len(out):
+            out += bytes(max(needed, len(out) * 2) - len(out))
+            klass = type(self)
+            klass._size_hint = min(max(klass._size_hint, needed), TCP_MTU)
+
+    def _write_simple(self, fmt, *values):
+        # Consecutive fixed size values are packed in one go, before the next string or when the
+        # packet is framed.
+        if self._values is None:
+            self._values = list(map(int, values))
+        else:
+            self._values.extend(map(int, values))
+        self._fmt += fmt * len(values)
+
+    def _pack_pending(self):
+        fmt = self._fmt
+        obj = _PACKERS.get(fmt)
+        if obj is None:
+            obj = Struct("<" + fmt)
+            if len(_PACKERS) < _PACKERS_MAX:
+                _PACKERS[fmt] = obj
+        size = obj.size
+        if self._out is None or self._end + size > len(self._out):
+            self._reserve(size)
+        obj.pack_into(self._out, self._end, *self._values)
+        self._end += size
+        self._index += size
+        self._fmt = ""
+        self._values = None
 
     @int_validator(_min=0, _max=1)
     def write_bool(self, *values: bool):
@@ -321,39 +647,30 @@ class Packet:
         self._write_simple("Q", *values)
 
     def write_str(self, *values: str):
-        self._write_process()
-        encoded = b"\x00".join(map(ensure_binary, values)) + b"\x00"
-        self._buffer += encoded
-        self._index += len(encoded)
-
-    def _read_batch(self, fmt) -> Tuple[Any, ...]:
-        obj = new_struct(fmt)
-        size_remaining = len(self._buffer) - self._index
-        if obj.size > size_remaining:
-            raise PacketExhaustedError(
-                "%d bytes requested, but only %d available" % (obj.size, size_remaining)
-            )
-        new_index = self._index + obj.size
-        ret = obj.unpack(self._buffer[self._index : new_index])
-        self._index = new_index
-        return ret
+        if self._fmt:
+            self._pack_pending()
+        out = self._out
+        if out is None:
+            # Until a fixed size value is written, the encode buffer is not needed: a string-only
+            # packet is framed with a single concatenation.
+            encoded = b"\x00".join(map(ensure_binary, values)) + b"\x00"
+            self._buffer += encoded
+            self._index += len(encoded)
+            return
+        encoded = ensure_binary(values[0]) if len(values) == 1 else b"\x00".join(map(ensure_binary, values))
+        size = len(encoded) + 1
+        if self._end + size > len(out):
+            self._reserve(size)
+            out = self._out
+        end = self._end
+        out[end : end + size - 1] = encoded
+        out[end + size - 1] = 0
+        self._end = end + size
+        self._index += size
 
     def read_data(self, types: Iterable[Union[str, type]]) -> Iterable[Any]:
-        batch = []
-        ret = []
-        for typ in types:
-            if typ == str:
-                if batch:
-                    ret.extend(self._read_batch("".join(batch)))
-                    batch = []
-                ind = self._buffer.index(b"\x00", self._index)
-                ret.append(ensure_text(self._buffer[self._index : ind]))
-                self._index = ind + 1
-            else:
-                batch.append(TYPE_MAPPING.get(typ, typ))
-                continue
-        if batch:
-            ret.extend(self._read_batch("".join(batch)))
+        decoder = _compile_reader(tuple(types))
+        ret, self._index = decoder(self._buffer, self._index, len(self._buffer))
         return ret
 
     def _read_simple(self, typ: Union[str, type], amount: int) -> Iterable[Any]:
@@ -396,5 +713,17 @@ class Packet:
         pass
 
     def decode(self) -> PacketData:
-        # noinspection PyCallingNonCallable
-        return self.data()
+        if self._decoder is None:
+            # noinspection PyCallingNonCallable
+            return self.data()
+        values, self._index = self._decoder(self._buffer, self._index, len(self._buffer))
+        return self.data._make(values)
+
+    def decode_lazy(self) -> Union[PacketData, LazyPacketData]:
+        """Like :meth:`decode`, but fields are only decoded when read, see :class:`LazyPacketData`.
+
+        Packets that are not described by a schema are decoded right away.
+        """
+        if self.lazy_data is None:
+            return self.decode()
+        return self.lazy_data(self._buffer, self._index)
@@ -0,0 +1,108 @@
+#
+# This file is part of libottdadmin2
+#
+# License: http://creativecommons.org/licenses/by-nc-sa/3.0/
+#
+
+from typing import Any, Tuple, Optional, AbstractSet
+
+from libottdadmin2.constants import TCP_MTU
+from libottdadmin2.exceptions import UnknownPacketError
+from libottdadmin2.packets.base import Packet, HEADER_SIZE_PART
+
+
+class ReceiveBuffer:
+    """Growable receive buffer with a read cursor.
+
+    Incoming data is appended behind the write cursor and packets are framed
+    straight out of a memoryview, so extracting a packet never copies the data
+    that is still pending. Pending data is only moved to the front of the buffer
+    when there is not enough room left behind it.
+    """
+
+    __slots__ = ["_data", "_start", "_end", "_min_free"]
+
+    def __init__(self, size: int = TCP_MTU * 2, min_free: int = TCP_MTU):
+        self._data = bytearray(max(size, min_free))
+        self._start = 0
+        self._end = 0
+        self._min_free = min_free
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    @property
+    def capacity(self) -> int:
+        return len(self._data)
+
+    def _reserve(self, size: int) -> None:
+        if self._end + size <= len(self._data):
+            return
+        pending = self._end - self._start
+        if pending + size <= len(self._data):
+            # Enough room if we move the pending data to the front.
+            self._data[0:pending] = self._data[self._start : self._end]
+        else:
+            data = bytearray(max(len(self._data) * 2, pending + size))
+            data[0:pending] = self._data[self._start : self._end]
+            self._data = data
+        self._start, self._end = 0, pending
+
+    def get_buffer(self, sizehint: int = -1) -> memoryview:
+        """Return a writable view of at least ``sizehint`` bytes behind the pending data.
+
+        Data written into the view must be committed with :meth:`buffer_updated`.
+        """
+        self._reserve(max(sizehint, self._min_free))
+        return memoryview(self._data)[self._end :]
+
+    def buffer_updated(self, nbytes: int) -> None:
+        self._end += nbytes
+
+    def feed(self, data: bytes) -> None:
+        size = len(data)
+        self._reserve(size)
+        self._data[self._end : self._end + size] = data
+        self._end += size
+
+    def view(self) -> memoryview:
+        return memoryview(self._data)[self._start : self._end]
+
+    def consume(self, nbytes: int) -> None:
+        self._start = min(self._start + nbytes, self._end)
+        if self._start == self._end:
+            self._start = self._end = 0
+
+    def clear(self) -> None:
+        self._start = self._end = 0
+
+    def extract(
+        self,
+        decryption_handler=None,
+        packet_ids: Optional[AbstractSet[int]] = None,
+        skip_unknown: bool = True,
+    ) -> Tuple[bool, int, Any]:
+        """Extract the next packet from the buffer, see :meth:`Packet.extract`.
+
+        The returned length has already been consumed from the buffer. Unknown packets
+        are consumed as well before the UnknownPacketError is raised, so the stream can
+        be continued.
+        """
+        view = self.view()
+        try:
+            found, length, packet = Packet.extract(view, decryption_handler, packet_ids, skip_unknown)
+        except UnknownPacketError:
+            # The packet length is never encrypted.
+            (length,) = HEADER_SIZE_PART.unpack_from(view, 0)
+            view.release()
+            self.consume(length)
+            raise
+        view.release()
+        if length:
+            self.consume(length)
+        return found, length, packet
+
+
+__all__ = [
+    "ReceiveBuffer",
+]
@@ -8,8 +8,9 @@ from collections import namedtuple
 from datetime import datetime
 from typing import Tuple, Dict
 
-from libottdadmin2.client.crypto import NONCE_SIZE, PUBLIC_KEY_SIZE
 from libottdadmin2.constants import (
+    NONCE_SIZE,
+    PUBLIC_KEY_SIZE,
     NETWORK_NAME_LENGTH,
     NETWORK_REVISION_LENGTH,
     NETWORK_HOSTNAME_LENGTH,
@@ -28,7 +29,7 @@ from libottdadmin2.enums import (
     Language,
     Colour,
 )
-from libottdadmin2.packets.base import Packet, check_length, check_tuple_length
+from libottdadmin2.packets.base import Packet, Field, check_length, check_tuple_length
 from libottdadmin2.packets.admin import AdminGamescript, AdminPing, AdminRcon
 from libottdadmin2.util import gamedate_to_datetime, datetime_to_gamedate
 
@@ -46,15 +47,11 @@ class ServerBanned(Packet):
 @Packet.register
 class ServerError(Packet):
     packet_id = 102
-    fields = ["errorcode"]
+    schema = [Field("errorcode", "byte", ErrorCode)]
 
     def encode(self, errorcode: ErrorCode):
         self.write_byte(ErrorCode(errorcode))
 
-    def decode(self) -> Tuple[ErrorCode]:
-        (errorcode,) = self.read_byte()
-        return self.data(ErrorCode(errorcode))
-
 
 @Packet.register
 class ServerProtocol(Packet):
@@ -81,16 +78,16 @@ class ServerProtocol(Packet):
 @Packet.register
 class ServerWelcome(Packet):
     packet_id = 104
-    fields = [
-        "name",
-        "version",
-        "dedicated",
-        "map",
-        "seed",
-        "landscape",
-        "startdate",
-        "x",
-        "y",
+    schema = [
+        Field("name", str, max_length=NETWORK_NAME_LENGTH),
+        Field("version", str, max_length=NETWORK_REVISION_LENGTH),
+        Field("dedicated", bool, bool),
+        Field("map", str, max_length=NETWORK_NAME_LENGTH),
+        Field("seed", "uint"),
+        Field("landscape", "byte", Landscape),
+        Field("startdate", "uint", gamedate_to_datetime),
+        Field("x", "ushort"),
+        Field("y", "ushort"),
     ]
 
     # noinspection PyShadowingBuiltins
@@ -117,25 +114,6 @@ class ServerWelcome(Packet):
         self.write_uint(datetime_to_gamedate(startdate))
         self.write_ushort(x, y)
 
-    def decode(self) -> Tuple[str, str, bool, str, int, Landscape, datetime, int, int]:
-        name, version = self.read_str(2)
-        (dedicated,) = self.read_bool()
-        (_map,) = self.read_str()
-        seed, landscape, startdate, x, y = self.read_data(
-            ["uint", "byte", "uint", "ushort", "ushort"]
-        )
-        return self.data(
-            check_length(name, NETWORK_NAME_LENGTH, "'name'"),
-            check_length(version, NETWORK_REVISION_LENGTH, "'version'"),
-            dedicated,
-            check_length(_map, NETWORK_NAME_LENGTH, "'map'"),
-            seed,
-            Landscape(landscape),
-            gamedate_to_datetime(startdate),
-            x,
-            y,
-        )
-
 
 @Packet.register
 class ServerNewGame(Packet):
@@ -150,33 +128,32 @@ class ServerShutdown(Packet):
 @Packet.register
 class ServerDate(Packet):
     packet_id = 107
-    fields = ["date"]
+    schema = [Field("date", "uint", gamedate_to_datetime)]
 
     def encode(self, date: datetime):
         self.write_uint(datetime_to_gamedate(date))
 
-    def decode(self) -> Tuple[datetime]:
-        (date,) = self.read_uint()
-        return self.data(gamedate_to_datetime(date))
-
 
 @Packet.register
 class ServerClientJoin(Packet):
     packet_id = 108
-    fields = ["client_id"]
+    schema = [Field("client_id", "uint")]
 
     def encode(self, client_id: int):
         self.write_uint(client_id)
 
-    def decode(self) -> Tuple[int]:
-        (client_id,) = self.read_uint()
-        return self.data(client_id)
-
 
 @Packet.register
 class ServerClientInfo(Packet):
     packet_id = 109
-    fields = ["client_id", "hostname", "name", "language", "joindate", "play_as"]
+    schema = [
+        Field("client_id", "uint"),
+        Field("hostname", str, max_length=NETWORK_HOSTNAME_LENGTH),
+        Field("name", str, max_length=NETWORK_CLIENT_NAME_LENGTH),
+        Field("language", "byte", Language),
+        Field("joindate", "uint", gamedate_to_datetime),
+        Field("play_as", "byte"),
+    ]
 
     def encode(
         self,
@@ -196,38 +173,21 @@ class ServerClientInfo(Packet):
         self.write_uint(datetime_to_gamedate(joindate))
         self.write_byte(play_as)
 
-    def decode(self) -> Tuple[int, str, str, Language, datetime, int]:
-        (client_id,) = self.read_uint()
-        hostname, name = self.read_str(2)
-        language, joindate, play_as = self.read_data(["byte", "uint", "byte"])
-        return self.data(
-            client_id,
-            check_length(hostname, NETWORK_HOSTNAME_LENGTH, "'hostname'"),
-            check_length(name, NETWORK_CLIENT_NAME_LENGTH, "'name'"),
-            Language(language),
-            gamedate_to_datetime(joindate),
-            play_as,
-        )
-
 
 @Packet.register
 class ServerClientUpdate(Packet):
     packet_id = 110
-    fields = ["client_id", "name", "play_as"]
+    schema = [
+        Field("client_id", "uint"),
+        Field("name", str, max_length=NETWORK_CLIENT_NAME_LENGTH),
+        Field("play_as", "byte"),
+    ]
 
     def encode(self, client_id: int, name: str, play_as: int):
         self.write_uint(client_id)
         self.write_str(check_length(name, NETWORK_CLIENT_NAME_LENGTH, "'name'"))
         self.write_byte(play_as)
 
-    def decode(self) -> Tuple[int, str, int]:
-        (client_id,) = self.read_uint()
-        (name,) = self.read_str()
-        (play_as,) = self.read_byte()
-        return self.data(
-            client_id, check_length(name, NETWORK_CLIENT_NAME_LENGTH, "'name'"), play_as
-        )
-
 
 @Packet.register
 class ServerClientQuit(ServerClientJoin):
@@ -237,29 +197,21 @@ class ServerClientQuit(ServerClientJoin):
 @Packet.register
 class ServerClientError(Packet):
     packet_id = 112
-    fields = ["client_id", "errorcode"]
+    schema = [Field("client_id", "uint"), Field("errorcode", "byte", ErrorCode)]
 
     def encode(self, client_id: int, errorcode: ErrorCode):
         self.write_uint(client_id)
         self.write_byte(ErrorCode(errorcode))
 
-    def decode(self) -> Tuple[int, ErrorCode]:
-        client_id, errorcode = self.read_data(["uint", "byte"])
-        return self.data(client_id, ErrorCode(errorcode))
-
 
 @Packet.register
 class ServerCompanyNew(Packet):
     packet_id = 113
-    fields = ["company_id"]
+    schema = [Field("company_id", "byte")]
 
     def encode(self, company_id: int):
         self.write_byte(company_id)
 
-    def decode(self) -> Tuple[int]:
-        (company_id,) = self.read_byte()
-        return self.data(company_id)
-
 
 @Packet.register
 class ServerCompanyInfo(Packet):
@@ -391,15 +343,14 @@ class ServerCompanyUpdate(Packet):
 @Packet.register
 class ServerCompanyRemove(Packet):
     packet_id = 116
-    fields = ["company_id", "reason"]
+    schema = [
+        Field("company_id", "byte"),
+        Field("reason", "byte", CompanyRemoveReason),
+    ]
 
     def encode(self, company_id: int, reason: CompanyRemoveReason):
         self.write_byte(company_id, CompanyRemoveReason(reason))
 
-    def decode(self) -> Tuple[int, CompanyRemoveReason]:
-        company_id, reason = self.read_byte(2)
-        return self.data(company_id, CompanyRemoveReason(reason))
-
 
 ServerCompanyEconomyHistory = namedtuple(
     "ServerCompanyEconomyHistory", ["value", "performance", "delivered"]
@@ -442,13 +393,10 @@ class ServerCompanyEconomy(Packet):
         int,
         Tuple[ServerCompanyEconomyHistory, ServerCompanyEconomyHistory],
     ]:
-        (company_id,) = self.read_byte()
-        money, current_loan, income = self.read_longlong(3)
-        (delivered_now,) = self.read_ushort()
-        history = [
-            ServerCompanyEconomyHistory(*self.read_longlong(), *self.read_ushort(2))
-            for _ in range(2)
-        ]
+        company_id, money, current_loan, income, delivered_now, *rest = self.read_data(
+            ["byte", "q", "q", "q", "ushort"] + ["q", "ushort", "ushort"] * 2
+        )
+        history = [ServerCompanyEconomyHistory(*rest[0:3]), ServerCompanyEconomyHistory(*rest[3:6])]
         return self.data(
             company_id,
             money,
@@ -480,16 +428,22 @@ class ServerCompanyStats(Packet):
         self.write_ushort(*ServerCompanyStatsStats(*stations))
 
     def decode(self) -> Tuple[int, ServerCompanyStatsStats, ServerCompanyStatsStats]:
-        (company_id,) = self.read_byte()
-        vehicles = ServerCompanyStatsStats(*self.read_ushort(5))
-        stations = ServerCompanyStatsStats(*self.read_ushort(5))
+        company_id, *stats = self.read_data(["byte"] + ["ushort"] * 10)
+        vehicles = ServerCompanyStatsStats(*stats[0:5])
+        stations = ServerCompanyStatsStats(*stats[5:10])
         return self.data(company_id, vehicles, stations)
 
 
 @Packet.register
 class ServerChat(Packet):
     packet_id = 119
-    fields = ["action", "type", "client_id", "message", "extra"]
+    schema = [
+        Field("action", "byte", Action),
+        Field("type", "byte", DestType),
+        Field("client_id", "uint"),
+        Field("message", str, max_length=NETWORK_CHAT_LENGTH),
+        Field("extra", "ulong long"),
+    ]
 
     # noinspection PyShadowingBuiltins
     def encode(
@@ -500,41 +454,29 @@ class ServerChat(Packet):
         self.write_str(check_length(message, NETWORK_CHAT_LENGTH, "'message'"))
         self.write_ulonglong(extra)
 
-    def decode(self) -> Tuple[Action, DestType, int, str, int]:
-        action, _type = self.read_byte(2)
-        (client_id,) = self.read_uint()
-        (message,) = self.read_str()
-        (extra,) = self.read_ulonglong()
-        return self.data(
-            Action(action),
-            DestType(_type),
-            client_id,
-            check_length(message, NETWORK_CHAT_LENGTH, "'message'"),
-            extra,
-        )
-
 
 @Packet.register
 class ServerRcon(Packet):
     packet_id = 120
-    fields = ["colour", "result"]
+    schema = [
+        Field("colour", "ushort"),
+        Field("result", str, max_length=NETWORK_RCONCOMMAND_LENGTH),
+    ]
 
     def encode(self, colour: Colour, result: str):
         self.write_ushort(Colour(colour))
         self.write_str(check_length(result, NETWORK_RCONCOMMAND_LENGTH, "'result'"))
 
-    def decode(self) -> Tuple[Colour, str]:
-        (colour,) = self.read_ushort()
-        (result,) = self.read_str()
-        return self.data(
-            colour, check_length(result, NETWORK_RCONCOMMAND_LENGTH, "'result'")
-        )
-
 
 @Packet.register
 class ServerConsole(Packet):
     packet_id = 121
-    fields = ["origin", "message"]
+    # The maximum length for origin and message is not known. For sanity we stick to
+    #  NETWORK_GAMESCRIPT_JSON_LENGTH as that is closest to COMPAT_MTU
+    schema = [
+        Field("origin", str, max_length=NETWORK_GAMESCRIPT_JSON_LENGTH),
+        Field("message", str, max_length=NETWORK_GAMESCRIPT_JSON_LENGTH),
+    ]
 
     def encode(self, origin: str, message: str):
         # The maximum length for origin and message is not known. For sanity we stick to
@@ -544,15 +486,6 @@ class ServerConsole(Packet):
             check_length(message, NETWORK_GAMESCRIPT_JSON_LENGTH, "'message'"),
         )
 
-    def decode(self) -> Tuple[str, str]:
-        # The maximum length for origin and message is not known. For sanity we stick to
-        #  NETWORK_GAMESCRIPT_JSON_LENGTH as that is closest to COMPAT_MTU
-        origin, message = self.read_str(2)
-        return self.data(
-            check_length(origin, NETWORK_GAMESCRIPT_JSON_LENGTH, "'origin'"),
-            check_length(message, NETWORK_GAMESCRIPT_JSON_LENGTH, "'message'"),
-        )
-
 
 @Packet.register
 class ServerCmdNames(Packet):
@@ -579,15 +512,16 @@ class ServerCmdNames(Packet):
 @Packet.register
 class ServerCmdLogging(Packet):
     packet_id = 123
-    fields = [
-        "client_id",
-        "company_id",
-        "command_id",
-        "param1",
-        "param2",
-        "tile",
-        "text",
-        "frame",
+    # TODO: Figure out the max length for `text`
+    schema = [
+        Field("client_id", "uint"),
+        Field("company_id", "byte"),
+        Field("command_id", "ushort"),
+        Field("param1", "uint"),
+        Field("param2", "uint"),
+        Field("tile", "uint"),
+        Field("text", str),
+        Field("frame", "uint"),
     ]
 
     def encode(
@@ -601,7 +535,6 @@ class ServerCmdLogging(Packet):
         text: str,
         frame: int,
     ):
-        # TODO: Figure out the max length for `text`
         self.write_uint(client_id)
         self.write_byte(company_id)
         self.write_ushort(command_id)
@@ -609,22 +542,6 @@ class ServerCmdLogging(Packet):
         self.write_str(text)
         self.write_uint(frame)
 
-    def decode(self) -> Tuple[int, int, int, int, int, int, str, int]:
-        client_id, company_id, command_id = self.read_data(["uint", "byte", "ushort"])
-        param1, param2, tile = self.read_uint(3)
-        (text,) = self.read_str()
-        (frame,) = self.read_uint()
-        return self.data(
-            client_id,
-            company_id,
-            company_id,
-            param1,
-            param2,
-            tile,
-            text,
-            frame,
-        )
-
 
 @Packet.register
 class ServerGamescript(AdminGamescript):
@@ -644,7 +561,11 @@ class ServerPong(AdminPing):
 @Packet.register
 class ServerAuthRequest(Packet):
     packet_id = 128
-    fields = ["method", "public_key", "key_exchange_nonce"]
+    schema = [
+        Field("method", "byte"),
+        Field("public_key", "%ds" % PUBLIC_KEY_SIZE),
+        Field("key_exchange_nonce", "%ds" % NONCE_SIZE),
+    ]
 
     def encode(self, method: int, public_key: bytes, key_exchange_nonce: bytes):
         if len(public_key) != PUBLIC_KEY_SIZE:
@@ -658,17 +579,11 @@ class ServerAuthRequest(Packet):
         for b in key_exchange_nonce:
             self.write_byte(b)
 
-    def decode(self) -> Tuple[int, bytes, bytes]:
-        method, = self.read_byte()
-        public_key = bytes(self.read_byte(PUBLIC_KEY_SIZE))
-        key_exchange_nonce = bytes(self.read_byte(NONCE_SIZE))
-        return self.data(method, public_key, key_exchange_nonce)
-
 
 @Packet.register
 class ServerEnableEncryption(Packet):
     packet_id = 129
-    fields = ["encryption_nonce"]
+    schema = [Field("encryption_nonce", "%ds" % NONCE_SIZE)]
 
     def encode(self, encryption_nonce: bytes):
         if len(encryption_nonce) != NONCE_SIZE:
@@ -676,7 +591,3 @@ class ServerEnableEncryption(Packet):
 
         for b in encryption_nonce:
             self.write_byte(b)
-
-    def decode(self) -> bytes:
-        encryption_nonce = bytes(self.read_byte(NONCE_SIZE))
-        return self.data(encryption_nonce)
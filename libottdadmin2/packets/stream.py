@@ -0,0 +1,76 @@
+#
+# This file is part of libottdadmin2
+#
+# License: http://creativecommons.org/licenses/by-nc-sa/3.0/
+#
+
+from typing import Any, Iterable, Iterator, Optional, Tuple, Type
+
+from libottdadmin2.packets.base import Packet
+from libottdadmin2.packets.buffer import ReceiveBuffer
+
+
+class PacketStreamDecoder:
+    """Incremental decoder for a stream of admin port packets, without a connection.
+
+    Feed it chunks of any size; complete packets are framed and decoded lazily while
+    iterating over the generator returned by :meth:`feed` (or :meth:`packets`). Data
+    that does not form a complete packet yet is kept for the next chunk.
+
+    :param types: Only decode these packet classes, others are skipped without copying.
+    :param skip_unknown: Skip unknown packet ids; when False an UnknownPacketError is
+        raised for them instead (the offending packet is dropped, iteration can continue
+        with a new generator).
+    :param decryption_handler: Decrypt the stream; may also be set later on through the
+        ``decryption_handler`` attribute, e.g. after the encryption handshake.
+    :param lazy: Yield :class:`~libottdadmin2.packets.base.LazyPacketData` views that only
+        decode the fields that are read.
+    """
+
+    def __init__(
+        self,
+        types: Optional[Iterable[Type[Packet]]] = None,
+        skip_unknown: bool = True,
+        decryption_handler=None,
+        buffer: Optional[ReceiveBuffer] = None,
+        lazy: bool = False,
+    ):
+        self.packet_ids = None if types is None else frozenset(x.packet_id for x in types)
+        self.skip_unknown = skip_unknown
+        self.decryption_handler = decryption_handler
+        self._buffer = buffer if buffer is not None else ReceiveBuffer()
+        self.lazy = lazy
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def feed(self, data: bytes) -> Iterator[Tuple[Type[Packet], Any]]:
+        """Add a chunk of data and return a generator over the packets available now."""
+        self._buffer.feed(data)
+        return self.packets()
+
+    def packets(self) -> Iterator[Tuple[Type[Packet], Any]]:
+        """Generator of ``(packet_class, data)`` for every complete packet in the buffer."""
+        buffer = self._buffer
+        lazy = self.lazy
+        while True:
+            found, length, packet = buffer.extract(
+                self.decryption_handler, self.packet_ids, self.skip_unknown
+            )
+            if not length:
+                return
+            if found:
+                yield packet.__class__, packet.decode_lazy() if lazy else packet.decode()
+
+    def decode_all(self, chunks: Iterable[bytes]) -> Iterator[Tuple[Type[Packet], Any]]:
+        """Generator of ``(packet_class, data)`` for an iterable of chunks, e.g. a file."""
+        for chunk in chunks:
+            yield from self.feed(chunk)
+
+    def clear(self) -> None:
+        self._buffer.clear()
+
+
+__all__ = [
+    "PacketStreamDecoder",
+]
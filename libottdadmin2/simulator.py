@@ -0,0 +1,664 @@
+#
+# This file is part of libottdadmin2
+#
+# License: http://creativecommons.org/licenses/by-nc-sa/3.0/
+#
+
+"""A simulated OpenTTD admin port, for load and latency testing clients locally.
+
+The simulator speaks the server side of the admin protocol: it accepts ``AdminJoin`` and
+``AdminJoinSecure`` (including the key exchange and encryption), answers polls, pings and
+rcon commands, and keeps track of the update frequencies every admin asked for. A synthetic
+game generates client, company, economy, stats, chat and command logging traffic at the
+configured rates (events per second, per update type), which is sent to every admin that
+subscribed to the update type with any frequency other than POLL.
+
+Generated packets are encoded once per tick and shared by all unencrypted connections, so
+the simulator can feed hundreds of connections at tens of thousands of packets per second.
+Connections whose transport asks to pause writing miss generated traffic instead of
+buffering it; these packets are counted in :attr:`OttdAdminSimulator.dropped`.
+"""
+
+import asyncio
+import random
+import struct
+from datetime import datetime, timedelta
+from os import urandom
+from typing import Any, Dict, Iterable, List, Optional
+
+from monocypher import (
+    Blake2b,
+    IncrementalAuthenticatedEncryption,
+    compute_key_exchange_public_key,
+    generate_key,
+    key_exchange,
+    unlock,
+    wipe,
+)
+
+from libottdadmin2.constants import NETWORK_GAME_ADMIN_VERSION, NONCE_SIZE
+from libottdadmin2.enums import (
+    Action,
+    AuthenticationMethod,
+    ClientID,
+    Colour,
+    DestType,
+    ErrorCode,
+    Landscape,
+    Language,
+    PollExtra,
+    UpdateFrequency,
+    UpdateType,
+)
+from libottdadmin2.exceptions import OttdException
+from libottdadmin2.packets import (
+    AdminAuthResponse,
+    AdminJoin,
+    AdminJoinSecure,
+    AdminQuit,
+    Packet,
+    ServerAuthRequest,
+    ServerChat,
+    ServerClientInfo,
+    ServerClientJoin,
+    ServerClientQuit,
+    ServerClientUpdate,
+    ServerCmdLogging,
+    ServerCmdNames,
+    ServerCompanyEconomy,
+    ServerCompanyInfo,
+    ServerCompanyStats,
+    ServerCompanyUpdate,
+    ServerDate,
+    ServerError,
+    ServerPong,
+    ServerProtocol,
+    ServerRcon,
+    ServerRconEnd,
+    ServerWelcome,
+)
+from libottdadmin2.packets.buffer import ReceiveBuffer
+from libottdadmin2.packets.server import ServerEnableEncryption
+from libottdadmin2.util import camel_to_snake, loggable
+
+# The frequencies a (dedicated) OpenTTD server announces in its ServerProtocol packet.
+SUPPORTED_FREQUENCIES = {
+    UpdateType.DATE: 0x3F,
+    UpdateType.CLIENT_INFO: UpdateFrequency.AUTOMATIC | UpdateFrequency.POLL,
+    UpdateType.COMPANY_INFO: UpdateFrequency.AUTOMATIC | UpdateFrequency.POLL,
+    UpdateType.COMPANY_ECONOMY: 0x3D,
+    UpdateType.COMPANY_STATS: 0x3D,
+    UpdateType.CHAT: UpdateFrequency.AUTOMATIC,
+    UpdateType.CONSOLE: UpdateFrequency.AUTOMATIC,
+    UpdateType.NAMES: UpdateFrequency.POLL,
+    UpdateType.LOGGING: UpdateFrequency.AUTOMATIC,
+    UpdateType.GAMESCRIPT: UpdateFrequency.AUTOMATIC,
+}
+
+# Packets an admin may send before it has been authenticated.
+PRE_AUTH_PACKETS = frozenset(x.packet_id for x in (AdminJoin, AdminJoinSecure, AdminAuthResponse, AdminQuit))
+
+# Events per second generated for each update type, unless configured otherwise.
+DEFAULT_RATES = {
+    UpdateType.DATE: 1.0,
+    UpdateType.CLIENT_INFO: 1.0,
+    UpdateType.COMPANY_INFO: 0.5,
+    UpdateType.COMPANY_ECONOMY: 1.0,
+    UpdateType.COMPANY_STATS: 1.0,
+    UpdateType.CHAT: 10.0,
+    UpdateType.LOGGING: 50.0,
+}
+
+COMMAND_NAMES = (
+    "CmdBuildRailroadTrack",
+    "CmdRemoveRailroadTrack",
+    "CmdBuildSingleRail",
+    "CmdBuildRoad",
+    "CmdBuildRailStation",
+    "CmdBuildTrainDepot",
+    "CmdBuildVehicle",
+    "CmdStartStopVehicle",
+    "CmdInsertOrder",
+    "CmdTerraformLand",
+    "CmdLandscapeClear",
+    "CmdBuildBridge",
+    "CmdBuildTunnel",
+    "CmdGiveMoney",
+    "CmdChangeSetting",
+    "CmdRenameVehicle",
+)
+
+WORDS = (
+    "train", "station", "depot", "signal", "bridge", "tunnel", "coal", "mail",
+    "passengers", "oil", "the", "is", "at", "my", "who", "built", "a", "jam", "lol", "?",
+)
+
+
+class SimulatedGame:
+    """The synthetic game state the simulator reports on.
+
+    :param clients: Number of clients to start with; joins and quits keep it around this number.
+    :param companies: Number of companies.
+    :param seed: Seed for the random generator, for reproducible traffic.
+    """
+
+    def __init__(self, clients: int = 16, companies: int = 8, seed: Optional[int] = None):
+        self.random = random.Random(seed)
+        self.target_clients = clients
+        self.date = datetime(1950, 1, 1)
+        self.frame = 0
+        self.next_client_id = ClientID.FIRST
+        self.clients = {}  # Type: Dict[int, Dict[str, Any]]
+        self.companies = {
+            company_id: self._new_company(company_id) for company_id in range(companies)
+        }
+        self.economy = {company_id: self._new_economy() for company_id in self.companies}
+        self.commands = dict(enumerate(COMMAND_NAMES))
+        for _ in range(clients):
+            self.add_client()
+
+    def _new_company(self, company_id: int) -> Dict[str, Any]:
+        return dict(
+            company_id=company_id,
+            name="Company %d Transport" % company_id,
+            manager="Manager %d" % company_id,
+            colour=Colour(company_id % Colour.END),
+            passworded=False,
+            bankruptcy_counter=0,
+            shareholders=(255, 255, 255, 255),
+        )
+
+    def _new_economy(self) -> Dict[str, Any]:
+        return dict(money=100000, current_loan=300000, income=0, delivered=0)
+
+    def _company_id(self) -> int:
+        return self.random.choice(list(self.companies)) if self.companies else 255
+
+    def _text(self, words: int) -> str:
+        return " ".join(self.random.choice(WORDS) for _ in range(words))
+
+    def add_client(self) -> int:
+        client_id = self.next_client_id
+        self.next_client_id += 1
+        self.clients[client_id] = dict(
+            client_id=client_id,
+            hostname="10.0.%d.%d" % (client_id // 256 % 256, client_id % 256),
+            name="Player %d" % client_id,
+            language=Language.ENGLISH,
+            joindate=self.date,
+            play_as=self._company_id(),
+        )
+        return client_id
+
+    def client_info(self, client_id: int) -> Packet:
+        return ServerClientInfo.create(**self.clients[client_id])
+
+    def company_info(self, company_id: int) -> Packet:
+        return ServerCompanyInfo.create(
+            startyear=1950, is_ai=False, **self.companies[company_id]
+        )
+
+    def company_economy(self, company_id: int) -> Packet:
+        history = ((1000, 500, 10), (900, 400, 8))
+        return ServerCompanyEconomy.create(
+            company_id=company_id, history=history, **self.economy[company_id]
+        )
+
+    def company_stats(self, company_id: int) -> Packet:
+        rand = self.random.randrange
+        return ServerCompanyStats.create(
+            company_id=company_id,
+            vehicles=tuple(rand(100) for _ in range(5)),
+            stations=tuple(rand(50) for _ in range(5)),
+        )
+
+    def poll(self, update_type: UpdateType, extra: int) -> List[Packet]:
+        """The packets answering an AdminPoll."""
+        if update_type == UpdateType.DATE:
+            return [ServerDate.create(date=self.date)]
+        if update_type == UpdateType.NAMES:
+            return [ServerCmdNames.create(commands=self.commands)]
+        if update_type == UpdateType.CLIENT_INFO:
+            ids, factory = self.clients, self.client_info
+        elif update_type == UpdateType.COMPANY_INFO:
+            ids, factory = self.companies, self.company_info
+        elif update_type == UpdateType.COMPANY_ECONOMY:
+            ids, factory = self.companies, self.company_economy
+        elif update_type == UpdateType.COMPANY_STATS:
+            ids, factory = self.companies, self.company_stats
+        else:
+            return []
+        if extra == PollExtra.ALL:
+            return [factory(x) for x in ids]
+        return [factory(extra)] if extra in ids else []
+
+    def generate(self, update_type: UpdateType) -> List[Packet]:
+        """The packets for one synthetic event of the given update type."""
+        rand = self.random
+        if update_type == UpdateType.DATE:
+            self.date += timedelta(days=1)
+            return [ServerDate.create(date=self.date)]
+        if update_type == UpdateType.CLIENT_INFO:
+            # Joins and quits keep the number of clients around its target.
+            roll = rand.random() * 2 * self.target_clients
+            if roll >= len(self.clients) or not self.clients:
+                client_id = self.add_client()
+                return [ServerClientJoin.create(client_id=client_id), self.client_info(client_id)]
+            client_id = rand.choice(list(self.clients))
+            if roll < len(self.clients) / 2:
+                del self.clients[client_id]
+                return [ServerClientQuit.create(client_id=client_id)]
+            client = self.clients[client_id]
+            client["play_as"] = self._company_id()
+            return [ServerClientUpdate.create(client_id=client_id, name=client["name"], play_as=client["play_as"])]
+        if not self.companies:
+            return []
+        if update_type == UpdateType.COMPANY_INFO:
+            company = self.companies[self._company_id()]
+            company["colour"] = Colour(rand.randrange(Colour.END))
+            return [ServerCompanyUpdate.create(**company)]
+        if update_type == UpdateType.COMPANY_ECONOMY:
+            company_id = self._company_id()
+            economy = self.economy[company_id]
+            economy["income"] = rand.randrange(-50000, 50000)
+            economy["money"] += economy["income"]
+            economy["delivered"] = rand.randrange(1000)
+            return [self.company_economy(company_id)]
+        if update_type == UpdateType.COMPANY_STATS:
+            return [self.company_stats(self._company_id())]
+        if update_type == UpdateType.CHAT and self.clients:
+            return [
+                ServerChat.create(
+                    action=Action.CHAT,
+                    type=DestType.BROADCAST,
+                    client_id=rand.choice(list(self.clients)),
+                    message=self._text(rand.randrange(1, 12)),
+                    extra=0,
+                )
+            ]
+        if update_type == UpdateType.LOGGING:
+            self.frame += rand.randrange(1, 8)
+            return [
+                ServerCmdLogging.create(
+                    client_id=rand.choice(list(self.clients)) if self.clients else ClientID.SERVER,
+                    company_id=self._company_id(),
+                    command_id=rand.randrange(len(self.commands)),
+                    param1=rand.getrandbits(32),
+                    param2=rand.getrandbits(32),
+                    tile=rand.getrandbits(20),
+                    text="",
+                    frame=self.frame,
+                )
+            ]
+        return []
+
+
+@loggable
+class SimulatedAdminConnection(asyncio.Protocol):
+    """Server side of one admin connection to the simulator."""
+
+    def __init__(self, simulator: "OttdAdminSimulator"):
+        self.simulator = simulator
+        self.transport = None  # Type: Optional[asyncio.Transport]
+        self.peername = None  # Type: Optional[Tuple[str, int]]
+        self.name = None  # Type: Optional[str]
+        self.authenticated = False
+        self.frequencies = {}  # Type: Dict[UpdateType, UpdateFrequency]
+        self.paused = False
+        self._buffer = ReceiveBuffer()
+        self._encryption_handler = None  # Type: Optional[IncrementalAuthenticatedEncryption]
+        self._decryption_handler = None  # Type: Optional[IncrementalAuthenticatedEncryption]
+        self._methods = []  # Type: List[AuthenticationMethod]
+        self._secret_key = None  # Type: Optional[bytes]
+        self._public_key = None  # Type: Optional[bytes]
+        self._key_exchange_nonce = None  # Type: Optional[bytes]
+
+    @property
+    def encrypted(self) -> bool:
+        return self._encryption_handler is not None
+
+    def connection_made(self, transport: asyncio.Transport) -> None:
+        self.transport = transport
+        self.peername = transport.get_extra_info("peername")
+        self.simulator.connections.add(self)
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.simulator.connections.discard(self)
+        self.transport = None
+
+    def pause_writing(self) -> None:
+        self.paused = True
+
+    def resume_writing(self) -> None:
+        self.paused = False
+
+    def data_received(self, data: bytes) -> None:
+        self._buffer.feed(data)
+        while self.transport is not None:
+            try:
+                found, length, packet = self._buffer.extract(self._decryption_handler, skip_unknown=False)
+                if not length:
+                    return
+                data = packet.decode()
+            except (OttdException, ValueError, struct.error) as e:
+                self.log.warning("Invalid data from %s: %s", self.peername, e)
+                self.error(ErrorCode.ILLEGAL_PACKET)
+                return
+            self.packet_received(packet, data)
+
+    def packet_received(self, packet: Packet, data: Any) -> None:
+        handler = getattr(self, "on_%s" % camel_to_snake(packet.__class__.__name__), None)
+        if handler is None:
+            self.log.debug("Ignoring %s", packet.__class__.__name__)
+            return
+        if not self.authenticated and packet.packet_id not in PRE_AUTH_PACKETS:
+            self.error(ErrorCode.NOT_EXPECTED)
+            return
+        handler(**data._asdict())
+
+    def send_packet(self, packet: Packet) -> None:
+        if self.transport is not None:
+            self.transport.write(packet.write_to_buffer(self._encryption_handler))
+
+    def write(self, data: bytes) -> None:
+        """Write already encoded packets."""
+        if self.transport is not None:
+            self.transport.write(data)
+
+    def error(self, errorcode: ErrorCode) -> None:
+        """Send an error and close the connection, like OpenTTD does."""
+        self.send_packet(ServerError.create(errorcode=errorcode))
+        self.close()
+
+    def close(self) -> None:
+        if self.transport is not None:
+            self.transport.close()
+
+    def subscribed(self, update_type: UpdateType) -> bool:
+        """Whether generated traffic of the update type is sent to this admin."""
+        return bool(self.frequencies.get(update_type, 0) & ~UpdateFrequency.POLL)
+
+    def welcome(self) -> None:
+        simulator = self.simulator
+        game = simulator.game
+        self.authenticated = True
+        self.log.info("Admin %s connected from %s", self.name, self.peername)
+        self.send_packet(
+            ServerProtocol.create(version=NETWORK_GAME_ADMIN_VERSION, settings=SUPPORTED_FREQUENCIES)
+        )
+        self.send_packet(
+            ServerWelcome.create(
+                name=simulator.name,
+                version=simulator.version,
+                dedicated=True,
+                map="Simulated Map",
+                seed=0,
+                landscape=Landscape.TEMPERATE,
+                startdate=game.date,
+                x=256,
+                y=256,
+            )
+        )
+
+    def on_admin_join(self, password: str, name: str, version: str) -> None:
+        simulator = self.simulator
+        if self.authenticated or self._methods:
+            self.error(ErrorCode.NOT_EXPECTED)
+        elif not simulator.allow_insecure_join or not simulator.password:
+            self.error(ErrorCode.NOT_AUTHORIZED)
+        elif password != simulator.password:
+            self.error(ErrorCode.WRONG_PASSWORD)
+        else:
+            self.name = name
+            self.welcome()
+
+    def on_admin_join_secure(self, name: str, version: str, methods: int) -> None:
+        if self.authenticated or self._methods:
+            self.error(ErrorCode.NOT_EXPECTED)
+            return
+        self.name = name
+        # Like OpenTTD, try the authorized keys before the password.
+        self._methods = [
+            method
+            for method in (AuthenticationMethod.X25519_AUTHORIZED_KEY, AuthenticationMethod.X25519_PAKE)
+            if methods & (1 << method) and self.simulator.supports(method)
+        ]
+        self.auth_request()
+
+    def auth_request(self) -> None:
+        if not self._methods:
+            self.error(ErrorCode.NO_AUTHENTICATION_METHOD_AVAILABLE)
+            return
+        self._secret_key = generate_key()
+        self._public_key = compute_key_exchange_public_key(self._secret_key)
+        self._key_exchange_nonce = urandom(NONCE_SIZE)
+        self.send_packet(
+            ServerAuthRequest.create(
+                method=self._methods[0],
+                public_key=self._public_key,
+                key_exchange_nonce=self._key_exchange_nonce,
+            )
+        )
+
+    def on_admin_auth_response(self, public_key: bytes, message: bytes, mac: bytes) -> None:
+        if self.authenticated or not self._methods:
+            self.error(ErrorCode.NOT_EXPECTED)
+            return
+        method = self._methods.pop(0)
+        payload = self.simulator.password.encode("utf-8") if method == AuthenticationMethod.X25519_PAKE else b""
+
+        shared_secret = key_exchange(self._secret_key, public_key)
+        digest = Blake2b(hash_size=64)
+        digest.update(shared_secret)
+        digest.update(self._public_key)  # The server's public key
+        digest.update(public_key)  # The client's public key
+        digest.update(payload)
+        shared_keys = digest.finalize()
+        wipe(shared_secret)
+
+        valid = unlock(
+            key=shared_keys[:32],
+            nonce=self._key_exchange_nonce,
+            mac=mac,
+            message=message,
+            associated_data=public_key,
+        ) is not None
+        if method == AuthenticationMethod.X25519_PAKE:
+            if not valid:
+                self.error(ErrorCode.WRONG_PASSWORD)
+                return
+        elif not valid or public_key not in self.simulator.authorized_keys:
+            if self._methods:
+                # Not an authorized key, fall back to the password.
+                self.auth_request()
+            else:
+                self.error(ErrorCode.NOT_ON_ALLOW_LIST)
+            return
+
+        # The enable packet itself is still sent unencrypted.
+        encryption_nonce = urandom(NONCE_SIZE)
+        self.send_packet(ServerEnableEncryption.create(encryption_nonce=encryption_nonce))
+        self._encryption_handler = IncrementalAuthenticatedEncryption(key=shared_keys[32:], nonce=encryption_nonce)
+        self._decryption_handler = IncrementalAuthenticatedEncryption(key=shared_keys[:32], nonce=encryption_nonce)
+        self._methods = []
+        self.welcome()
+
+    def on_admin_quit(self) -> None:
+        self.close()
+
+    def on_admin_update_frequency(self, type: UpdateType, freq: UpdateFrequency) -> None:
+        if type not in SUPPORTED_FREQUENCIES or freq & ~SUPPORTED_FREQUENCIES[type]:
+            self.error(ErrorCode.ILLEGAL_PACKET)
+            return
+        if freq:
+            self.frequencies[type] = freq
+        else:
+            self.frequencies.pop(type, None)
+
+    def on_admin_poll(self, type: UpdateType, extra: int) -> None:
+        if type not in SUPPORTED_FREQUENCIES or not SUPPORTED_FREQUENCIES[type] & UpdateFrequency.POLL:
+            self.error(ErrorCode.ILLEGAL_PACKET)
+            return
+        for packet in self.simulator.game.poll(type, extra):
+            self.send_packet(packet)
+
+    def on_admin_ping(self, payload: int) -> None:
+        self.send_packet(ServerPong.create(payload=payload))
+
+    def on_admin_rcon(self, command: str) -> None:
+        for line in self.simulator.rcon(command):
+            self.send_packet(ServerRcon.create(colour=Colour.WHITE, result=line))
+        self.send_packet(ServerRconEnd.create(command=command))
+
+    def on_admin_chat(self, action: Action, type: DestType, client_id: int, message: str) -> None:
+        # Chat from admins is shown as coming from the server.
+        packet = ServerChat.create(action=action, type=type, client_id=ClientID.SERVER, message=message, extra=0)
+        self.simulator.broadcast(UpdateType.CHAT, [packet])
+
+
+@loggable
+class OttdAdminSimulator:
+    """Asyncio server simulating the admin port of an OpenTTD server.
+
+    :param password: The admin password, for both insecure joins and password authentication.
+    :param authorized_keys: Hexadecimal public keys that may join without password.
+    :param allow_insecure_join: Accept the (pre OpenTTD 15) unencrypted AdminJoin.
+    :param rates: Synthetic events per second for each update type, see :data:`DEFAULT_RATES`.
+    :param clients: Number of clients in the synthetic game.
+    :param companies: Number of companies in the synthetic game.
+    :param seed: Seed for reproducible traffic.
+    :param tick: Seconds between generating (and sending) traffic.
+    """
+
+    def __init__(
+        self,
+        password: Optional[str] = None,
+        authorized_keys: Iterable[str] = (),
+        allow_insecure_join: bool = True,
+        rates: Optional[Dict[UpdateType, float]] = None,
+        clients: int = 16,
+        companies: int = 8,
+        seed: Optional[int] = None,
+        tick: float = 0.01,
+        name: str = "Simulated Server",
+        version: str = "15.0",
+    ):
+        self.password = password
+        self.authorized_keys = frozenset(bytes.fromhex(key) for key in authorized_keys)
+        self.allow_insecure_join = allow_insecure_join
+        self.rates = dict(DEFAULT_RATES if rates is None else rates)
+        self.game = SimulatedGame(clients=clients, companies=companies, seed=seed)
+        self.tick = tick
+        self.name = name
+        self.version = version
+        self.connections = set()  # Type: Set[SimulatedAdminConnection]
+        self.server = None  # Type: Optional[asyncio.AbstractServer]
+        self.packets = 0  # Packets sent by the traffic generator, counted once per connection.
+        self.dropped = 0  # Packets not sent to connections that paused writing.
+        self._budget = {}  # Type: Dict[UpdateType, float]
+        self._task = None  # Type: Optional[asyncio.Task]
+
+    @property
+    def port(self) -> int:
+        return self.server.sockets[0].getsockname()[1]
+
+    def supports(self, method: AuthenticationMethod) -> bool:
+        if method == AuthenticationMethod.X25519_PAKE:
+            return bool(self.password)
+        if method == AuthenticationMethod.X25519_AUTHORIZED_KEY:
+            return bool(self.authorized_keys)
+        return False
+
+    def rcon(self, command: str) -> List[str]:
+        """The output of an rcon command; override to simulate specific commands."""
+        return ["Simulated output of '%s'" % command]
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        """Start listening, on a random port by default, and start generating traffic."""
+        loop = asyncio.get_running_loop()
+        self.server = await loop.create_server(lambda: SimulatedAdminConnection(self), host, port)
+        self._task = loop.create_task(self._generate())
+        self.log.info("Simulating an admin port on %s:%d", host, self.port)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.server is not None:
+            self.server.close()
+            for connection in list(self.connections):
+                connection.close()
+            await self.server.wait_closed()
+            # Let the transports finish closing.
+            await asyncio.sleep(0)
+            self.server = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    async def _generate(self) -> None:
+        loop = asyncio.get_running_loop()
+        last = loop.time()
+        while True:
+            await asyncio.sleep(self.tick)
+            now = loop.time()
+            self.step(now - last)
+            last = now
+
+    def step(self, elapsed: float) -> None:
+        """Generate and send the traffic for ``elapsed`` seconds of simulated time."""
+        # Only generate events somebody is subscribed to.
+        wanted = {
+            update_type
+            for connection in self.connections
+            if connection.authenticated
+            for update_type in connection.frequencies
+            if connection.subscribed(update_type)
+        }
+        for update_type, rate in self.rates.items():
+            if update_type not in wanted:
+                self._budget.pop(update_type, None)
+                continue
+            budget = self._budget.get(update_type, 0.0) + rate * elapsed
+            events = int(budget)
+            self._budget[update_type] = budget - events
+            if events:
+                packets = []
+                for _ in range(events):
+                    packets.extend(self.game.generate(update_type))
+                self.broadcast(update_type, packets)
+
+    def broadcast(self, update_type: UpdateType, packets: List[Packet]) -> None:
+        """Send packets to all admins subscribed to the update type."""
+        plain = None
+        for connection in self.connections:
+            if not connection.authenticated or not connection.subscribed(update_type):
+                continue
+            if connection.paused:
+                self.dropped += len(packets)
+                continue
+            if connection.encrypted:
+                handler = connection._encryption_handler
+                connection.write(b"".join([packet.write_to_buffer(handler) for packet in packets]))
+            else:
+                if plain is None:
+                    plain = b"".join([packet.write_to_buffer() for packet in packets])
+                connection.write(plain)
+            self.packets += len(packets)
+
+
+__all__ = [
+    "DEFAULT_RATES",
+    "SUPPORTED_FREQUENCIES",
+    "OttdAdminSimulator",
+    "SimulatedAdminConnection",
+    "SimulatedGame",
+]
@@ -0,0 +1,83 @@
+import unittest
+
+from datetime import datetime
+
+from libottdadmin2.client.common import OttdClientMixIn
+from libottdadmin2.packets import Packet, ServerClientJoin, ServerDate
+from libottdadmin2.packets.buffer import ReceiveBuffer
+from .packet_data import PACKETS
+
+
+class BufferClient(OttdClientMixIn):
+    def __init__(self, **kwargs):
+        self._buffer = ReceiveBuffer(**kwargs)
+        self.received = []
+
+    def on_server_client_join(self, client_id):
+        self.received.append(client_id)
+
+
+class TestReceiveBuffer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.frames = [
+            ServerClientJoin.create(client_id=i).write_to_buffer() for i in range(500)
+        ]
+        self.stream = b"".join(self.frames)
+
+    def test_001_extract_many(self):
+        buffer = ReceiveBuffer()
+        buffer.feed(self.stream)
+        ids = []
+        while True:
+            found, length, packet = buffer.extract()
+            if not found:
+                break
+            ids.append(packet.decode().client_id)
+        self.assertEqual(list(range(500)), ids)
+        self.assertEqual(0, len(buffer))
+
+    def test_002_split_chunks(self):
+        for chunk_size in (1, 2, 5, 7, 64):
+            with self.subTest(chunk_size=chunk_size):
+                client = BufferClient(size=16, min_free=16)
+                for offset in range(0, len(self.stream), chunk_size):
+                    client.data_received(self.stream[offset : offset + chunk_size])
+                self.assertEqual(list(range(500)), client.received)
+                self.assertEqual(0, len(client._buffer))
+
+    def test_003_get_buffer(self):
+        client = BufferClient(size=32, min_free=8)
+        for offset in range(0, len(self.stream), 13):
+            chunk = self.stream[offset : offset + 13]
+            target = client.get_buffer(len(chunk))
+            self.assertGreaterEqual(len(target), len(chunk))
+            target[0 : len(chunk)] = chunk
+            client.buffer_updated(len(chunk))
+        self.assertEqual(list(range(500)), client.received)
+
+    def test_004_unknown_packets_are_skipped(self):
+        unknown = b"\x05\x00\xfe\x01\x02"
+        client = BufferClient()
+        client.data_received(b"".join([self.frames[0], unknown, self.frames[1]]))
+        self.assertEqual([0, 1], client.received)
+
+    def test_005_known_packets(self):
+        for name, data in PACKETS.items():
+            with self.subTest(name=name):
+                pkt, _ = Packet.from_name_and_buffer(name, data)
+                buffer = ReceiveBuffer()
+                buffer.feed(b"".join([pkt.header, pkt.buffer]))
+                found, length, extracted = buffer.extract()
+                self.assertTrue(found)
+                self.assertEqual(pkt.__class__, extracted.__class__)
+                self.assertEqual(pkt.buffer, extracted.buffer)
+
+    def test_006_partial_header(self):
+        buffer = ReceiveBuffer()
+        frame = ServerDate.create(date=datetime(2000, 1, 1)).write_to_buffer()
+        buffer.feed(frame[:2])
+        self.assertEqual((False, 0, None), buffer.extract())
+        buffer.feed(frame[2:])
+        found, length, packet = buffer.extract()
+        self.assertTrue(found)
+        self.assertEqual(len(frame), length)
@@ -0,0 +1,58 @@
+import asyncio
+import unittest
+
+from libottdadmin2.client.asyncio import OttdAdminProtocol, OttdAdminBufferedProtocol
+from libottdadmin2.packets import ServerClientJoin
+
+
+class Recorder:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.received = []
+
+    def on_server_client_join(self, client_id):
+        self.received.append(client_id)
+
+
+class RecordingProtocol(Recorder, OttdAdminProtocol):
+    pass
+
+
+class RecordingBufferedProtocol(Recorder, OttdAdminBufferedProtocol):
+    pass
+
+
+class TestAsyncioClient(unittest.TestCase):
+    def setUp(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.stream = b"".join(
+            ServerClientJoin.create(client_id=i).write_to_buffer() for i in range(2000)
+        )
+
+    def tearDown(self) -> None:
+        self.loop.close()
+
+    async def _serve(self, protocol_class):
+        async def handle(reader, writer):
+            # Dribble the data out in odd-sized chunks to exercise the framing.
+            for offset in range(0, len(self.stream), 4093):
+                writer.write(self.stream[offset : offset + 4093])
+                await writer.drain()
+            writer.close()
+
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            client = await protocol_class.connect(loop=self.loop, host="127.0.0.1", port=port)
+            await asyncio.wait_for(client.client_active, 5)
+        return client
+
+    def test_001_protocols(self):
+        for protocol_class in (RecordingProtocol, RecordingBufferedProtocol):
+            with self.subTest(protocol=protocol_class.__name__):
+                client = self.loop.run_until_complete(self._serve(protocol_class))
+                self.assertEqual(list(range(2000)), client.received)
+
+    def test_002_buffered_is_buffered(self):
+        self.assertTrue(issubclass(OttdAdminBufferedProtocol, asyncio.BufferedProtocol))
+        self.assertFalse(issubclass(OttdAdminProtocol, asyncio.BufferedProtocol))
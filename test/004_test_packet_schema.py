@@ -0,0 +1,52 @@
+import unittest
+
+from libottdadmin2.enums import Action, DestType
+from libottdadmin2.exceptions import PacketExhaustedError
+from libottdadmin2.packets import Packet, ServerChat, ServerCmdLogging
+from libottdadmin2.packets.base import Field, compile_decoder
+
+
+class TestPacketSchema(unittest.TestCase):
+    def test_001_schema_fields(self):
+        for klass in Packet._registry.values():
+            if klass.schema is None:
+                continue
+            with self.subTest(packet=klass.__name__):
+                self.assertEqual([field.name for field in klass.schema], klass.fields)
+                self.assertEqual(tuple(klass.fields), klass.data._fields)
+                self.assertIsNotNone(klass._decoder)
+
+    def test_002_compiled_decoder(self):
+        decoder = compile_decoder(
+            (Field("a", "byte"), Field("b", str), Field("c", "ushort", str), Field("d", str))
+        )
+        buffer = b"\x01hello\x00\x02\x00world\x00"
+        values, offset = decoder(buffer, 0, len(buffer))
+        self.assertEqual((1, "hello", "2", "world"), values)
+        self.assertEqual(len(buffer), offset)
+        self.assertIs(decoder, compile_decoder(
+            (Field("a", "byte"), Field("b", str), Field("c", "ushort", str), Field("d", str))
+        ))
+
+    def test_003_exhausted(self):
+        decoder = compile_decoder((Field("a", "uint"), Field("b", str)))
+        with self.assertRaises(PacketExhaustedError):
+            decoder(b"\x01\x00\x00", 0, 3)
+        with self.assertRaises(PacketExhaustedError):
+            decoder(b"\x01\x00\x00\x00abc", 0, 7)
+        with self.assertRaises(ValueError):
+            compile_decoder((Field("a", "HH"),))
+
+    def test_004_roundtrip(self):
+        pkt = ServerChat.create(
+            action=Action.CHAT, type=DestType.BROADCAST, client_id=3, message="hi", extra=7
+        )
+        data = Packet.from_buffer(pkt.write_to_buffer()).decode()
+        self.assertEqual(ServerChat.data(Action.CHAT, DestType.BROADCAST, 3, "hi", 7), data)
+        self.assertIsInstance(data.action, Action)
+
+        pkt = ServerCmdLogging.create(
+            client_id=1, company_id=2, command_id=3, param1=4, param2=5, tile=6, text="t", frame=8
+        )
+        data = Packet.from_buffer(pkt.write_to_buffer()).decode()
+        self.assertEqual(3, data.command_id)
@@ -0,0 +1,64 @@
+import os
+import unittest
+
+from monocypher import IncrementalAuthenticatedEncryption
+
+from libottdadmin2.packets import Packet, AdminChat, AdminPing, AdminRcon, ServerCmdNames
+from libottdadmin2.packets.admin import AdminExternalChat
+from libottdadmin2.packets.base import HEADER
+
+
+class TestPacketEncoding(unittest.TestCase):
+    def test_001_layout(self):
+        pkt = AdminRcon.create(command="say hello")
+        frame = pkt.write_to_buffer()
+        self.assertEqual(b"".join([pkt.header, pkt.buffer]), frame)
+        self.assertEqual(HEADER.pack(len(frame), AdminRcon.packet_id), pkt.header)
+        self.assertEqual(b"say hello\x00", pkt.buffer)
+
+    def test_002_grow(self):
+        commands = {i: "CmdSomething%d" % i for i in range(500)}
+        pkt = ServerCmdNames.create(commands=commands)
+        self.assertGreater(len(pkt.buffer), ServerCmdNames._size_hint // 2)
+        self.assertEqual(commands, Packet.from_buffer(pkt.write_to_buffer()).decode().commands)
+
+    def test_003_reuse(self):
+        pkt = AdminRcon()
+        for command in ("first command", "2nd", "and a third"):
+            pkt.reset(clear=True)
+            pkt.encode(command=command)
+            frame = pkt.write_to_buffer()
+            self.assertEqual(command, Packet.from_buffer(frame).decode().command)
+
+    def test_004_extend_received(self):
+        pkt = Packet.from_buffer(AdminRcon.create(command="abc").write_to_buffer())
+        pkt.write_str("def")
+        self.assertEqual(b"abc\x00def\x00", pkt.buffer)
+        self.assertEqual(HEADER.pack(HEADER.size + 8, AdminRcon.packet_id), pkt.write_to_buffer()[0:HEADER.size])
+
+    def test_005_encrypted(self):
+        key, nonce = os.urandom(32), os.urandom(24)
+        pkt = AdminChat.create(action=3, type=0, client_id=1, message="hello")
+        frame = pkt.write_to_buffer(IncrementalAuthenticatedEncryption(key, nonce))
+        found, length, extracted = Packet.extract(frame, IncrementalAuthenticatedEncryption(key, nonce))
+        self.assertTrue(found)
+        self.assertEqual(len(frame), length)
+        self.assertEqual(pkt.buffer, extracted.buffer)
+
+    def test_006_batched_values(self):
+        # Fixed size values are packed when a string follows or the packet is framed.
+        pkt = AdminPing.create(payload=0x01020304)
+        self.assertEqual(b"\x04\x03\x02\x01", pkt.buffer)
+        self.assertEqual(HEADER.pack(HEADER.size + 4, AdminPing.packet_id), pkt.header)
+
+        kwargs = dict(source="irc", colour=5, user="someone", message="hi there")
+        frame = AdminExternalChat.create(**kwargs).write_to_buffer()
+        self.assertEqual(b"irc\x00\x05\x00\x00\x00someone\x00hi there\x00", frame[HEADER.size:])
+        self.assertEqual(kwargs, dict(Packet.from_buffer(frame).decode()._asdict()))
+
+    def test_007_encrypted_strings_only(self):
+        key, nonce = os.urandom(32), os.urandom(24)
+        pkt = AdminRcon.create(command="say hello")
+        frame = pkt.write_to_buffer(IncrementalAuthenticatedEncryption(key, nonce))
+        found, length, extracted = Packet.extract(frame, IncrementalAuthenticatedEncryption(key, nonce))
+        self.assertEqual("say hello", extracted.decode().command)
@@ -0,0 +1,102 @@
+import unittest
+
+from libottdadmin2.client.common import OttdClientMixIn
+from libottdadmin2.packets import ServerChat, ServerClientJoin, ServerClientQuit, ServerDate
+from libottdadmin2.packets.buffer import ReceiveBuffer
+
+
+class DispatchClient(OttdClientMixIn):
+    def __init__(self):
+        self._buffer = ReceiveBuffer()
+        self.received = []
+
+    def on_server_client_join(self, client_id):
+        self.received.append(("join", client_id))
+
+    def on_server_client_quit_raw(self, packet, data):
+        self.received.append(("quit", data.client_id))
+
+
+class LoggingClient(DispatchClient):
+    def packet_received(self, packet, data):
+        self.received.append(("any", packet.packet_id))
+        super().packet_received(packet, data)
+
+
+class TestHandlerDispatch(unittest.TestCase):
+    def setUp(self) -> None:
+        self.decoded = []
+        original = ServerChat.decode
+
+        def decode(packet):
+            self.decoded.append(packet.packet_id)
+            return original(packet)
+
+        ServerChat.decode = decode
+        self.addCleanup(setattr, ServerChat, "decode", original)
+        self.stream = b"".join(
+            [
+                ServerClientJoin.create(client_id=1).write_to_buffer(),
+                ServerChat.create(action=3, type=0, client_id=1, message="hi", extra=0).write_to_buffer(),
+                ServerClientQuit.create(client_id=1).write_to_buffer(),
+            ]
+        )
+
+    def test_001_dispatch(self):
+        client = DispatchClient()
+        client.data_received(self.stream)
+        self.assertEqual([("join", 1), ("quit", 1)], client.received)
+        self.assertEqual([], self.decoded, "Unhandled packets should not be decoded")
+        self.assertIsNone(client.get_handlers(ServerDate.packet_id))
+        handler, raw_handler = client.get_handlers(ServerClientJoin.packet_id)
+        self.assertEqual(client.on_server_client_join, handler)
+        self.assertIsNone(raw_handler)
+
+    def test_002_dynamic_handler(self):
+        client = DispatchClient()
+        client.data_received(self.stream)
+        client.set_handler(ServerChat, lambda **kwargs: client.received.append(("chat", kwargs["message"])))
+        client.data_received(self.stream)
+        self.assertIn(("chat", "hi"), client.received)
+        self.assertEqual([ServerChat.packet_id], self.decoded)
+
+    def test_003_overridden_packet_received(self):
+        client = LoggingClient()
+        client.data_received(self.stream)
+        self.assertEqual(3, len([x for x in client.received if x[0] == "any"]))
+        self.assertEqual([ServerChat.packet_id], self.decoded)
+
+    def test_004_class_handler_cache(self):
+        client = LoggingClient()
+        client.data_received(self.stream)
+        self.assertIn("_class_handlers", vars(LoggingClient))
+        self.assertIsNot(vars(LoggingClient)["_class_handlers"], vars(DispatchClient).get("_class_handlers"))
+
+        client.set_handler(ServerClientJoin, lambda client_id: client.received.append(("override", client_id)))
+        client.received.clear()
+        client.data_received(self.stream)
+        self.assertIn(("override", 1), client.received)
+        self.assertNotIn(("join", 1), client.received)
+
+        client.set_handler(ServerClientJoin, None)
+        client.received.clear()
+        client.data_received(self.stream)
+        self.assertIn(("join", 1), client.received)
+
+    def test_005_instance_attribute_handler(self):
+        client = DispatchClient()
+        client.data_received(self.stream)
+        self.assertEqual([], self.decoded)
+
+        client.on_server_chat = lambda message, **kwargs: client.received.append(("chat", message))
+        client.on_server_client_join = lambda client_id: client.received.append(("instance join", client_id))
+        client.received.clear()
+        client.data_received(self.stream)
+        self.assertEqual([("instance join", 1), ("chat", "hi"), ("quit", 1)], client.received)
+
+        del client.on_server_chat
+        del client.on_server_client_join
+        client.received.clear()
+        client.data_received(self.stream)
+        self.assertEqual([("join", 1), ("quit", 1)], client.received)
+        self.assertEqual([ServerChat.packet_id], self.decoded)
@@ -0,0 +1,90 @@
+import unittest
+
+from libottdadmin2.client.common import OttdClientMixIn
+from libottdadmin2.client.tracking import TrackingMixIn
+from libottdadmin2.enums import UpdateType, UpdateFrequency
+from libottdadmin2.packets import AdminPoll, AdminUpdateFrequency, Packet, ServerChat, ServerConsole, ServerWelcome
+from libottdadmin2.packets.buffer import ReceiveBuffer
+
+
+class SubscribingClient(TrackingMixIn, OttdClientMixIn):
+    subscribe_from_handlers = True
+
+    def __init__(self):
+        self._buffer = ReceiveBuffer()
+        self.sent = []
+
+    def send_packet(self, packet):
+        self.sent.append((packet.__class__, Packet.from_buffer(packet.write_to_buffer()).decode()))
+
+    def welcome(self):
+        packet = ServerWelcome.create(
+            name="n", version="v", dedicated=True, map="m", seed=0, landscape=0,
+            startdate=ServerWelcome.schema[6].convert(0), x=64, y=64,
+        )
+        self.data_received(packet.write_to_buffer())
+
+    def frequencies(self):
+        return {data.type: data.freq for klass, data in self.sent if klass is AdminUpdateFrequency}
+
+    def polls(self):
+        return {data.type for klass, data in self.sent if klass is AdminPoll}
+
+
+class ChatClient(SubscribingClient):
+    def on_server_chat(self, **kwargs):
+        pass
+
+
+class TestUpdateSubscriptions(unittest.TestCase):
+    def test_001_from_handlers(self):
+        client = SubscribingClient()
+        client.welcome()
+        frequencies = client.frequencies()
+        self.assertNotIn(UpdateType.CHAT, frequencies)
+        self.assertNotIn(UpdateType.CONSOLE, frequencies)
+        self.assertEqual(UpdateFrequency.AUTOMATIC, frequencies[UpdateType.CLIENT_INFO])
+        self.assertIn(UpdateType.NAMES, client.polls())
+
+        client = ChatClient()
+        client.welcome()
+        self.assertEqual(UpdateFrequency.AUTOMATIC, client.frequencies()[UpdateType.CHAT])
+
+    def test_002_listeners(self):
+        client = SubscribingClient()
+        client.welcome()
+
+        def listener(packet, data):
+            pass
+
+        client.sent.clear()
+        client.add_listener(ServerConsole, listener)
+        self.assertEqual({UpdateType.CONSOLE: UpdateFrequency.AUTOMATIC}, client.frequencies())
+
+        client.sent.clear()
+        client.add_listener(ServerConsole, lambda packet, data: None)
+        self.assertEqual([], client.sent)
+
+        client.sent.clear()
+        client.set_handler(ServerChat, lambda **kwargs: None)
+        self.assertEqual({UpdateType.CHAT: UpdateFrequency.AUTOMATIC}, client.frequencies())
+
+        client.sent.clear()
+        client.remove_listener(ServerConsole, listener)
+        self.assertEqual([], client.sent)
+        client.remove_listener(ServerConsole, client._listeners[ServerConsole.packet_id][0])
+        self.assertEqual({UpdateType.CONSOLE: 0}, client.frequencies())
+
+        client.sent.clear()
+        client.set_handler(ServerChat, None)
+        self.assertEqual({UpdateType.CHAT: 0}, client.frequencies())
+
+    def test_003_everything(self):
+        client = SubscribingClient()
+        client.subscribe_from_handlers = False
+        client.welcome()
+        self.assertEqual(
+            {k for k, v in TrackingMixIn.update_types.items() if v & ~UpdateFrequency.POLL},
+            set(client.frequencies()),
+        )
+        self.assertNotIn(ServerChat, [klass for klass, data in client.sent])
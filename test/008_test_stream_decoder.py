@@ -0,0 +1,56 @@
+import os
+import unittest
+
+from monocypher import IncrementalAuthenticatedEncryption
+
+from libottdadmin2.exceptions import UnknownPacketError
+from libottdadmin2.packets import ServerChat, ServerClientJoin, ServerClientQuit
+from libottdadmin2.packets.stream import PacketStreamDecoder
+
+
+class TestPacketStreamDecoder(unittest.TestCase):
+    def setUp(self) -> None:
+        self.packets = []
+        for i in range(100):
+            self.packets.append(ServerClientJoin.create(client_id=i))
+            self.packets.append(ServerChat.create(action=3, type=0, client_id=i, message="msg %d" % i, extra=0))
+            self.packets.append(ServerClientQuit.create(client_id=i))
+        self.stream = b"".join(packet.write_to_buffer() for packet in self.packets)
+
+    def test_001_chunks(self):
+        for chunk_size in (1, 3, 100, len(self.stream)):
+            with self.subTest(chunk_size=chunk_size):
+                decoder = PacketStreamDecoder()
+                chunks = (self.stream[i : i + chunk_size] for i in range(0, len(self.stream), chunk_size))
+                result = list(decoder.decode_all(chunks))
+                self.assertEqual([packet.__class__ for packet in self.packets], [klass for klass, _ in result])
+                self.assertEqual("msg 99", result[-2][1].message)
+                self.assertEqual(0, len(decoder))
+
+    def test_002_filter(self):
+        decoder = PacketStreamDecoder(types=[ServerChat])
+        result = list(decoder.feed(self.stream))
+        self.assertEqual(100, len(result))
+        self.assertTrue(all(klass is ServerChat for klass, _ in result))
+
+    def test_003_unknown(self):
+        unknown = b"\x05\x00\xfe\x01\x02"
+        frame = self.packets[0].write_to_buffer()
+        self.assertEqual(2, len(list(PacketStreamDecoder().feed(frame + unknown + frame))))
+
+        decoder = PacketStreamDecoder(skip_unknown=False)
+        packets = decoder.feed(frame + unknown + frame)
+        self.assertEqual(ServerClientJoin, next(packets)[0])
+        with self.assertRaises(UnknownPacketError):
+            next(packets)
+        self.assertEqual(1, len(list(decoder.packets())))
+
+    def test_004_encrypted(self):
+        key, nonce = os.urandom(32), os.urandom(24)
+        encryption = IncrementalAuthenticatedEncryption(key, nonce)
+        stream = b"".join(packet.write_to_buffer(encryption) for packet in self.packets)
+        decoder = PacketStreamDecoder(
+            types=[ServerClientQuit], decryption_handler=IncrementalAuthenticatedEncryption(key, nonce)
+        )
+        result = list(decoder.decode_all(stream[i : i + 7] for i in range(0, len(stream), 7)))
+        self.assertEqual(list(range(100)), [data.client_id for _, data in result])
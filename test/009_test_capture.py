@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+from libottdadmin2.capture import CaptureReader, CaptureWriter
+from libottdadmin2.client.common import OttdClientMixIn
+from libottdadmin2.exceptions import InvalidCaptureError
+from libottdadmin2.packets import ServerChat, ServerClientJoin
+from libottdadmin2.packets.buffer import ReceiveBuffer
+
+
+class CapturingClient(OttdClientMixIn):
+    def __init__(self):
+        self._buffer = ReceiveBuffer()
+        self.peername = ("::1", 3977, 0, 0)
+
+
+class TestCapture(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "capture.bin")
+        self.packets = []
+        for i in range(50):
+            self.packets.append(ServerClientJoin.create(client_id=i))
+            self.packets.append(ServerChat.create(action=3, type=0, client_id=i, message="msg %d" % i, extra=0))
+
+    def test_001_client_tap(self):
+        client = CapturingClient()
+        client.start_capture(self.path)
+        stream = b"".join(packet.write_to_buffer() for packet in self.packets)
+        client.data_received(stream[:1000])
+        client.data_received(stream[1000:])
+        client.stop_capture()
+
+        with CaptureReader(self.path) as reader:
+            self.assertEqual(("::1", 3977), reader.peername)
+            result = list(reader.packets())
+            frames = [bytes(frame.frame) for frame in reader]
+        self.assertEqual([packet.__class__ for packet in self.packets], [klass for _, klass, _ in result])
+        self.assertEqual("msg 49", result[-1][2].message)
+        self.assertEqual([packet.write_to_buffer() for packet in self.packets], frames)
+        self.assertLessEqual(result[0][0], result[-1][0])
+
+    def test_002_append_and_filter(self):
+        for offset in (0, 50):
+            with CaptureWriter(self.path, peername=("127.0.0.1", 3977)) as writer:
+                for i in range(50):
+                    writer.write(self.packets[offset + i].write_to_buffer(), timestamp=float(offset + i))
+        with open(self.path, "ab") as fp:
+            fp.write(b"\x00" * 5)  # Truncated record
+
+        with CaptureReader(self.path) as reader:
+            timestamps = []
+            for frame in reader.frames(types=[ServerChat]):
+                timestamps.append(frame.timestamp)
+                self.assertIs(ServerChat, frame.packet().__class__)
+                frame.frame.release()
+        self.assertEqual([float(i) for i in range(1, 100, 2)], timestamps)
+
+    def test_003_invalid(self):
+        with open(self.path, "wb") as fp:
+            fp.write(b"NOTACAPTUREFILE")
+        with self.assertRaises(InvalidCaptureError):
+            CaptureReader(self.path)
+
+    def test_004_empty(self):
+        open(self.path, "wb").close()
+        with self.assertRaises(InvalidCaptureError):
+            CaptureReader(self.path)
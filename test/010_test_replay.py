@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+
+from libottdadmin2.capture import CaptureWriter
+from libottdadmin2.client.common import OttdClientMixIn
+from libottdadmin2.client.replay import CaptureReplay
+from libottdadmin2.client.tracking import TrackingMixIn
+from libottdadmin2.packets import AdminUpdateFrequency, Packet
+from libottdadmin2.packets.buffer import ReceiveBuffer
+from .packet_data import PACKETS
+
+
+class ReplayClient(TrackingMixIn, OttdClientMixIn):
+    def __init__(self):
+        self._buffer = ReceiveBuffer()
+        self.chats = []
+
+    def on_server_chat(self, message, **kwargs):
+        self.chats.append(message)
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "capture.bin")
+        welcome = Packet.from_name_and_buffer("ServerWelcome", PACKETS["ServerWelcome"])[0]
+        chat = Packet.from_name_and_buffer("ServerChat", PACKETS["ServerChat"])[0]
+        info = Packet.from_name_and_buffer("ServerClientInfo", PACKETS["ServerClientInfo"])[0]
+        with CaptureWriter(self.path, peername=("127.0.0.1", 3977)) as writer:
+            writer.write_packet(welcome, timestamp=100.0)
+            for i in range(20):
+                # Two packets per received chunk, 10ms apart.
+                writer.write_packet(chat, timestamp=100.0 + i / 100)
+                writer.write_packet(info, timestamp=100.0 + i / 100)
+
+    def test_001_full_speed(self):
+        client = ReplayClient()
+        replay = CaptureReplay(client, self.path)
+        stats = replay.run()
+        self.assertEqual(41, stats.packets)
+        self.assertEqual(["test"] * 20, client.chats)
+        self.assertIn(1, client.clients)
+        self.assertIn(AdminUpdateFrequency, [packet.__class__ for packet in replay.sent])
+        self.assertEqual(("127.0.0.1", 3977), client.peername)
+        self.assertGreater(stats.packets_per_second, 0)
+        self.assertLessEqual(stats.handler_time, stats.processing_time)
+        self.assertNotIn("send_packet", vars(client))
+
+    def test_002_timed(self):
+        stats = CaptureReplay(ReplayClient(), self.path, speed=2).run()
+        self.assertGreaterEqual(stats.duration, 0.19 / 2)
+
+    def test_003_restores_instance_attributes(self):
+        client = ReplayClient()
+        sent = []
+
+        def send_packet(packet):
+            sent.append(packet)
+
+        client.send_packet = send_packet
+        CaptureReplay(client, self.path).run()
+        self.assertIs(send_packet, client.send_packet)
+        self.assertNotIn("packet_received", vars(client))
+        self.assertEqual([], sent)
@@ -0,0 +1,136 @@
+import asyncio
+import struct
+import unittest
+
+from monocypher import compute_key_exchange_public_key, generate_key
+
+from libottdadmin2.client.asyncio import OttdAdminProtocol
+from libottdadmin2.enums import ErrorCode, PollExtra, UpdateFrequency, UpdateType
+from libottdadmin2.packets import (
+    AdminPing,
+    AdminPoll,
+    AdminUpdateFrequency,
+    Packet,
+    ServerChat,
+    ServerClientInfo,
+    ServerCmdLogging,
+    ServerError,
+    ServerPong,
+    ServerWelcome,
+)
+from libottdadmin2.simulator import OttdAdminSimulator, SimulatedGame
+
+
+class RecordingClient(OttdAdminProtocol):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.received = []
+        self.arrived = None
+
+    def packet_received(self, packet, data):
+        self.received.append((packet.__class__, data))
+        if self.arrived is not None and not self.arrived.done():
+            self.arrived.set_result(None)
+        super().packet_received(packet, data)
+
+    def of_type(self, packet_class):
+        return [data for klass, data in self.received if klass is packet_class]
+
+    async def collect(self, packet_class, count=1, timeout=5):
+        async def wait():
+            while len(self.of_type(packet_class)) < count and not self.client_active.done():
+                self.arrived = self.loop.create_future()
+                await asyncio.wait([self.arrived, self.client_active], return_when=asyncio.FIRST_COMPLETED)
+
+        await asyncio.wait_for(wait(), timeout)
+        return self.of_type(packet_class)
+
+
+class TestSimulator(unittest.TestCase):
+    def setUp(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.secret_key = generate_key()
+        self.simulator = OttdAdminSimulator(
+            password="secret",
+            authorized_keys=[compute_key_exchange_public_key(self.secret_key).hex()],
+            rates={UpdateType.CHAT: 2000, UpdateType.LOGGING: 100},
+            clients=10,
+            seed=42,
+        )
+        self.loop.run_until_complete(self.simulator.start())
+        self.clients = []
+
+    def tearDown(self) -> None:
+        for client in self.clients:
+            client.transport.close()
+        self.loop.run_until_complete(self.simulator.stop())
+        self.loop.close()
+
+    def connect(self, **kwargs) -> RecordingClient:
+        client = self.loop.run_until_complete(
+            RecordingClient.connect(loop=self.loop, port=self.simulator.port, **kwargs)
+        )
+        self.clients.append(client)
+        return client
+
+    def collect(self, client, packet_class, count=1):
+        return self.loop.run_until_complete(client.collect(packet_class, count))
+
+    def test_001_secure_join(self):
+        client = self.connect(password="secret")
+        self.collect(client, ServerWelcome)
+        self.assertIsNotNone(client._encryption_handler)
+
+        client.send_packet(AdminUpdateFrequency.create(type=UpdateType.CHAT, freq=UpdateFrequency.AUTOMATIC))
+        chats = self.collect(client, ServerChat, 100)
+        self.assertTrue(all(chat.message for chat in chats))
+        self.assertEqual([], client.of_type(ServerCmdLogging))
+
+        client.send_packet(AdminPing.create(payload=1234))
+        self.assertEqual(1234, self.collect(client, ServerPong)[0].payload)
+
+    def test_002_wrong_password(self):
+        client = self.connect(password="wrong")
+        errors = self.collect(client, ServerError)
+        self.assertEqual(ErrorCode.WRONG_PASSWORD, errors[0].errorcode)
+        self.assertEqual([], client.of_type(ServerWelcome))
+
+    def test_003_authorized_key(self):
+        client = self.connect(password="wrong", secret_key=self.secret_key.hex())
+        self.collect(client, ServerWelcome)
+
+        # An unknown key falls back to the password.
+        client = self.connect(password="secret", secret_key=generate_key().hex())
+        self.collect(client, ServerWelcome)
+
+    def test_004_insecure_join_and_poll(self):
+        client = self.connect(password="secret", use_insecure_join=True)
+        self.collect(client, ServerWelcome)
+        self.assertIsNone(client._encryption_handler)
+
+        client.send_packet(AdminPoll.create(type=UpdateType.CLIENT_INFO, extra=PollExtra.ALL))
+        infos = self.collect(client, ServerClientInfo, 10)
+        self.assertEqual(len(self.simulator.game.clients), len(infos))
+
+    def test_005_not_authenticated(self):
+        client = self.connect()
+        client.send_packet(AdminPoll.create(type=UpdateType.DATE, extra=0))
+        errors = self.collect(client, ServerError)
+        self.assertEqual(ErrorCode.NOT_EXPECTED, errors[0].errorcode)
+
+    def test_006_malformed_packet(self):
+        client = self.connect()
+        # An AdminPoll that ends before its uint32 ``extra`` field.
+        client.transport.write(struct.pack("<HBB", 4, AdminPoll.packet_id, UpdateType.DATE))
+        errors = self.collect(client, ServerError)
+        self.assertEqual(ErrorCode.ILLEGAL_PACKET, errors[0].errorcode)
+
+
+class TestSimulatedGame(unittest.TestCase):
+    def test_001_generate(self):
+        game = SimulatedGame(clients=5, companies=3, seed=1)
+        for update_type in UpdateType:
+            for _ in range(50):
+                for packet in game.generate(update_type):
+                    Packet.from_buffer(packet.write_to_buffer()).decode()
+        self.assertTrue(0 < len(game.clients) < 20)
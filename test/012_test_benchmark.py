@@ -0,0 +1,27 @@
+import unittest
+
+from libottdadmin2.benchmark import GENERATED_DATA, BenchmarkResult, compare, payloads, run, to_json
+from libottdadmin2.packets import Packet
+from .packet_data import PACKETS
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_001_all_packets(self):
+        self.assertEqual({klass.__name__ for klass in Packet._registry.values()}, set(GENERATED_DATA))
+        self.assertNotIn("captured", {payload for _, payload, _ in payloads()})
+        self.assertIn("captured", {payload for _, payload, _ in payloads(captured=PACKETS)})
+
+    def test_002_run_and_compare(self):
+        results = run("ServerChat", number=5, repeat=1)
+        self.assertEqual(
+            {"encode", "decode", "write_to_buffer", "extract"}, {result.operation for result in results}
+        )
+        self.assertEqual({"plain", "encrypted"}, {result.variant for result in results})
+        document = to_json(results, 5, 1)
+        self.assertEqual([], compare(results, document))
+
+        slower = [result._replace(seconds=result.seconds * 2) for result in results]
+        regressions = compare(slower, document, threshold=0.5)
+        self.assertEqual(len(results), len(regressions))
+        self.assertAlmostEqual(2.0, regressions[0][1])
+        self.assertIsInstance(regressions[0][0], BenchmarkResult)
@@ -0,0 +1,116 @@
+import asyncio
+import unittest
+
+from libottdadmin2.client.manager import ConnectionManager, ServerConfig
+from libottdadmin2.enums import UpdateFrequency, UpdateType
+from libottdadmin2.packets import AdminUpdateFrequency, ServerChat, ServerWelcome
+from libottdadmin2.simulator import OttdAdminSimulator
+
+
+class TestConnectionManager(unittest.TestCase):
+    def setUp(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.simulators = [
+            OttdAdminSimulator(password="secret", rates={UpdateType.CHAT: 1000}, seed=i) for i in range(3)
+        ]
+        for simulator in self.simulators:
+            self.loop.run_until_complete(simulator.start())
+        self.manager = ConnectionManager(
+            [
+                ServerConfig("server%d" % i, port=simulator.port, password="secret")
+                for i, simulator in enumerate(self.simulators)
+            ],
+            event_types=[ServerWelcome, ServerChat],
+            reconnect_delay=0.01,
+            max_events=100,
+        )
+
+    def tearDown(self) -> None:
+        self.loop.run_until_complete(self.manager.stop())
+        for simulator in self.simulators:
+            self.loop.run_until_complete(simulator.stop())
+        self.loop.close()
+
+    def run_with_timeout(self, coro, timeout=5):
+        return self.loop.run_until_complete(asyncio.wait_for(coro, timeout))
+
+    async def _welcome_all(self):
+        await self.manager.start()
+        welcomed = set()
+        while len(welcomed) < len(self.simulators):
+            event = await self.manager.get()
+            if event.packet is ServerWelcome:
+                welcomed.add(event.server)
+        self.manager.broadcast(AdminUpdateFrequency.create(type=UpdateType.CHAT, freq=UpdateFrequency.AUTOMATIC))
+        return welcomed
+
+    def test_001_merged_stream(self):
+        self.assertEqual({"server0", "server1", "server2"}, self.run_with_timeout(self._welcome_all()))
+
+        async def collect():
+            servers = set()
+            async for event in self.manager.events():
+                self.assertIs(ServerChat, event.packet)
+                servers.add(event.server)
+                if len(servers) == 3:
+                    return servers
+
+        self.assertEqual(3, len(self.run_with_timeout(collect())))
+
+    def test_002_back_pressure(self):
+        self.run_with_timeout(self._welcome_all())
+
+        async def wait_paused():
+            while not self.manager.paused:
+                await asyncio.sleep(0.01)
+
+        self.run_with_timeout(wait_paused())
+        for server in self.manager.servers.values():
+            self.assertFalse(server.protocol.transport.is_reading())
+
+        async def drain():
+            while self.manager.paused:
+                await self.manager.get()
+            # Check before yielding to the loop; the simulators keep sending and may fill the backlog again.
+            return [server.protocol.transport.is_reading() for server in self.manager.servers.values()]
+
+        self.assertEqual([True] * len(self.simulators), self.run_with_timeout(drain()))
+
+    def test_003_reconnect(self):
+        self.run_with_timeout(self._welcome_all())
+        server = self.manager.servers["server1"]
+        self.assertEqual(1, server.connects)
+        for connection in list(self.simulators[1].connections):
+            connection.close()
+
+        async def wait_reconnected():
+            while server.connects < 2 or not server.connected:
+                await asyncio.sleep(0.01)
+
+        self.run_with_timeout(wait_reconnected())
+
+    def test_004_backoff(self):
+        manager = ConnectionManager(reconnect_delay=1, reconnect_factor=2, reconnect_max_delay=10, reconnect_jitter=0.5)
+        self.assertEqual(0, manager.backoff(0))
+        self.assertTrue(0.5 <= manager.backoff(1) <= 1)
+        self.assertTrue(4 <= manager.backoff(4) <= 8)
+        self.assertTrue(5 <= manager.backoff(20) <= 10)
+        with self.assertRaises(ValueError):
+            manager.add_server(ServerConfig("a"))
+            manager.add_server(ServerConfig("a"))
+
+    def test_005_single_consumer(self):
+        manager = ConnectionManager()
+
+        async def two_consumers():
+            await manager.start()
+            first = asyncio.ensure_future(manager.get())
+            await asyncio.sleep(0)
+            with self.assertRaises(RuntimeError):
+                await manager.get()
+            first.cancel()
+            await asyncio.sleep(0)
+            self.assertIsNone(manager._waiter)
+            await manager.stop()
+
+        self.run_with_timeout(two_consumers())
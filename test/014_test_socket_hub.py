@@ -0,0 +1,112 @@
+import asyncio
+import socket
+import threading
+import time
+import unittest
+
+from libottdadmin2.client.hub import OttdSocketHub
+from libottdadmin2.client.sync import OttdSocket
+from libottdadmin2.enums import UpdateFrequency, UpdateType
+from libottdadmin2.packets import AdminUpdateFrequency
+from libottdadmin2.simulator import OttdAdminSimulator
+
+
+class RecordingSocket(OttdSocket):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.welcomed = False
+        self.chats = 0
+
+    def on_server_welcome(self, **kwargs):
+        self.welcomed = True
+        self.send_packet(AdminUpdateFrequency.create(type=UpdateType.CHAT, freq=UpdateFrequency.AUTOMATIC))
+
+    def on_server_chat(self, **kwargs):
+        self.chats += 1
+
+
+class FailingSocket(RecordingSocket):
+    def on_server_welcome(self, **kwargs):
+        raise RuntimeError("Handler bug")
+
+
+class TestSocketHub(unittest.TestCase):
+    def setUp(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.simulator = OttdAdminSimulator(password="secret", rates={UpdateType.CHAT: 500})
+        self.loop.run_until_complete(self.simulator.start())
+        self.thread = threading.Thread(target=self.loop.run_forever)
+        self.thread.start()
+        self.hub = OttdSocketHub(reconnect_delay=0.01)
+
+    def tearDown(self) -> None:
+        self.hub.close()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.run_until_complete(self.simulator.stop())
+        self.loop.close()
+
+    def run_until(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), deadline, "Timed out")
+            self.hub.run_once(0.01)
+
+    def test_001_many_connections(self):
+        for i in range(20):
+            self.hub.add(
+                "server%d" % i, port=self.simulator.port, socket_class=RecordingSocket,
+                password="secret", use_insecure_join=bool(i % 2),
+            )
+        connections = list(self.hub.connections.values())
+        self.run_until(lambda: all(c.connected and c.socket.chats >= 5 for c in connections))
+        self.assertEqual({1}, {c.connects for c in connections})
+
+    def test_002_reconnect(self):
+        connection = self.hub.add("server", port=self.simulator.port, socket_class=RecordingSocket, password="secret")
+        self.run_until(lambda: connection.connected and connection.socket.welcomed)
+        first = connection.socket
+        for simulated in list(self.simulator.connections):
+            self.loop.call_soon_threadsafe(simulated.close)
+        self.run_until(lambda: connection.socket is not first and connection.connected and connection.socket.welcomed)
+        self.assertEqual(2, connection.connects)
+
+    def test_003_connect_failure(self):
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        port = listener.getsockname()[1]
+        listener.close()  # Nothing listens on this port now.
+
+        connection = self.hub.add("server", port=port)
+        self.run_until(lambda: connection.failures >= 3)
+        self.assertEqual(0, connection.connects)
+        self.assertIsNotNone(connection.timer)
+
+        self.hub.remove("server")
+        self.assertIsNone(connection.socket)
+
+    def test_004_timers(self):
+        calls = []
+        self.hub.call_later(0.02, calls.append, 2)
+        self.hub.call_later(0.01, calls.append, 1)
+        self.hub.call_later(0.01, calls.append, 3).cancel()
+        self.hub.call_later(0.03, self.hub.stop)
+        self.hub.run()
+        self.assertEqual([1, 2], calls)
+
+    def test_005_failing_connection_is_isolated(self):
+        good = self.hub.add("good", port=self.simulator.port, socket_class=RecordingSocket, password="secret")
+        bad = self.hub.add("bad", port=self.simulator.port, socket_class=FailingSocket, password="secret")
+        with self.assertLogs(OttdSocketHub.log, "ERROR"):
+            self.run_until(lambda: bad.failures >= 2 and good.connected and good.socket.chats >= 5)
+        self.assertGreaterEqual(bad.connects, 2)
+        self.assertEqual(1, good.connects)
+
+    def test_006_backoff_until_welcomed(self):
+        connection = self.hub.add("server", port=self.simulator.port, socket_class=RecordingSocket, password="wrong")
+        self.run_until(lambda: connection.failures >= 3)
+        self.assertGreaterEqual(connection.connects, 3)
+
+        connection = self.hub.add("good", port=self.simulator.port, socket_class=RecordingSocket, password="secret")
+        self.run_until(lambda: connection.connected and connection.socket.welcomed)
+        self.assertEqual(0, connection.failures)
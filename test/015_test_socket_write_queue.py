@@ -0,0 +1,105 @@
+import socket
+import unittest
+from selectors import DefaultSelector
+
+from libottdadmin2.client.sync import OttdSocket
+from libottdadmin2.packets import AdminRcon
+from libottdadmin2.packets.stream import PacketStreamDecoder
+
+
+class RecordingSocket(OttdSocket):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.events = []
+
+    def pause_writing(self):
+        self.events.append("pause")
+
+    def resume_writing(self):
+        self.events.append("resume")
+
+
+class TestSocketWriteQueue(unittest.TestCase):
+    def setUp(self) -> None:
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(1)
+        self.client = RecordingSocket()
+        self.client.connect(listener.getsockname())
+        self.peer, _ = listener.accept()
+        listener.close()
+        self.client.setblocking(False)
+        self.client.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        self.peer.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        self.packet = AdminRcon.create(command="x" * 400)
+        self.frame = self.packet.write_to_buffer()
+
+    def tearDown(self) -> None:
+        self.client.close()
+        self.peer.close()
+
+    def read_all(self, expected):
+        received = bytearray()
+        self.peer.settimeout(5)
+        while len(received) < expected:
+            received += self.peer.recv(65536)
+        return received
+
+    def test_001_selector(self):
+        selector = DefaultSelector()
+        self.client.register_to_selector(selector)
+        self.client.set_write_buffer_limits(high=16384)
+        drained = []
+        self.client.drain_callback = drained.append
+
+        count = 0
+        while not self.client.writing_paused:
+            self.client.send_packet(self.packet)
+            count += 1
+        self.assertEqual(["pause"], self.client.events)
+        self.assertGreater(self.client.get_write_buffer_size(), 16384)
+
+        # Nothing is lost or reordered once the peer starts reading.
+        received = bytearray()
+        self.peer.setblocking(False)
+        while len(received) < count * len(self.frame):
+            for key, mask in selector.select(0.01):
+                key.data(key.fileobj, mask)
+            try:
+                received += self.peer.recv(65536)
+            except BlockingIOError:
+                pass
+        self.assertEqual(["pause", "resume"], self.client.events)
+        self.assertEqual([self.client], drained)
+        self.assertEqual(0, self.client.get_write_buffer_size())
+        packets = list(PacketStreamDecoder().feed(bytes(received)))
+        self.assertEqual(count, len(packets))
+        self.assertEqual("x" * 400, packets[-1][1].command)
+        self.client.close()
+        selector.close()
+
+    def test_002_unregistered(self):
+        # Used to raise BlockingIOError from sendall and drop the connection.
+        self.client.set_write_buffer_limits(high=8192)
+        for _ in range(200):
+            self.client.send_packet(self.packet)
+        self.assertTrue(self.client.connected)
+        self.assertGreater(self.client.get_write_buffer_size(), 0)
+        self.assertTrue(self.client.writing_paused)
+
+        received = bytearray()
+        self.peer.setblocking(False)
+        while self.client.flush():
+            try:
+                received += self.peer.recv(65536)
+            except BlockingIOError:
+                pass
+        received += self.read_all(200 * len(self.frame) - len(received))
+        self.assertEqual(200 * len(self.frame), len(received))
+        self.assertFalse(self.client.writing_paused)
+
+    def test_003_limits(self):
+        with self.assertRaises(ValueError):
+            self.client.set_write_buffer_limits(high=10, low=20)
+        self.client.set_write_buffer_limits(low=100)
+        self.assertEqual((400, 100), (self.client._high_water, self.client._low_water))
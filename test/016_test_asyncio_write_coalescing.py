@@ -0,0 +1,130 @@
+import asyncio
+import unittest
+
+from libottdadmin2.client.asyncio import OttdAdminProtocol
+from libottdadmin2.enums import UpdateType
+from libottdadmin2.packets import AdminPing, AdminPoll, Packet
+from libottdadmin2.simulator import OttdAdminSimulator
+
+
+class RecordingTransport(asyncio.Transport):
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+        self.closed = False
+
+    def get_extra_info(self, name, default=None):
+        return ("127.0.0.1", 3977) if name == "peername" else default
+
+    def write(self, data):
+        self.writes.append(data)
+
+    def get_write_buffer_size(self):
+        return 0
+
+    def is_closing(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+
+class PongCounter(OttdAdminProtocol):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pongs = []
+
+    def on_server_pong(self, payload):
+        self.pongs.append(payload)
+
+
+class TestWriteCoalescing(unittest.TestCase):
+    def setUp(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.transport = RecordingTransport()
+        self.protocol = OttdAdminProtocol(self.loop)
+        self.protocol.connection_made(self.transport)
+
+    def tearDown(self) -> None:
+        self.loop.close()
+
+    def run_loop_once(self):
+        self.loop.run_until_complete(asyncio.sleep(0))
+
+    def test_001_coalesce(self):
+        for i in range(10):
+            self.protocol.send_packet(AdminPoll.create(type=UpdateType.COMPANY_INFO, extra=i))
+        self.assertEqual([], self.transport.writes)
+        self.assertEqual(10 * 8, self.protocol.get_write_buffer_size())
+
+        self.run_loop_once()
+        self.assertEqual(1, len(self.transport.writes))
+        data = self.transport.writes[0]
+        extras = []
+        while data:
+            packet = Packet.from_buffer(data[:8])
+            extras.append(packet.decode().extra)
+            data = data[8:]
+        self.assertEqual(list(range(10)), extras)
+        self.assertEqual(0, self.protocol.get_write_buffer_size())
+
+    def test_002_coalesce_limit(self):
+        self.protocol.coalesce_limit = 20
+        for i in range(3):
+            self.protocol.send_packet(AdminPoll.create(type=UpdateType.COMPANY_INFO, extra=i))
+        self.assertEqual([24], [len(data) for data in self.transport.writes])
+        self.run_loop_once()
+        self.assertEqual(1, len(self.transport.writes))
+
+    def test_003_drain(self):
+        self.protocol.send_packet(AdminPing.create(payload=1))
+        self.loop.run_until_complete(self.protocol.drain())
+        self.assertEqual(1, len(self.transport.writes))
+
+        self.protocol.pause_writing()
+        drain = self.loop.create_task(self.protocol.drain())
+        self.run_loop_once()
+        self.assertFalse(drain.done())
+        self.protocol.resume_writing()
+        self.loop.run_until_complete(asyncio.wait_for(drain, 1))
+
+        self.protocol.pause_writing()
+        drain = self.loop.create_task(self.protocol.drain())
+        self.run_loop_once()
+        self.protocol.connection_lost(None)
+        with self.assertRaises(ConnectionResetError):
+            self.loop.run_until_complete(drain)
+        with self.assertRaises(ConnectionResetError):
+            self.loop.run_until_complete(self.protocol.drain())
+
+    def test_004_closing(self):
+        self.protocol.send_packet(AdminPing.create(payload=1))
+        self.protocol.disconnect()
+        self.assertEqual(1, len(self.transport.writes))
+        self.assertTrue(self.transport.closed)
+
+
+class TestEncryptedCoalescing(unittest.TestCase):
+    def test_001_secure_join(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        simulator = OttdAdminSimulator(password="secret")
+
+        async def run():
+            await simulator.start()
+            client = await PongCounter.connect(loop=loop, port=simulator.port, password="secret")
+            try:
+                while client._encryption_handler is None:
+                    await asyncio.sleep(0.005)
+                for i in range(500):
+                    client.send_packet(AdminPing.create(payload=i))
+                    if i % 50 == 0:
+                        await client.drain()
+                while len(client.pongs) < 500 and not client.client_active.done():
+                    await asyncio.sleep(0.005)
+            finally:
+                client.transport.close()
+                await simulator.stop()
+            return client.pongs
+
+        self.assertEqual(list(range(500)), loop.run_until_complete(asyncio.wait_for(run(), 5)))
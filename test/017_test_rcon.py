@@ -0,0 +1,146 @@
+import asyncio
+import unittest
+
+from libottdadmin2.client.asyncio import OttdAdminProtocol
+from libottdadmin2.enums import Colour
+from libottdadmin2.packets import ServerRcon, ServerRconEnd
+from libottdadmin2.simulator import OttdAdminSimulator
+
+
+class MultiLineSimulator(OttdAdminSimulator):
+    def rcon(self, command):
+        count = 5000 if command == "huge" else 3
+        return ["%s: line %d" % (command, i) for i in range(count)]
+
+
+class FakeTransport(asyncio.Transport):
+    reading = True
+
+    def pause_reading(self):
+        self.reading = False
+
+    def resume_reading(self):
+        self.reading = True
+
+    def get_extra_info(self, name, default=None):
+        return ("127.0.0.1", 3977) if name == "peername" else default
+
+    def write(self, data):
+        pass
+
+    def is_closing(self):
+        return False
+
+    def close(self):
+        pass
+
+
+class TestRcon(unittest.TestCase):
+    def setUp(self) -> None:
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self) -> None:
+        self.loop.close()
+
+    def run_simulated(self, coroutine):
+        simulator = MultiLineSimulator(password="secret")
+
+        async def run():
+            await simulator.start()
+            client = await OttdAdminProtocol.connect(loop=self.loop, port=simulator.port, password="secret")
+            try:
+                while client._encryption_handler is None:
+                    await asyncio.sleep(0.005)
+                return await coroutine(client)
+            finally:
+                client.transport.close()
+                await simulator.stop()
+
+        return self.loop.run_until_complete(asyncio.wait_for(run(), 10))
+
+    def test_001_pipelined(self):
+        results = self.run_simulated(
+            lambda client: asyncio.gather(*(client.rcon("cmd%d" % i, timeout=5) for i in range(50)))
+        )
+        self.assertEqual(50, len(results))
+        for i, lines in enumerate(results):
+            self.assertEqual([(Colour.WHITE, "cmd%d: line %d" % (i, n)) for n in range(3)], lines)
+
+    def respond(self, protocol, command, *lines):
+        for line in lines:
+            protocol.data_received(ServerRcon.create(colour=Colour.RED, result=line).write_to_buffer())
+        protocol.data_received(ServerRconEnd.create(command=command).write_to_buffer())
+
+    def test_002_timeout_and_cancel(self):
+        protocol = OttdAdminProtocol(self.loop)
+        protocol.connection_made(FakeTransport())
+
+        with self.assertRaises(asyncio.TimeoutError):
+            self.loop.run_until_complete(protocol.rcon("slow", timeout=0.01))
+        cancelled = self.loop.create_task(protocol.rcon("cancelled"))
+        answered = self.loop.create_task(protocol.rcon("answered"))
+        self.loop.run_until_complete(asyncio.sleep(0))
+        cancelled.cancel()
+
+        # The late output of the abandoned commands must not end up in the next result.
+        self.respond(protocol, "slow", "late")
+        self.respond(protocol, "cancelled", "ignored")
+        self.respond(protocol, "answered", "one", "two")
+        self.assertEqual([(Colour.RED, "one"), (Colour.RED, "two")], self.loop.run_until_complete(answered))
+        self.assertTrue(cancelled.cancelled())
+
+    def test_003_connection_lost(self):
+        protocol = OttdAdminProtocol(self.loop)
+        protocol.connection_made(FakeTransport())
+        pending = self.loop.create_task(protocol.rcon("lost"))
+        self.loop.run_until_complete(asyncio.sleep(0))
+        protocol.connection_lost(None)
+        with self.assertRaises(ConnectionResetError):
+            self.loop.run_until_complete(pending)
+        with self.assertRaises(ConnectionResetError):
+            self.loop.run_until_complete(protocol.rcon("after"))
+
+    def test_004_stream(self):
+        async def consume(client):
+            paused = False
+            lines = []
+            small = asyncio.ensure_future(client.rcon("before"))
+            async with client.rcon_stream("huge", maxsize=100) as stream:
+                async for colour, line in stream:
+                    paused = paused or not client.transport.is_reading()
+                    lines.append(line)
+                    if len(lines) % 100 == 0:
+                        await asyncio.sleep(0.001)
+            return paused, await small, lines, await client.rcon("after")
+
+        paused, small, lines, after = self.run_simulated(consume)
+        self.assertTrue(paused)
+        self.assertEqual(["huge: line %d" % i for i in range(5000)], lines)
+        self.assertEqual([(Colour.WHITE, "before: line %d" % i) for i in range(3)], small)
+        self.assertEqual(3, len(after))
+
+    def test_005_stream_closed_early(self):
+        protocol = OttdAdminProtocol(self.loop)
+        transport = FakeTransport()
+        protocol.connection_made(transport)
+        stream = protocol.rcon_stream("huge", maxsize=4)
+        answered = self.loop.create_task(protocol.rcon("answered"))
+        for i in range(10):
+            protocol.data_received(ServerRcon.create(colour=Colour.RED, result=str(i)).write_to_buffer())
+        self.assertFalse(transport.reading)
+
+        async def take_two():
+            lines = []
+            async with stream:
+                async for _, line in stream:
+                    lines.append(line)
+                    if len(lines) == 2:
+                        break
+            return lines
+
+        self.assertEqual(["0", "1"], self.loop.run_until_complete(take_two()))
+        self.assertTrue(transport.reading)
+        # The buffered rest of the output is handled once reading resumes, and thrown away.
+        self.respond(protocol, "huge", "more")
+        self.respond(protocol, "answered", "yes")
+        self.assertEqual([(Colour.RED, "yes")], self.loop.run_until_complete(answered))
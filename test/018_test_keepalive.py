@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from libottdadmin2.client.asyncio import OttdAdminProtocol
+from libottdadmin2.client.hub import OttdSocketHub
+from libottdadmin2.client.keepalive import KeepaliveMixIn
+from libottdadmin2.client.sync import OttdSocket
+from libottdadmin2.exceptions import ConnectionDeadError
+from libottdadmin2.histogram import Histogram
+from libottdadmin2.simulator import OttdAdminSimulator
+
+
+class KeepaliveProtocol(KeepaliveMixIn, OttdAdminProtocol):
+    keepalive_interval = 0.02
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lost_with = None
+
+    def connection_lost(self, exc=None):
+        if self.lost_with is None:
+            self.lost_with = exc
+        super().connection_lost(exc)
+
+
+class KeepaliveSocket(KeepaliveMixIn, OttdSocket):
+    keepalive_interval = 0.02
+
+
+class TestHistogram(unittest.TestCase):
+    def test_001_percentiles(self):
+        histogram = Histogram()
+        self.assertIsNone(histogram.percentile(50))
+        for i in range(1, 1001):
+            histogram.observe(i / 10000)  # 0.1ms up to 100ms
+        self.assertEqual(1000, histogram.count)
+        self.assertAlmostEqual(0.0001, histogram.min)
+        self.assertAlmostEqual(0.1, histogram.max)
+        self.assertAlmostEqual(0.05, histogram.percentile(50), delta=0.01)
+        self.assertAlmostEqual(0.099, histogram.percentile(99), delta=0.005)
+        self.assertEqual(0.1, histogram.percentile(100))
+        self.assertEqual(1000, histogram.cumulative()[-1])
+        self.assertEqual({"count", "sum", "min", "max", "mean", "p50", "p90", "p99"}, set(histogram.snapshot()))
+
+
+class TestKeepalive(unittest.TestCase):
+    def setUp(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.simulator = OttdAdminSimulator(password="secret")
+        self.loop.run_until_complete(self.simulator.start())
+
+    def tearDown(self) -> None:
+        self.loop.run_until_complete(self.simulator.stop())
+        self.loop.close()
+
+    def run_until(self, condition, timeout=5):
+        async def wait():
+            while not condition():
+                await asyncio.sleep(0.005)
+
+        self.loop.run_until_complete(asyncio.wait_for(wait(), timeout))
+
+    def test_001_asyncio(self):
+        client = self.loop.run_until_complete(
+            KeepaliveProtocol.connect(loop=self.loop, port=self.simulator.port, password="secret")
+        )
+        self.run_until(lambda: client.rtt is not None and client.rtt.count >= 5)
+        self.assertEqual(0, client.missed_pongs)
+        self.assertLess(client.rtt.percentile(99), 1)
+
+        # The server stops answering pings: the connection is declared dead.
+        for connection in self.simulator.connections:
+            connection.on_admin_ping = lambda payload: None
+        self.run_until(lambda: client.client_active.done())
+        self.assertIsInstance(client.lost_with, ConnectionDeadError)
+        self.assertTrue(client.transport.is_closing())
+
+    def test_002_hub(self):
+        thread = threading.Thread(target=self.loop.run_forever)
+        thread.start()
+        hub = OttdSocketHub()
+        try:
+            connection = hub.add("server", port=self.simulator.port, socket_class=KeepaliveSocket, password="secret")
+            deadline = time.monotonic() + 5
+            while not (connection.socket and connection.socket.rtt and connection.socket.rtt.count >= 5):
+                self.assertLess(time.monotonic(), deadline, "Timed out")
+                hub.run_once(0.01)
+        finally:
+            hub.close()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            thread.join()
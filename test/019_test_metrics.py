@@ -0,0 +1,104 @@
+import asyncio
+import unittest
+import urllib.request
+
+from libottdadmin2.client.asyncio import OttdAdminProtocol
+from libottdadmin2.client.common import OttdClientMixIn
+from libottdadmin2.enums import UpdateFrequency, UpdateType
+from libottdadmin2.metrics import ClientMetrics, MetricsServer, to_prometheus
+from libottdadmin2.packets import AdminUpdateFrequency, ServerChat
+from libottdadmin2.packets.buffer import ReceiveBuffer
+from libottdadmin2.simulator import OttdAdminSimulator
+
+
+class ChatCounter(OttdAdminProtocol):
+    chats = 0
+
+    def on_server_chat(self, **kwargs):
+        self.chats += 1
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.simulator = OttdAdminSimulator(password="secret", rates={UpdateType.CHAT: 1000})
+        self.loop.run_until_complete(self.simulator.start())
+
+    def tearDown(self) -> None:
+        self.loop.run_until_complete(self.simulator.stop())
+        self.loop.close()
+
+    def collect(self, **kwargs):
+        async def run():
+            client = await ChatCounter.connect(loop=self.loop, port=self.simulator.port, **kwargs)
+            client.enable_metrics()
+            client.add_listener(ServerChat, lambda packet, data: None)
+            while not client.metrics.packets_received.get("ServerWelcome"):
+                await asyncio.sleep(0.005)
+            client.send_packet(AdminUpdateFrequency.create(type=UpdateType.CHAT, freq=UpdateFrequency.AUTOMATIC))
+            while client.chats < 20:
+                await asyncio.sleep(0.005)
+            client.transport.close()
+            return client.metrics
+
+        return self.loop.run_until_complete(asyncio.wait_for(run(), 5))
+
+    def test_001_secure(self):
+        metrics = self.collect(password="secret")
+        snapshot = metrics.snapshot()
+        self.assertGreaterEqual(snapshot["packets_received"]["ServerChat"], 20)
+        self.assertGreater(snapshot["bytes_received"]["ServerChat"], 20 * 16)
+        self.assertEqual(1, snapshot["packets_sent"]["AdminUpdateFrequency"])
+        self.assertGreaterEqual(snapshot["decode_time"]["ServerChat"]["count"], 20)
+        self.assertGreaterEqual(snapshot["handler_time"]["on_server_chat"]["count"], 20)
+        self.assertEqual(1, len([name for name in snapshot["handler_time"] if "lambda" in name]))
+        self.assertGreater(snapshot["encryption_overhead_received"], 0)
+        self.assertEqual(16, snapshot["encryption_overhead_sent"])
+        self.assertGreater(snapshot["decrypt_time"]["count"], 0)
+        self.assertGreater(snapshot["buffer_high_water"], 0)
+
+    def test_002_insecure(self):
+        metrics = self.collect(password="secret", use_insecure_join=True)
+        self.assertEqual(0, metrics.encryption_overhead_received)
+        self.assertEqual(0, metrics.decrypt_time.count)
+        self.assertEqual(3 + 2 + 2, metrics.bytes_sent["AdminUpdateFrequency"])
+
+    def test_003_prometheus(self):
+        metrics = self.collect(password="secret")
+        server = MetricsServer(lambda: {"game \"1\"": metrics, "down": None})
+        server.start()
+        try:
+            with urllib.request.urlopen("http://127.0.0.1:%d/metrics" % server.port) as response:
+                self.assertTrue(response.headers["Content-Type"].startswith("text/plain"))
+                text = response.read().decode("utf-8")
+        finally:
+            server.stop()
+        self.assertIn("# TYPE ottdadmin_packets_received_total counter", text)
+        self.assertIn(
+            'ottdadmin_packets_received_total{server="game \\"1\\"",packet="ServerChat"} %d'
+            % metrics.packets_received["ServerChat"],
+            text,
+        )
+        count = metrics.decode_time["ServerChat"].count
+        self.assertIn('ottdadmin_decode_seconds_bucket{server="game \\"1\\"",packet="ServerChat",le="+Inf"} %d'
+                      % count, text)
+        self.assertIn('ottdadmin_decode_seconds_count{server="game \\"1\\"",packet="ServerChat"} %d' % count, text)
+
+    def test_004_skipped_bytes(self):
+        client = OttdClientMixIn()
+        client._buffer = ReceiveBuffer()
+        metrics = client.enable_metrics()
+        chat = ServerChat.create(action=3, type=0, client_id=1, message="nobody listens", extra=0).write_to_buffer()
+        unknown = b"\x04\x00\xfe\x00"
+        client.data_received(chat + unknown)
+        self.assertEqual(len(chat) + len(unknown), metrics.skipped_bytes)
+        self.assertEqual(1, metrics.packets_received["ServerChat"])
+        self.assertNotIn("ServerChat", metrics.decode_time)
+
+        client.add_listener(ServerChat, lambda packet, data: None)
+        client.data_received(chat)
+        self.assertEqual(len(chat) + len(unknown), metrics.skipped_bytes)
+
+    def test_005_empty(self):
+        self.assertEqual("\n", to_prometheus({}))
+        self.assertIn('ottdadmin_skipped_bytes_total{server="a"} 0', to_prometheus({"a": ClientMetrics()}))
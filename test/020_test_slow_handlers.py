@@ -0,0 +1,82 @@
+import functools
+import time
+import unittest
+
+from libottdadmin2.client.common import OttdClientMixIn
+from libottdadmin2.packets import ServerChat, ServerClientJoin
+from libottdadmin2.packets.buffer import ReceiveBuffer
+
+
+class ProfiledClient(OttdClientMixIn):
+    def __init__(self):
+        self._buffer = ReceiveBuffer()
+        self.slow = []
+        self.profiles = []
+
+    def on_server_chat(self, message, **kwargs):
+        if message == "slow":
+            time.sleep(0.02)
+
+    def on_server_client_join(self, client_id):
+        pass
+
+    def slow_handler(self, name, elapsed, packet, data):
+        self.slow.append((name, data.message))
+
+    def handler_profiled(self, packet, data, stats):
+        self.profiles.append(stats)
+
+
+def chat(message):
+    return ServerChat.create(action=3, type=0, client_id=1, message=message, extra=0).write_to_buffer()
+
+
+class TestSlowHandlers(unittest.TestCase):
+    def test_001_threshold(self):
+        client = ProfiledClient()
+        client.slow_handler_threshold = 0.01
+        client.data_received(chat("fast") + chat("slow") + chat("fast"))
+        self.assertEqual([("on_server_chat", "slow")], client.slow)
+
+        client.slow_handler_threshold = None
+        client.data_received(chat("slow"))
+        self.assertEqual(1, len(client.slow))
+
+    def test_002_profile_sampling(self):
+        client = ProfiledClient()
+        client.profile_packets(ServerChat, every=3)
+        join = ServerClientJoin.create(client_id=1).write_to_buffer()
+        client.data_received((chat("fast") + join) * 10)
+        self.assertEqual(3, len(client.profiles))
+        functions = {name for (_, _, name) in client.profiles[0].stats}
+        self.assertIn("on_server_chat", functions)
+
+        client.profile_packets(ServerChat, every=0)
+        client.data_received(chat("fast") * 10)
+        self.assertEqual(3, len(client.profiles))
+
+    def test_003_default_hooks(self):
+        client = OttdClientMixIn()
+        client._buffer = ReceiveBuffer()
+        client.set_handler(ServerChat, lambda **kwargs: time.sleep(0.002))
+        client.slow_handler_threshold = 0.001
+        client.profile_packets(ServerChat, every=1)
+        with self.assertLogs(OttdClientMixIn.log, "INFO") as logs:
+            client.data_received(chat("slow"))
+        output = "\n".join(logs.output)
+        self.assertRegex(output, r"Slow handler \S*test_003_default_hooks\.<locals>\.<lambda> ")
+        self.assertIn("Profile of handling ServerChat", output)
+
+    def test_004_callable_names(self):
+        client = ProfiledClient()
+        client.slow_handler_threshold = 0.01
+
+        def on_chat(message, **kwargs):
+            time.sleep(0.02)
+
+        client.set_handler(ServerChat, functools.partial(on_chat))
+        client.add_listener(ServerChat, functools.partial(lambda packet, data: time.sleep(0.02)))
+        client.data_received(chat("slow"))
+        names = [name for name, _ in client.slow]
+        self.assertEqual(2, len(names))
+        self.assertTrue(all(name.startswith("functools.partial(") for name in names))
@@ -0,0 +1,227 @@
+import asyncio
+import random
+import threading
+import time
+import unittest
+from unittest import mock
+
+from libottdadmin2.client.asyncio import OttdAdminProtocol
+from libottdadmin2.client.executor import ExecutorMixIn, OrderedExecutor, OverloadPolicy
+from libottdadmin2.packets import Packet, ServerChat
+from .packet_data import PACKETS
+
+
+class FakeTransport(asyncio.Transport):
+    reading = True
+
+    def get_extra_info(self, name, default=None):
+        return ("127.0.0.1", 3977) if name == "peername" else default
+
+    def pause_reading(self):
+        self.reading = False
+
+    def resume_reading(self):
+        self.reading = True
+
+    def write(self, data):
+        pass
+
+    def is_closing(self):
+        return False
+
+
+class OffloadingClient(ExecutorMixIn, OttdAdminProtocol):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.chats = []
+        self.threads = set()
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def on_server_chat(self, client_id, message, **kwargs):
+        self.gate.wait()
+        self.threads.add(threading.current_thread().name)
+        self.chats.append((client_id, int(message)))
+
+    def on_server_welcome(self, **kwargs):
+        self.threads.add(threading.current_thread().name)
+
+
+class AsyncOffloadingClient(ExecutorMixIn, OttdAdminProtocol):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.chats = []
+        self.threads = set()
+
+    async def on_server_chat(self, client_id, message, **kwargs):
+        await asyncio.sleep(0)
+        self.threads.add(threading.current_thread().name)
+        self.chats.append((client_id, int(message)))
+
+
+def chat(client_id, number):
+    return ServerChat.create(action=3, type=0, client_id=client_id, message=str(number), extra=0).write_to_buffer()
+
+
+class TestOrderedExecutor(unittest.TestCase):
+    def test_001_ordered_per_key(self):
+        executor = OrderedExecutor(max_workers=4)
+        results = []
+
+        def work(key, i):
+            time.sleep(random.random() / 10000)
+            results.append((key, i))
+
+        for i in range(100):
+            for key in range(5):
+                executor.submit(key, work, key, i)
+        executor.shutdown()
+        self.assertEqual(500, len(results))
+        for key in range(5):
+            self.assertEqual(list(range(100)), [i for k, i in results if k == key])
+
+    def blocked_executor(self, policy, maxsize=3):
+        executor = OrderedExecutor(max_workers=1, maxsize=maxsize, policy=policy)
+        gate = threading.Event()
+        started = threading.Event()
+
+        def block():
+            started.set()
+            gate.wait()
+
+        executor.submit("block", block)
+        started.wait(1)
+        self.addCleanup(executor.shutdown)
+        self.addCleanup(gate.set)
+        return executor, gate
+
+    def test_002_drop_oldest(self):
+        executor, gate = self.blocked_executor(OverloadPolicy.DROP_OLDEST)
+        results = []
+        for i in range(6):
+            executor.submit(i % 2, results.append, i)
+        self.assertEqual(3, executor.dropped)
+        gate.set()
+        executor.shutdown()
+        self.assertEqual([3, 4, 5], sorted(results))
+
+    def test_003_coalesce(self):
+        executor, gate = self.blocked_executor(OverloadPolicy.COALESCE)
+        results = []
+        for i in range(10):
+            executor.submit("economy", results.append, i, coalesce_key="company 1")
+        self.assertEqual(3, executor.pending)
+        self.assertEqual(7, executor.coalesced)
+        gate.set()
+        executor.shutdown()
+        self.assertEqual([0, 1, 9], results)
+
+    def test_004_block(self):
+        executor, gate = self.blocked_executor(OverloadPolicy.BLOCK, maxsize=1)
+        executor.submit("a", lambda: None)
+        submitted = threading.Event()
+        thread = threading.Thread(target=lambda: (executor.submit("a", lambda: None), submitted.set()))
+        thread.start()
+        self.assertFalse(submitted.wait(0.05))
+        gate.set()
+        self.assertTrue(submitted.wait(1))
+        thread.join()
+
+    def test_005_errors(self):
+        executor = OrderedExecutor()
+        with self.assertLogs(OrderedExecutor.log, "ERROR"):
+            executor.submit(1, lambda: 1 / 0)
+            executor.shutdown()
+        self.assertEqual(1, executor.errors)
+
+
+class TestExecutorMixIn(unittest.TestCase):
+    def setUp(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.executor = OrderedExecutor(max_workers=4, maxsize=5)
+        self.client = OffloadingClient(self.loop)
+        self.client.handler_executor = self.executor
+        self.transport = FakeTransport()
+        self.client.connection_made(self.transport)
+
+    def tearDown(self) -> None:
+        self.client.gate.set()
+        self.executor.shutdown()
+        self.loop.close()
+
+    def wait_for_chats(self, count):
+        async def wait():
+            while len(self.client.chats) < count:
+                await asyncio.sleep(0.005)
+
+        self.loop.run_until_complete(asyncio.wait_for(wait(), 5))
+
+    def test_001_offloaded_in_order(self):
+        welcome = Packet.from_name_and_buffer("ServerWelcome", PACKETS["ServerWelcome"])[0]
+        self.client.data_received(welcome.write_to_buffer())
+        self.assertEqual({threading.current_thread().name}, self.client.threads)
+
+        self.client.threads.clear()
+        for i in range(3):
+            self.client.data_received(b"".join(chat(client_id, i) for client_id in range(1, 4)))
+        self.wait_for_chats(9)
+        for client_id in range(1, 4):
+            self.assertEqual([0, 1, 2], [n for c, n in self.client.chats if c == client_id])
+        self.assertNotIn(threading.current_thread().name, self.client.threads)
+
+    def test_002_pause_reading_when_full(self):
+        self.client.gate.clear()
+        self.client.data_received(b"".join(chat(1, i) for i in range(20)))
+        self.assertFalse(self.transport.reading)
+        self.assertLessEqual(self.executor.pending, 5)
+
+        self.client.gate.set()
+        self.wait_for_chats(20)
+        self.assertTrue(self.transport.reading)
+        self.assertEqual(list(range(20)), [n for _, n in self.client.chats])
+
+    def test_003_async_handlers(self):
+        client = AsyncOffloadingClient(self.loop)
+        client.handler_executor = self.executor
+        client.connection_made(FakeTransport())
+        client.data_received(b"".join(chat(1, i) for i in range(10)))
+
+        async def wait():
+            while len(client.chats) < 10:
+                await asyncio.sleep(0.005)
+            await client.wait_handlers()
+
+        self.loop.run_until_complete(asyncio.wait_for(wait(), 5))
+        self.assertEqual(list(range(10)), sorted(n for _, n in client.chats))
+        self.assertEqual({threading.current_thread().name}, client.threads, "Async handlers run on the loop")
+        self.assertEqual(0, client._handlers_pending)
+
+    def test_004_unhandled_not_decoded(self):
+        decoded = []
+        info = Packet.from_name_and_buffer("ServerClientInfo", PACKETS["ServerClientInfo"])[0]
+        for klass in (ServerChat, info.__class__):
+            def decode(packet, original=klass.decode):
+                decoded.append(packet.__class__)
+                return original(packet)
+
+            patcher = mock.patch.object(klass, "decode", decode)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client.data_received(info.write_to_buffer() + chat(1, 0))
+        self.wait_for_chats(1)
+        self.assertEqual([ServerChat], decoded)
+
+    def test_005_offloaded_measured(self):
+        profiles = []
+        self.client.handler_profiled = lambda packet, data, stats: profiles.append(
+            (threading.current_thread().name, {name for (_, _, name) in stats.stats})
+        )
+        metrics = self.client.enable_metrics()
+        self.client.profile_packets(ServerChat, every=2)
+        self.client.data_received(b"".join(chat(1, i) for i in range(4)))
+        self.wait_for_chats(4)
+        self.executor.shutdown()
+        self.assertEqual(4, metrics.handler_time["on_server_chat"].count)
+        worker_profiles = [names for thread, names in profiles if thread != threading.current_thread().name]
+        self.assertEqual(2, len(worker_profiles))
+        self.assertIn("on_server_chat", worker_profiles[0])
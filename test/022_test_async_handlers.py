@@ -0,0 +1,215 @@
+import asyncio
+import random
+import unittest
+
+from libottdadmin2.client.asyncio import OttdAdminProtocol
+from libottdadmin2.packets import ServerChat, ServerClientJoin
+
+
+class FakeTransport(asyncio.Transport):
+    reading = True
+
+    def get_extra_info(self, name, default=None):
+        return ("127.0.0.1", 3977) if name == "peername" else default
+
+    def pause_reading(self):
+        self.reading = False
+
+    def resume_reading(self):
+        self.reading = True
+
+    def write(self, data):
+        pass
+
+    def is_closing(self):
+        return False
+
+
+class AsyncClient(OttdAdminProtocol):
+    max_concurrent_handlers = 3
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.running = 0
+        self.most_running = 0
+        self.chats = []
+        self.joins = []
+        self.failures = []
+
+    async def on_server_chat(self, message, **kwargs):
+        self.running += 1
+        self.most_running = max(self.most_running, self.running)
+        try:
+            await self.gate.wait()
+            await asyncio.sleep(random.random() / 1000)
+            if message == "fail":
+                raise ValueError(message)
+            self.chats.append(message)
+        finally:
+            self.running -= 1
+
+    def on_server_client_join(self, client_id):
+        self.joins.append(client_id)
+
+    def handler_failed(self, handler, kwargs, exc):
+        self.failures.append((handler.__name__, exc))
+
+
+class OrderedClient(AsyncClient):
+    ordered_handlers = {ServerChat}
+
+
+class TimedClient(OttdAdminProtocol):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = []
+        self.slow = []
+
+    async def on_server_chat(self, message, **kwargs):
+        await asyncio.sleep(0.02)
+        self.calls.append(("async", message))
+
+    def on_server_chat_raw(self, packet, data):
+        self.calls.append(("raw", data.message))
+
+    def slow_handler(self, name, elapsed, packet, data):
+        self.slow.append((name, data.message, elapsed))
+
+
+def chat(message):
+    return ServerChat.create(action=3, type=0, client_id=1, message=message, extra=0).write_to_buffer()
+
+
+class TestAsyncHandlers(unittest.TestCase):
+    def setUp(self) -> None:
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self) -> None:
+        self.loop.close()
+
+    def client(self, client_class=AsyncClient):
+        client = client_class(self.loop)
+        client.transport = FakeTransport()
+        client.connection_made(client.transport)
+        return client
+
+    def run_loop(self, coroutine):
+        return self.loop.run_until_complete(asyncio.wait_for(coroutine, 5))
+
+    def test_001_detected(self):
+        self.assertEqual(frozenset({"on_server_chat"}), AsyncClient.async_handler_names)
+        self.assertEqual(frozenset(), OttdAdminProtocol.async_handler_names)
+        client = self.client()
+        handler, raw_handler = client.get_handlers(ServerChat.packet_id)
+        # Async handlers are scheduled through a plain raw handler, which has the packet to time them with.
+        self.assertIsNone(handler)
+        self.assertFalse(asyncio.iscoroutinefunction(raw_handler))
+
+    def test_002_concurrency_limit(self):
+        client = self.client()
+        client.gate.clear()
+        join = ServerClientJoin.create(client_id=5).write_to_buffer()
+        client.data_received(b"".join(chat(str(i)) for i in range(10)) + join)
+        self.assertEqual([5], client.joins, "Sync handlers still run inline")
+        self.run_loop(asyncio.sleep(0.01))
+        self.assertEqual(3, client.running)
+        self.assertEqual(3, len(client._handler_tasks))
+        client.gate.set()
+        self.run_loop(client.wait_handlers())
+        self.assertEqual(3, client.most_running)
+        self.assertEqual(sorted(str(i) for i in range(10)), sorted(client.chats))
+
+    def test_003_ordered(self):
+        client = self.client(OrderedClient)
+        client.data_received(b"".join(chat(str(i)) for i in range(30)))
+        self.run_loop(client.wait_handlers())
+        self.assertEqual([str(i) for i in range(30)], client.chats)
+        self.assertEqual(1, client.most_running)
+
+    def test_004_failures(self):
+        client = self.client()
+        client.data_received(chat("fail") + chat("ok"))
+        self.run_loop(client.wait_handlers())
+        self.assertEqual(["ok"], client.chats)
+        self.assertEqual("on_server_chat", client.failures[0][0])
+        self.assertIsInstance(client.failures[0][1], ValueError)
+
+    def test_005_pause_reading(self):
+        client = self.client()
+        client.max_pending_handlers = 5
+        client.gate.clear()
+        client.data_received(b"".join(chat(str(i)) for i in range(20)))
+        self.assertFalse(client.transport.reading)
+        self.assertEqual(6, client._handlers_pending, "Reading stops once the backlog is over the limit")
+        client.gate.set()
+        self.run_loop(client.wait_handlers())
+        self.assertTrue(client.transport.reading)
+        self.assertEqual(20, len(client.chats))
+
+    def test_006_instance_handler(self):
+        client = self.client(OttdAdminProtocol)
+        joins = []
+
+        async def on_server_client_join(client_id):
+            await asyncio.sleep(0)
+            joins.append(client_id)
+
+        client.set_handler(ServerClientJoin, on_server_client_join)
+        client.data_received(ServerClientJoin.create(client_id=7).write_to_buffer())
+        self.run_loop(client.wait_handlers())
+        self.assertEqual([7], joins)
+
+    def test_007_timed(self):
+        client = self.client(TimedClient)
+        client.slow_handler_threshold = 0.01
+        metrics = client.enable_metrics()
+        client.data_received(chat("hi"))
+        self.assertEqual([("raw", "hi")], client.calls, "The plain raw handler runs inline")
+        self.assertEqual([], client.slow, "Scheduling the async handler is not its duration")
+        self.run_loop(client.wait_handlers())
+        self.assertEqual([("raw", "hi"), ("async", "hi")], client.calls)
+        self.assertEqual([("on_server_chat", "hi")], [(name, message) for name, message, _ in client.slow])
+        self.assertGreaterEqual(client.slow[0][2], 0.02)
+        self.assertEqual(1, metrics.handler_time["on_server_chat"].count)
+        self.assertEqual(1, metrics.handler_time["on_server_chat_raw"].count)
+
+    def test_008_instance_attribute_handler(self):
+        client = self.client(OttdAdminProtocol)
+        joins = []
+
+        async def on_server_client_join(client_id):
+            await asyncio.sleep(0)
+            joins.append(client_id)
+
+        client.on_server_client_join = on_server_client_join
+        client.data_received(ServerClientJoin.create(client_id=7).write_to_buffer())
+        self.run_loop(client.wait_handlers())
+        self.assertEqual([7], joins)
+
+    def test_009_cancelled_handler(self):
+        client = self.client(OrderedClient)
+        client.gate.clear()
+        client.data_received(chat("0") + chat("1"))
+        self.run_loop(asyncio.sleep(0.01))
+        self.assertEqual(1, client.running)
+        for task in client._handler_tasks:
+            task.cancel()
+        client.data_received(chat("2"))
+        client.gate.set()
+        self.run_loop(client.wait_handlers())
+        self.assertEqual(["1", "2"], client.chats, "Calls queued behind a cancelled one still run in order")
+        self.assertEqual(0, client._handlers_pending)
+        self.assertEqual({}, client._handler_ordered)
+
+    def test_010_cancelled_before_start(self):
+        client = self.client(OrderedClient)
+        client.data_received(chat("0"))
+        for task in client._handler_tasks:
+            task.cancel()
+        client.data_received(chat("1"))
+        self.run_loop(client.wait_handlers())
+        self.assertEqual(["1"], client.chats)
+        self.assertEqual(0, client._handlers_pending)
+        self.assertEqual({}, client._handler_ordered)
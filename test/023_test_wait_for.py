@@ -0,0 +1,94 @@
+import asyncio
+import unittest
+
+from libottdadmin2.client.asyncio import OttdAdminProtocol
+from libottdadmin2.packets import AdminPing, ServerClientJoin, ServerClientQuit, ServerPong
+from libottdadmin2.simulator import OttdAdminSimulator
+
+
+class FakeTransport(asyncio.Transport):
+    def get_extra_info(self, name, default=None):
+        return ("127.0.0.1", 3977) if name == "peername" else default
+
+    def write(self, data):
+        pass
+
+    def is_closing(self):
+        return False
+
+    def close(self):
+        pass
+
+
+def join(client_id):
+    return ServerClientJoin.create(client_id=client_id).write_to_buffer()
+
+
+class TestWaitFor(unittest.TestCase):
+    def setUp(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.protocol = OttdAdminProtocol(self.loop)
+        self.protocol.connection_made(FakeTransport())
+
+    def tearDown(self) -> None:
+        self.loop.close()
+
+    def settle(self):
+        self.loop.run_until_complete(asyncio.sleep(0))
+
+    def test_001_predicate(self):
+        any_join = self.protocol.wait_for(ServerClientJoin)
+        second = self.protocol.wait_for(ServerClientJoin, predicate=lambda data: data.client_id == 2)
+        quit_ = self.protocol.wait_for(ServerClientQuit)
+        self.protocol.data_received(join(1))
+        self.assertEqual(1, any_join.result().client_id)
+        self.assertFalse(second.done())
+        self.protocol.data_received(join(3) + join(2))
+        self.assertEqual(2, second.result().client_id)
+        self.assertFalse(quit_.done())
+
+        self.settle()
+        self.assertNotIn(ServerClientJoin.packet_id, self.protocol._waiters)
+        self.assertFalse(self.protocol.is_handled(ServerClientJoin.packet_id))
+        quit_.cancel()
+        self.settle()
+        self.assertEqual({}, self.protocol._waiters)
+        self.assertFalse(self.protocol.is_handled(ServerClientQuit.packet_id))
+
+    def test_002_timeout(self):
+        with self.assertRaises(asyncio.TimeoutError):
+            self.loop.run_until_complete(self.protocol.wait_for(ServerClientJoin, timeout=0.01))
+        self.assertEqual({}, self.protocol._waiters)
+
+    def test_003_predicate_fails(self):
+        waiter = self.protocol.wait_for(ServerClientJoin, predicate=lambda data: 1 / 0)
+        self.protocol.data_received(join(1))
+        with self.assertRaises(ZeroDivisionError):
+            self.loop.run_until_complete(waiter)
+
+    def test_004_connection_lost(self):
+        waiter = self.protocol.wait_for(ServerClientJoin)
+        self.protocol.connection_lost(None)
+        with self.assertRaises(ConnectionResetError):
+            self.loop.run_until_complete(waiter)
+        with self.assertRaises(ConnectionResetError):
+            self.loop.run_until_complete(self.protocol.wait_for(ServerClientJoin))
+
+    def test_005_simulated(self):
+        simulator = OttdAdminSimulator(password="secret")
+
+        async def run():
+            await simulator.start()
+            client = await OttdAdminProtocol.connect(loop=self.loop, port=simulator.port, password="secret")
+            try:
+                while client._encryption_handler is None:
+                    await asyncio.sleep(0.005)
+                pong = client.wait_for(ServerPong, predicate=lambda data: data.payload == 42, timeout=5)
+                for payload in (41, 42, 43):
+                    client.send_packet(AdminPing.create(payload=payload))
+                return await pong
+            finally:
+                client.transport.close()
+                await simulator.stop()
+
+        self.assertEqual(42, self.loop.run_until_complete(asyncio.wait_for(run(), 5)).payload)
@@ -0,0 +1,131 @@
+import asyncio
+import unittest
+
+from libottdadmin2.client.asyncio import OttdAdminProtocol
+from libottdadmin2.enums import UpdateFrequency, UpdateType
+from libottdadmin2.packets import (
+    AdminUpdateFrequency,
+    ServerChat,
+    ServerClientJoin,
+    ServerClientQuit,
+    ServerCmdLogging,
+)
+from libottdadmin2.simulator import OttdAdminSimulator
+
+
+class FakeTransport(asyncio.Transport):
+    reading = True
+
+    def get_extra_info(self, name, default=None):
+        return ("127.0.0.1", 3977) if name == "peername" else default
+
+    def pause_reading(self):
+        self.reading = False
+
+    def resume_reading(self):
+        self.reading = True
+
+    def write(self, data):
+        pass
+
+    def is_closing(self):
+        return False
+
+    def close(self):
+        pass
+
+    def abort(self):
+        pass
+
+
+def join(client_id):
+    return ServerClientJoin.create(client_id=client_id).write_to_buffer()
+
+
+def quit_(client_id):
+    return ServerClientQuit.create(client_id=client_id).write_to_buffer()
+
+
+class TestPacketStream(unittest.TestCase):
+    def setUp(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.transport = FakeTransport()
+        self.protocol = OttdAdminProtocol(self.loop)
+        self.protocol.connection_made(self.transport)
+
+    def tearDown(self) -> None:
+        self.loop.close()
+
+    def collect(self, stream, count=None):
+        async def run():
+            items = []
+            async for packet, data in stream:
+                items.append((packet.__class__, data.client_id))
+                if len(items) == count:
+                    break
+            return items
+
+        return self.loop.run_until_complete(asyncio.wait_for(run(), 5))
+
+    def test_001_filter(self):
+        self.assertFalse(self.protocol.is_handled(ServerClientJoin.packet_id))
+        stream = self.protocol.stream({ServerClientJoin})
+        self.assertTrue(self.protocol.is_handled(ServerClientJoin.packet_id))
+        self.assertFalse(self.protocol.is_handled(ServerClientQuit.packet_id))
+        self.protocol.data_received(join(1) + quit_(1) + join(2))
+        self.assertEqual([(ServerClientJoin, 1), (ServerClientJoin, 2)], self.collect(stream, 2))
+
+        stream.close()
+        self.assertFalse(self.protocol.is_handled(ServerClientJoin.packet_id))
+
+    def test_002_back_pressure(self):
+        fast = self.protocol.stream({ServerClientJoin, ServerClientQuit}, maxsize=0)
+        slow = self.protocol.stream({ServerClientJoin}, maxsize=4)
+        self.protocol.data_received(b"".join(join(i) + quit_(i) for i in range(10)))
+        self.assertFalse(self.transport.reading)
+        self.assertEqual(4, len(slow))
+        self.assertEqual(7, len(fast), "Packets after the one filling a stream stay in the receive buffer")
+
+        # Reading resumes whenever the slow stream has caught up, until all was handled.
+        self.assertEqual([(ServerClientJoin, i) for i in range(10)], self.collect(slow, 10))
+        self.assertTrue(self.transport.reading)
+        self.assertEqual(20, len(fast))
+
+    def test_003_end(self):
+        stream = self.protocol.stream({ServerClientJoin})
+        self.protocol.data_received(join(1))
+        self.protocol.connection_closed()
+        self.assertEqual([(ServerClientJoin, 1)], self.collect(stream))
+
+        protocol = OttdAdminProtocol(self.loop)
+        protocol.connection_made(FakeTransport())
+        stream = protocol.stream({ServerClientJoin})
+        protocol.connection_lost(ConnectionResetError("gone"))
+        with self.assertRaises(ConnectionResetError):
+            self.collect(stream)
+        self.assertEqual([], self.collect(protocol.stream({ServerClientJoin})))
+
+    def test_004_simulated(self):
+        simulator = OttdAdminSimulator(password="secret", rates={UpdateType.CHAT: 1000, UpdateType.LOGGING: 1000})
+
+        async def run():
+            await simulator.start()
+            client = await OttdAdminProtocol.connect(loop=self.loop, port=simulator.port, password="secret")
+            try:
+                while client._encryption_handler is None:
+                    await asyncio.sleep(0.005)
+                seen = set()
+                async with client.stream({ServerChat, ServerCmdLogging}, maxsize=10) as packets:
+                    for update_type in (UpdateType.CHAT, UpdateType.LOGGING):
+                        packet = AdminUpdateFrequency.create(type=update_type, freq=UpdateFrequency.AUTOMATIC)
+                        client.send_packet(packet)
+                    async for packet, data in packets:
+                        seen.add(packet.__class__)
+                        if len(seen) == 2:
+                            break
+                return seen
+            finally:
+                client.transport.close()
+                await simulator.stop()
+
+        self.assertEqual({ServerChat, ServerCmdLogging}, self.loop.run_until_complete(asyncio.wait_for(run(), 5)))
@@ -0,0 +1,107 @@
+import json
+import unittest
+from typing import NamedTuple
+
+from libottdadmin2.client.common import OttdClientMixIn
+from libottdadmin2.enums import Action, DestType
+from libottdadmin2.exceptions import PacketExhaustedError
+from libottdadmin2.packets import (
+    Packet,
+    ServerChat,
+    ServerClientJoin,
+    ServerCompanyInfo,
+    ServerWelcome,
+)
+from libottdadmin2.packets.base import Field, LazyPacketData
+from libottdadmin2.packets.buffer import ReceiveBuffer
+from libottdadmin2.packets.stream import PacketStreamDecoder
+
+from .packet_data import PACKETS
+
+
+def chat(message="hello", client_id=3):
+    return ServerChat.create(
+        action=Action.CHAT, type=DestType.BROADCAST, client_id=client_id, message=message, extra=7
+    )
+
+
+class TestLazyDecoding(unittest.TestCase):
+    def test_001_same_as_decode(self):
+        for name, buffer in PACKETS.items():
+            with self.subTest(packet=name):
+                klass = next(klass for klass in Packet._registry.values() if klass.__name__ == name)
+                eager = klass(buffer).decode()
+                lazy = klass(buffer).decode_lazy()
+                self.assertEqual(eager, lazy)
+                self.assertEqual(lazy, eager)
+                self.assertEqual(repr(eager), repr(lazy))
+                self.assertEqual(eager._asdict(), lazy._asdict())
+                self.assertEqual(tuple(eager), tuple(lazy))
+                if klass.lazy_data is not None:
+                    self.assertIsInstance(lazy, LazyPacketData)
+                    self.assertEqual(hash(eager), hash(lazy))
+
+    def test_002_namedtuple_contract(self):
+        data = Packet.from_buffer(chat().write_to_buffer()).decode_lazy()
+        self.assertEqual(ServerChat.data._fields, data._fields)
+        self.assertEqual(5, len(data))
+        action, dest, client_id, message, extra = data
+        self.assertEqual((Action.CHAT, 3, "hello"), (action, client_id, message))
+        self.assertIs(data[0], data.action)
+        self.assertEqual("hello", data[-2])
+        self.assertEqual((3, "hello"), data[2:4])
+        self.assertEqual(ServerChat.data(Action.CHAT, DestType.BROADCAST, 3, "bye", 7), data._replace(message="bye"))
+        self.assertIsInstance(data._materialize(), ServerChat.data)
+        self.assertEqual('[%d, %d, 3, "hello", 7]' % (Action.CHAT, DestType.BROADCAST), json.dumps(data._materialize()))
+        self.assertEqual(chat().write_to_buffer(), ServerChat.create(data).write_to_buffer())
+        with self.assertRaises(AttributeError):
+            data.message = "changed"
+        with self.assertRaises(IndexError):
+            data[5]
+
+    def test_003_decodes_on_access(self):
+        data = Packet.from_buffer(ServerClientJoin.create(client_id=5).write_to_buffer()).decode_lazy()
+        self.assertIsNone(data._raw)
+        self.assertEqual(5, data.client_id)
+
+        converted = []
+
+        def convert(value):
+            converted.append(value)
+            return value.upper()
+
+        schema = (Field("id", "uint"), Field("name", str, convert), Field("flag", "byte", bool))
+        lazy_data = LazyPacketData.build(NamedTuple("Test", [("id", int), ("name", str), ("flag", bool)]), schema)
+        data = lazy_data(b"\x07\x00\x00\x00abc\x00\x01")
+        self.assertEqual((7, True), (data.id, data.flag))
+        self.assertEqual([], converted)
+        self.assertEqual("ABC", data.name)
+        self.assertEqual("ABC", data.name)
+        self.assertEqual(["abc"], converted)
+
+    def test_004_errors_on_access(self):
+        truncated = ServerChat(chat().buffer[:-6]).decode_lazy()
+        with self.assertRaises(PacketExhaustedError):
+            truncated.client_id
+        self.assertIsNone(ServerCompanyInfo.lazy_data)
+        self.assertIsNotNone(ServerWelcome.lazy_data)
+
+    def test_005_client_and_stream(self):
+        class Client(OttdClientMixIn):
+            lazy_decode = True
+
+            def __init__(self):
+                self._buffer = ReceiveBuffer()
+                self.received = []
+
+            def on_server_chat_raw(self, packet, data):
+                self.received.append(data)
+
+        client = Client()
+        client.data_received(chat("one").write_to_buffer() + chat("two").write_to_buffer())
+        self.assertEqual(["one", "two"], [data.message for data in client.received])
+        self.assertIsInstance(client.received[0], LazyPacketData)
+
+        decoder = PacketStreamDecoder(types=[ServerChat], lazy=True)
+        result = list(decoder.feed(chat("three").write_to_buffer()))
+        self.assertEqual("three", result[0][1].message)